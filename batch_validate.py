@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+from coordinate import Coordinate
+
+import math
+import re
+from typing import Dict, List, Tuple, Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class BatchValidator:
+    '''
+    Validates and canonicalizes the coordinates of a batch of rows at once.
+
+    `validate(rows)` gives, for each row, the `(coordinate, response)` that
+    `GQC.validate_row` would have produced: the canonical coordinate, or
+    `None` with the `action`, `reason` and `note` of the error in the
+    response. The latitudes and longitudes are range checked and rounded as
+    arrays (with NumPy when it is installed); a row the batch can not decide
+    (a 'nan' coordinate) is `None` and is left to `GQC.validate_row`.
+
+    Rounding to the precision matches `Canonicalize.latitude` and
+    `Canonicalize.longitude` exactly: values that are within rounding error
+    of a tie are rounded the way they do, through string formatting.
+    '''
+    COMMENT = re.compile(r'^\s*#')
+    # values this close to halfway between two rounded values are rounded exactly
+    TIE_TOLERANCE = 1e-6
+    # beyond this precision scaled coordinates lose integer exactness
+    MAX_ARRAY_PRECISION = 9
+
+    def __init__(self, latitude_precision: int, longitude_precision: int) -> None:
+        assert latitude_precision >= 0, f'latitude-precision must not be negative: current value is {latitude_precision}'
+        assert longitude_precision >= 0, f'longitude-precision must not be negative: current value is {longitude_precision}'
+        self.latitude_precision = latitude_precision
+        self.longitude_precision = longitude_precision
+
+    @staticmethod
+    def _float(text: str) -> float:
+        try:
+            return float(text)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _round_exactly(value: float, precision: int) -> float:
+        return float('{0:.{1}f}'.format(value, precision))
+
+    @staticmethod
+    def round(values: List[float], precision: int) -> List[float]:
+        ''' The values rounded to `precision` fractional digits, as `Canonicalize` rounds them '''
+        if numpy is None or not values or precision > BatchValidator.MAX_ARRAY_PRECISION:
+            return [BatchValidator._round_exactly(v, precision) for v in values]
+        array = numpy.asarray(values, dtype=numpy.float64)
+        scale = 10.0 ** precision
+        scaled = array * scale
+        result = numpy.rint(scaled) / scale
+        ties = numpy.flatnonzero(numpy.abs(numpy.abs(scaled - numpy.floor(scaled)) - 0.5) < BatchValidator.TIE_TOLERANCE)
+        result = result.tolist()
+        for i in ties.tolist():
+            result[i] = BatchValidator._round_exactly(values[i], precision)
+        return result
+
+    @staticmethod
+    def _error(reason: str, note: str = None, action: str = 'error') -> Dict[str, str]:
+        result = { 'action': action, 'reason': reason }
+        if note is not None:
+            result['note'] = note
+        return result
+
+    def validate(self, rows: List[Dict[str, str]]) -> List[Union[Tuple[Coordinate, Dict[str, str]], None]]:
+        results = [None] * len(rows)
+        # the rows whose coordinates parse, by position in the batch
+        candidates = []
+        latitudes = []
+        longitudes = []
+        for (i, row) in enumerate(rows):
+            stringified_row = ''.join(row.values())
+            if stringified_row == '':
+                results[i] = (None, BatchValidator._error('blank-line', action='ignore'))
+                continue
+            if BatchValidator.COMMENT.match(stringified_row):
+                results[i] = (None, BatchValidator._error('comment-line', action='ignore'))
+                continue
+            if not row['accession-number'].isdecimal():
+                results[i] = (None, BatchValidator._error('accession-number-not-integer', f'«accession-number {row["accession-number"]}» should be a decimal integer'))
+                continue
+            if not (row['latitude'] or row['longitude']):
+                results[i] = (None, BatchValidator._error('no-latitude-or-longitude'))
+                continue
+            if not row['latitude']:
+                results[i] = (None, BatchValidator._error('no-latitude'))
+                continue
+            latitude = BatchValidator._float(row['latitude'])
+            if latitude is None:
+                results[i] = (None, BatchValidator._error('latitude-number-not-decimal-float', f'latitude «{row["latitude"]}» must be a floating point (real) number'))
+                continue
+            candidates.append(i)
+            latitudes.append(latitude)
+            longitudes.append(BatchValidator._float(row['longitude']) if row['longitude'] else None)
+
+        # (a missing or unparsable longitude is checked before its range)
+        longitude_values = [(0.0 if v is None else v) for v in longitudes]
+        if numpy is not None and candidates:
+            latitude_array = numpy.asarray(latitudes, dtype=numpy.float64)
+            longitude_array = numpy.asarray(longitude_values, dtype=numpy.float64)
+            latitude_in_range = ((latitude_array >= -90.0) & (latitude_array <= 90.0)).tolist()
+            longitude_in_range = ((longitude_array >= -360.0) & (longitude_array <= 360.0)).tolist()
+            is_nan = (numpy.isnan(latitude_array) | numpy.isnan(longitude_array)).tolist()
+        else:
+            latitude_in_range = [(-90.0 <= v <= 90.0) for v in latitudes]
+            longitude_in_range = [(-360.0 <= v <= 360.0) for v in longitude_values]
+            is_nan = [(math.isnan(a) or math.isnan(b)) for (a, b) in zip(latitudes, longitude_values)]
+
+        valid = []
+        for (k, i) in enumerate(candidates):
+            row = rows[i]
+            if not latitude_in_range[k] and not math.isnan(latitudes[k]):
+                results[i] = (None, BatchValidator._error('latitude-range-error', f'latitude «{row["latitude"]}» cannot not be less than -90 or greater then +90'))
+                continue
+            if not row['longitude']:
+                results[i] = (None, BatchValidator._error('no-longitude'))
+                continue
+            if longitudes[k] is None:
+                results[i] = (None, BatchValidator._error('longitude-number-not-decimal-float', f'longitude «{row["longitude"]}» must be a floating point (real) number'))
+                continue
+            if is_nan[k]:
+                # left to GQC.validate_row
+                continue
+            if not longitude_in_range[k]:
+                results[i] = (None, BatchValidator._error('longitude-range-error', f'longitude «{row["longitude"]}» cannot not be less than -360 or greater then +360'))
+                continue
+            valid.append(k)
+
+        rounded_latitudes = BatchValidator.round([latitudes[k] for k in valid], self.latitude_precision)
+        rounded_longitudes = BatchValidator.round([longitudes[k] for k in valid], self.longitude_precision)
+        for (k, latitude, longitude) in zip(valid, rounded_latitudes, rounded_longitudes):
+            results[candidates[k]] = (Coordinate(latitude, longitude), {})
+        return results
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+from gqc import GQC
+
+import csv
+import gc
+import getopt
+import sys
+import time
+import tracemalloc
+
+
+class RowBenchmark:
+    '''
+    A micro-benchmark of the per row path of gqc (`GQC.lookup_row`: checking
+    a validated row and building its result columns) on a cache-warm input,
+    in one thread and without the pipeline, reading and writing.
+
+    Reports the best processor time per row of the repeats, the most memory
+    allocated at once while checking a row (less the result kept) and the
+    memory and blocks kept by each row's result, as the pipeline keeps up to
+    `queue-size` of them.
+
+        python ./benchmark_rows.py [--repeat n] -- [gqc options]
+    '''
+    DEFAULT_REPEAT = 5
+
+    def __init__(self, argv):
+        self.repeat = __class__.DEFAULT_REPEAT
+        opts, self.gqc_argv = getopt.getopt(argv, '', ['repeat='])
+        for opt, arg in opts:
+            if opt in ['--repeat']:
+                self.repeat = int(arg)
+
+    def execute(self):
+        gqc = GQC.instance(self.gqc_argv)
+        with open(gqc.config.value('input-file'), newline='') as csv_input:
+            items = list(gqc.validate_rows(enumerate(gqc.select_rows(csv.reader(csv_input)))))
+        if gqc.config.value('first-line-is-header'):
+            items = items[1:]
+        lookups = len(gqc.cache)
+        # warm the cache (and the gazetteer) up
+        for item in items:
+            gqc.lookup_row(item)
+        if len(gqc.cache) != lookups:
+            print(f'warning: {len(gqc.cache) - lookups} rows were not cached: run again', file=sys.stderr)
+
+        # the best of the repeats is the least disturbed by the rest of the machine
+        seconds = None
+        for _ in range(self.repeat):
+            start = time.process_time()
+            for item in items:
+                gqc.lookup_row(item)
+            elapsed = (time.process_time() - start) / len(items)
+            seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+        gc.collect()
+        tracemalloc.start()
+        transient = 0
+        for item in items:
+            tracemalloc.reset_peak()
+            result = gqc.lookup_row(item)
+            (after, peak) = tracemalloc.get_traced_memory()
+            transient += peak - after
+            del result
+        gc.collect()
+        (before, _) = tracemalloc.get_traced_memory()
+        blocks = sys.getallocatedblocks()
+        results = [gqc.lookup_row(item) for item in items]
+        (after, _) = tracemalloc.get_traced_memory()
+        retained_blocks = sys.getallocatedblocks() - blocks
+        tracemalloc.stop()
+
+        n = len(items)
+        print(f'rows: {n} x {self.repeat}')
+        print(f'time per row: {1e6 * seconds:.1f} µs')
+        print(f'transient memory per row: {transient / n:.0f} bytes')
+        print(f'retained per row result: {(after - before) / n:.0f} bytes, {retained_blocks / n:.1f} blocks')
+        del results
+
+
+if __name__ == '__main__':
+    RowBenchmark(sys.argv[1:]).execute()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+from config import Config
+from coordinate import Coordinate
+from location import Location
+from political_division import PoliticalDivision
+from reverse_geocoder import ReverseGeocoder
+
+import json
+import logging
+import math
+import sys
+from typing import Dict, List, NamedTuple, Tuple
+
+
+class BoundaryIndex:
+    '''
+    Administrative boundary polygons in a spatial index of grid buckets.
+
+    Each feature is a (multi)polygon with the names of its country, pd1 and
+    pd2; its `level` is the finest of them that is named. The index maps each
+    grid cell of `cell_degrees` on a side to the features whose bounding box
+    overlaps the cell, so a point is only tested against the few polygons
+    near it.
+    '''
+    LEVELS = ['country', 'pd1', 'pd2']
+    # The compiled form of an index (JSON of the names and rings of the features); build it with `boundary.py INPUT OUTPUT`
+    COMPILED_SUFFIX = '.gqcb'
+    COMPILED_FORMAT = 'gqc-boundary-index'
+    COMPILED_VERSION = 2
+    METERS_PER_DEGREE = 111320.0
+
+    class Feature(NamedTuple):
+        names: Tuple[str, str, str]
+        level: int
+        bbox: Tuple[float, float, float, float]  # (west, south, east, north)
+        polygons: List[List[List[Tuple[float, float]]]]  # polygons of rings of (longitude, latitude)
+
+    def __init__(self, cell_degrees: float = 1.0) -> None:
+        assert cell_degrees > 0.0, f'grid-cell-degrees must be greater than zero: current value is {cell_degrees}'
+        self.cell_degrees = cell_degrees
+        self.features = []
+        self.grid = {}
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def add(self, names: Tuple[str, str, str], polygons: List[List[List[Tuple[float, float]]]]) -> None:
+        ''' Add a feature: its (country, pd1, pd2) names and its polygons '''
+        names = tuple((n or '') for n in names)
+        named = [i for (i, n) in enumerate(names) if n]
+        if not named or not polygons:
+            return
+        xs = [p[0] for polygon in polygons for p in polygon[0]]
+        ys = [p[1] for polygon in polygons for p in polygon[0]]
+        feature = BoundaryIndex.Feature(names=names, level=max(named), bbox=(min(xs), min(ys), max(xs), max(ys)), polygons=polygons)
+        self.features.append(feature)
+        n = len(self.features) - 1
+        for cell in self._cells(feature.bbox):
+            self.grid.setdefault(cell, []).append(n)
+
+    def border_distance(self, feature: Feature, latitude: float, longitude: float) -> float:
+        ''' Approximate distance in meters from the point to the nearest edge of the feature '''
+        scale = math.cos(math.radians(latitude))
+        best = math.inf
+        for polygon in feature.polygons:
+            for ring in polygon:
+                for i in range(len(ring)):
+                    (x1, y1), (x2, y2) = ring[i - 1], ring[i]
+                    ax, ay = (x1 - longitude) * scale, y1 - latitude
+                    bx, by = (x2 - longitude) * scale, y2 - latitude
+                    dx, dy = bx - ax, by - ay
+                    length = dx * dx + dy * dy
+                    t = 0.0 if length == 0 else max(0.0, min(1.0, -(ax * dx + ay * dy) / length))
+                    best = min(best, math.hypot(ax + t * dx, ay + t * dy))
+        return best * BoundaryIndex.METERS_PER_DEGREE
+
+    def _cells(self, bbox: Tuple[float, float, float, float]):
+        west, south, east, north = bbox
+        for i in range(math.floor(west / self.cell_degrees), math.floor(east / self.cell_degrees) + 1):
+            for j in range(math.floor(south / self.cell_degrees), math.floor(north / self.cell_degrees) + 1):
+                yield (i, j)
+
+    @staticmethod
+    def _ring_contains(ring: List[Tuple[float, float]], x: float, y: float) -> bool:
+        inside = False
+        (xj, yj) = ring[-1]
+        for (xi, yi) in ring:
+            if ((yi > y) != (yj > y)) and (x < (xj - xi) * (y - yi) / (yj - yi) + xi):
+                inside = not inside
+            (xj, yj) = (xi, yi)
+        return inside
+
+    @staticmethod
+    def contains(feature: Feature, latitude: float, longitude: float) -> bool:
+        west, south, east, north = feature.bbox
+        if not (west <= longitude <= east and south <= latitude <= north):
+            return False
+        for polygon in feature.polygons:
+            if BoundaryIndex._ring_contains(polygon[0], longitude, latitude) and \
+               not any(BoundaryIndex._ring_contains(hole, longitude, latitude) for hole in polygon[1:]):
+                return True
+        return False
+
+    def query(self, latitude: float, longitude: float) -> List[Feature]:
+        ''' The features containing the point, coarsest level first '''
+        longitude = ((longitude + 180.0) % 360.0) - 180.0
+        cell = (math.floor(longitude / self.cell_degrees), math.floor(latitude / self.cell_degrees))
+        candidates = (self.features[n] for n in self.grid.get(cell, []))
+        return sorted((f for f in candidates if self.contains(f, latitude, longitude)), key=lambda f: f.level)
+
+    @staticmethod
+    def from_geojson(path: str, properties: Dict[str, List[str]], cell_degrees: float = 1.0) -> BoundaryIndex:
+        '''
+        An index of the Polygon and MultiPolygon features of a GeoJSON file;
+        `properties` lists, for each of 'country', 'pd1' and 'pd2', the
+        feature properties that may hold its name
+        '''
+        with open(path, 'r') as filehandle:
+            geojson = json.load(filehandle)
+        result = BoundaryIndex(cell_degrees)
+        features = geojson['features'] if geojson.get('type') == 'FeatureCollection' else [geojson]
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            props = feature.get('properties') or {}
+            names = tuple(next((str(props[p]) for p in properties[l] if props.get(p)), '') for l in BoundaryIndex.LEVELS)
+            if geometry.get('type') == 'Polygon':
+                polygons = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons = geometry['coordinates']
+            else:
+                continue
+            result.add(names, [[[(float(p[0]), float(p[1])) for p in ring] for ring in polygon] for polygon in polygons])
+        return result
+
+    @staticmethod
+    def load(path: str, properties: Dict[str, List[str]], cell_degrees: float = 1.0) -> BoundaryIndex:
+        ''' An index from a compiled index file or, otherwise, a GeoJSON file '''
+        if path.endswith(BoundaryIndex.COMPILED_SUFFIX):
+            return BoundaryIndex.load_compiled(path)
+        return BoundaryIndex.from_geojson(path, properties, cell_degrees)
+
+    @staticmethod
+    def load_compiled(path: str) -> BoundaryIndex:
+        ''' An index rebuilt from the data of a compiled index file (see `save`) '''
+        try:
+            with open(path, 'r', encoding='utf-8') as filehandle:
+                data = json.load(filehandle)
+        except ValueError:
+            raise ValueError(f'{path} is not a compiled boundary index: compile it again with boundary.py')
+        if not (isinstance(data, dict) and data.get('format') == BoundaryIndex.COMPILED_FORMAT):
+            raise ValueError(f'{path} is not a compiled boundary index: compile it again with boundary.py')
+        if data.get('version') != BoundaryIndex.COMPILED_VERSION:
+            raise ValueError(f'{path} is compiled boundary index version {data.get("version")}: expected version {BoundaryIndex.COMPILED_VERSION}')
+        result = BoundaryIndex(float(data['cell-degrees']))
+        for (names, polygons) in data['features']:
+            result.add(tuple(str(n) for n in names), [[[(float(x), float(y)) for (x, y) in ring] for ring in polygon] for polygon in polygons])
+        return result
+
+    def save(self, path: str) -> None:
+        ''' Write the compiled form of the index: the names and rings of its features, with no code to run on loading '''
+        data = { 'format': BoundaryIndex.COMPILED_FORMAT, 'version': BoundaryIndex.COMPILED_VERSION, 'cell-degrees': self.cell_degrees,
+                 'features': [[list(f.names), f.polygons] for f in self.features] }
+        with open(path, 'w', encoding='utf-8') as filehandle:
+            json.dump(data, filehandle, separators=(',', ':'))
+
+
+class Boundary(ReverseGeocoder):
+    '''
+    An offline reverse geocoder answering from administrative boundary
+    polygons (see `BoundaryIndex`) with point-in-polygon tests.
+
+    Points that fall in no polygon, in overlapping polygons, or within
+    `border-distance-meters` of a country or pd1 border are ambiguous; they
+    are passed to the `fallback-provider` when one is configured.
+    '''
+    HTTP = False
+
+    def __init__(self, config: Config) -> None:
+        super().__init__(config, Config.SECTION_BOUNDARY)
+        path = config.get('boundary-file', Config.SECTION_BOUNDARY)
+        if not path:
+            raise ValueError(f'{Config.SECTION_BOUNDARY}.boundary-file is not set')
+        self.index = BoundaryIndex.load(path, Boundary.properties(config), float(config.get('grid-cell-degrees', Config.SECTION_BOUNDARY)))
+        logging.info(f'loaded {len(self.index)} boundary features from {path}')
+        self.border_distance_meters = float(config.get('border-distance-meters', Config.SECTION_BOUNDARY))
+        fallback = config.get('fallback-provider', Config.SECTION_BOUNDARY)
+        self.fallback = ReverseGeocoder.create(config, fallback) if fallback else None
+
+    def estimated_seconds_per_request(self) -> float:
+        return self.fallback.estimated_seconds_per_request() if self.fallback else 0.0
+
+    def shared_limits(self, context):
+        ''' The limits of the fallback provider, the only one making requests '''
+        return self.fallback.shared_limits(context) if self.fallback else None
+
+    def use_limits(self, limits) -> None:
+        if self.fallback and limits:
+            self.fallback.use_limits(limits)
+
+    def is_cacheable(self, location: Location) -> bool:
+        ''' Only the locations from the fallback provider are worth caching '''
+        return location.metadata.get('__provider') != 'boundary'
+
+    def probe(self) -> bool:
+        return len(self.index) > 0
+
+    @staticmethod
+    def properties(config: Config) -> Dict[str, List[str]]:
+        return { l: [p.strip() for p in str(config.get(f'{l}-property', Config.SECTION_BOUNDARY)).split(',') if p.strip()] for l in BoundaryIndex.LEVELS }
+
+    def reverse_geolocate(self, coordinate: Coordinate, rate_limit=True) -> Location:
+        longitude = ((coordinate.longitude + 180.0) % 360.0) - 180.0
+        features = self.index.query(coordinate.latitude, longitude)
+        ambiguous = (not features) or (len(features) > len({f.level for f in features}))
+        if not ambiguous and self.border_distance_meters > 0:
+            ambiguous = any(self.index.border_distance(f, coordinate.latitude, longitude) < self.border_distance_meters
+                            for f in features if f.level <= BoundaryIndex.LEVELS.index('pd1'))
+        if ambiguous and self.fallback:
+            logging.debug(f'{coordinate} is ambiguous: asking {type(self.fallback).__name__}')
+            return self.fallback.reverse_geolocate(coordinate, rate_limit)
+        if not features:
+            return None
+        names = {}
+        for feature in features:
+            for (level, name) in zip(BoundaryIndex.LEVELS, feature.names):
+                if name:
+                    names[level] = name
+        west, south, east, north = features[-1].bbox
+        metadata = { '__provider': 'boundary', '__request_position': coordinate,
+                     'boundingbox': [str(south), str(north), str(west), str(east)] }
+        return Location(coordinate=coordinate, political_division=PoliticalDivision(**names), metadata=metadata)
+
+
+
+if __name__ == '__main__':
+    # Compile a GeoJSON boundary file: boundary.py INPUT.geojson OUTPUT.gqcb
+    if len(sys.argv) != 3 or not sys.argv[2].endswith(BoundaryIndex.COMPILED_SUFFIX):
+        print(f'Usage: boundary.py INPUT.geojson OUTPUT{BoundaryIndex.COMPILED_SUFFIX}')
+        sys.exit(2)
+    config = Config.instance([])
+    index = BoundaryIndex.from_geojson(sys.argv[1], Boundary.properties(config), float(config.get('grid-cell-degrees', Config.SECTION_BOUNDARY)))
+    index.save(sys.argv[2])
+    print(f'{sys.argv[2]}: {len(index)} features')
@@ -6,14 +6,19 @@ from datetime import datetime
 import json
 import logging
 import os
+import threading
 
 
 class Cache(MutableMapping):
     ''' Simple Dict backed cache that can be persisted '''
-    def __init__(self, filepath: str, load: bool = True):
+    def __init__(self, filepath: str, load: bool = True, persist: bool = True):
+        ''' With `persist` false the changes are kept in memory (see `changes`) instead of saved '''
         assert filepath, f'Missing filepath'
         self.filepath = filepath
+        self.persist = persist
         self.__cache = {}
+        self.__changes = {}
+        self.__lock = threading.RLock()
         if load:
             self._load()
 
@@ -23,14 +28,15 @@ class Cache(MutableMapping):
 
     def __delitem__(self, key: str) -> None:
         assert key, f'Missing key'
-        del self.__cache[key]
+        with self.__lock:
+            del self.__cache[key]
 
     def __getitem__(self, key: str) -> str:
         assert key, f'Missing key'
         return self.__cache[key]
 
     def __iter__(self):
-        return self.__cache.keys()
+        return iter(self.__cache.keys())
     
     def __len__(self):
         return len(self.__cache)
@@ -38,9 +44,38 @@ class Cache(MutableMapping):
     def __setitem__(self, key: str, value: str) -> None:
         assert key, f'Missing key'
         assert value, f'Missing value'
-        self.__cache[key] = value
-        with open(self.filepath, 'w+') as cachefile:
-            json.dump(self.__cache, cachefile)
+        with self.__lock:
+            self.__cache[key] = value
+            if self.persist:
+                self._save()
+            else:
+                self.__changes[key] = value
+
+    def changes(self, save: bool = False) -> dict:
+        ''' The entries set since the last call, when not persisting; saved too with `save` '''
+        with self.__lock:
+            if save and self.__changes:
+                self._save()
+            (result, self.__changes) = (self.__changes, {})
+        return result
+
+    def flush(self) -> None:
+        ''' Save the changes set since the last call, when not persisting '''
+        with self.__lock:
+            if self.__changes:
+                self._save()
+                self.__changes = {}
+
+    def merge(self, entries: dict) -> None:
+        ''' Set all the entries, saving the cache once '''
+        if not entries:
+            return
+        with self.__lock:
+            self.__cache.update(entries)
+            if self.persist:
+                self._save()
+            else:
+                self.__changes.update(entries)
 
     def _load(self) -> None:
         cache = {}
@@ -48,3 +83,7 @@ class Cache(MutableMapping):
             with open(self.filepath, 'r') as filehandle:
                 cache = json.loads(filehandle.read())
         self.__cache = cache
+
+    def _save(self) -> None:
+        with open(self.filepath, 'w+') as cachefile:
+            json.dump(self.__cache, cachefile)
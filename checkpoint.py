@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+from compression import Compression
+
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+class LineReader:
+    '''
+    The decoded lines of a binary file, for `csv.reader`, keeping the byte
+    `offset` of the end of the last line read.
+    '''
+    def __init__(self, filehandle, encoding: str, offset: int = 0) -> None:
+        self.filehandle = filehandle
+        self.encoding = encoding
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.filehandle.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode(self.encoding)
+
+
+class Checkpoint:
+    '''
+    Records how far a run has got, so that `--resume` can continue it.
+
+    A checkpoint is the byte offset in the input just after the last row
+    written, the number of that row and the byte offset of the end of its
+    output. It is saved (atomically, replacing the last one) every `every`
+    rows and when the run is interrupted, and removed when the run
+    completes. Resuming truncates the output to the checkpoint, dropping any
+    half written tail, and carries on reading the input from there.
+
+    The input and output must be regular, uncompressed files. The checkpoint
+    of a run is kept beside its output file (`path_for`) unless it is given
+    a path, so that runs to different output files do not share one.
+    '''
+    VERSION = 1
+    SUFFIX = '.gqc-checkpoint.json'
+
+    def __init__(self, path: str, input_file: str, output_file: str, every: int = 5000) -> None:
+        assert every > 0, f'checkpoint-rows must be greater than zero: current value is {every}'
+        self.path = path
+        self.input_file = input_file
+        self.output_file = output_file
+        self.every = every
+        self.__offsets = {}
+        self.__last = None
+        self.__written = 0
+
+    @staticmethod
+    def path_for(output_file: str) -> str:
+        ''' The default checkpoint of a run to the output file '''
+        return f'{os.path.realpath(output_file)}{Checkpoint.SUFFIX}'
+
+    @staticmethod
+    def applicable(input_file: str, output_file: str) -> bool:
+        ''' Whether a run from input_file to output_file can be resumed '''
+        return os.path.isfile(input_file) and (Compression.of_file(input_file) == Compression.NONE) and \
+               (Compression.of_name(output_file) is None) and (os.path.isfile(output_file) or not os.path.exists(output_file))
+
+    def _identity(self) -> Dict[str, Any]:
+        status = os.stat(self.input_file)
+        return { 'version': Checkpoint.VERSION, 'input-file': os.path.realpath(self.input_file), 'input-size': status.st_size,
+                 'input-mtime': status.st_mtime_ns, 'output-file': os.path.realpath(self.output_file) }
+
+    def load(self) -> Dict[str, Any]:
+        ''' The saved checkpoint of this run; `ValueError` if there is none '''
+        if not os.path.isfile(self.path):
+            raise ValueError(f'no checkpoint to resume from: {self.path}')
+        with open(self.path, 'r') as filehandle:
+            data = json.load(filehandle)
+        for (key, value) in self._identity().items():
+            if data.get(key) != value:
+                raise ValueError(f'checkpoint {self.path} is of another run: its {key} is «{data.get(key)}», not «{value}»')
+        if os.path.getsize(self.output_file) < data['output-offset']:
+            raise ValueError(f'output file {self.output_file} is shorter than the checkpoint {self.path}')
+        return data
+
+    def rows(self, reader: Iterable[List[str]], lines: LineReader, start: int = 0) -> Iterator[Tuple[int, List[str]]]:
+        ''' The (row-number, raw-row) of the reader's rows, from `start`, noting where each one ends '''
+        for (row_number, rawrow) in enumerate(reader, start):
+            self.__offsets[row_number] = lines.offset
+            yield (row_number, rawrow)
+
+    def written(self, row_number: int, output) -> None:
+        ''' Note that the row has been written to the output, saving a checkpoint every so often '''
+        self.__last = (row_number, self.__offsets.pop(row_number))
+        self.__written += 1
+        if self.__written % self.every == 0:
+            self.save(output)
+
+    def save(self, output) -> None:
+        ''' Save a checkpoint after the last row written '''
+        if self.__last is None:
+            return
+        output.flush()
+        (row_number, input_offset) = self.__last
+        data = self._identity()
+        data.update({ 'row-number': row_number, 'input-offset': input_offset, 'output-offset': output.tell() })
+        temporary = f'{self.path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as filehandle:
+            json.dump(data, filehandle)
+        os.replace(temporary, self.path)
+        logging.debug(f'checkpoint {data}')
+
+    def remove(self) -> None:
+        ''' Remove the checkpoint, unless it is another run's '''
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as filehandle:
+                data = json.load(filehandle)
+        except (OSError, ValueError):
+            data = {}
+        identity = self._identity()
+        if any(data.get(k) != identity[k] for k in ('input-file', 'output-file')):
+            logging.warning(f'not removing checkpoint {self.path}: it is of another run')
+            return
+        os.remove(self.path)
@@ -13,13 +13,21 @@ import socket
 import subprocess
 import sys
 import tempfile
+import time
+from compression import Compression
+from deadline import Deadline
+from projection import Projection
+from sampling import Sample
+from service import Service
 from util import Util
 from validate import Validate
 
 
 class Config:
+    SECTION_BOUNDARY = 'boundary'
     SECTION_GQC = 'gqc'
     SECTION_LOCATIONIQ = 'location-iq'
+    SECTION_NOMINATIM = 'nominatim'
     SECTION_SYSTEM = '__sys__'
 
     __instance = None
@@ -53,9 +61,12 @@ class Config:
         taskdotdir = os.path.expanduser(f'{Path.home()}/.gqc')
         result = {
             Config.SECTION_GQC: {
+                'batch-size': 1000,         # rows validated together
                 'cache-enabled': 'true',    # disabled by '' (empty string)
                 'cache-only': '',   # enabled by 'true'
                 'cache-file': f'{taskdotdir}/gqc.reverse-lookup.cache',
+                'checkpoint-file': '',      # empty is beside the output file (see Checkpoint.path_for)
+                'checkpoint-rows': 5000,    # rows written between checkpoints; 0 disables them
                 'column-assignment': { 'country': 0,
                                        'pd1': 1,
                                        'pd2': -1,
@@ -67,20 +78,61 @@ class Config:
                                        'longitude': 4
                                      },
                 'comment-character': '#',
+                'coordinator': '',          # work queue database the rows are checked through by --worker processes
+                'compression': '',          # codec of output files with no compressed extension: one of Compression.CODECS
+                'extent-index': '',         # enabled by 'true'
+                'extent-index-cell-degrees': 0.1,
+                'extent-index-file': f'{taskdotdir}/gqc.extent-index.json',
+                'extent-index-min-support': 2,
+                'extent-index-validate': '',    # enabled by 'true'
+                'deadline': '',             # epoch seconds the run must finish by (see --deadline and --time-budget)
+                'deadline-reserve-seconds': 60, # kept to finish writing after the lookups stop
+                'distributed-chunks-ahead': 64, # most chunks of a --coordinator in the work queue
+                'distributed-heartbeat-seconds': 300, # before the job of a dead --coordinator is abandoned
+                'distributed-idle-seconds': 300, # a --worker stops after this long without work
+                'distributed-lease-seconds': 300, # before a chunk of a dead --worker is leased again
+                'distributed-poll-seconds': 1,  # between looks at the work queue
+                'exclude-verdicts': '',     # action[:reason] verdicts of a results file input whose rows are skipped
+                'fields': '',               # csvcut style 1-based fields of the input rows to check
                 'first-line-is-header': True,
+                'gazetteer-file': '',       # CSV of level,id,name[,name]* aliases added to the built-in gazetteer
                 'input-file': '/dev/stdin',
                 'latitude-precision': 3,
                 'log-file': f'{taskdotdir}/log/{timestamp}.log',
                 'log-level': 'DEBUG',
                 'longitude-precision': 3,
+                'lookup-threads': 8,        # rows looked up (or waiting on a lookup) at the same time
                 'allowable-coordinate-error': 100, # !~ =/- 100 meters
+                'manifest': '',             # CSV of input,output file pairs checked in one run
                 'minimum-fuzzy-score': 70,
                 'output-file': '/dev/stdout',
+                'plan': '', # enabled by 'true'
+                'prefetch': '',             # enabled by 'true'
+                'prefetch-permutations': '',    # enabled by 'true'
+                'prefetch-spill-size': 1000000, # unique coordinates held in memory before spilling to disk
+                'previous': '',             # results file whose verdicts are copied for unchanged rows
+                'provider': 'locationiq',   # one of ReverseGeocoder.PROVIDERS
+                'queue-size': 1000,         # most rows in flight between reading and writing
+                'results-store': '',        # SQLite database the results are also written to
+                'resume': '',               # enabled by 'true'
+                'sample': '',               # rows (N) or fraction (0 < f < 1) of the input to check and estimate from
+                'sample-confidence': 0.95,  # of the intervals of the estimates: one of Sample.Z
+                'sample-report': '',        # CSV file of the estimates of a --sample run
+                'sample-seed': '',          # of the random sample; empty is a different sample each run
                 'separator': ',',
+                'serve': '',                # [host:]port or Unix socket path rows are checked on for other programs
+                'spatial-order': '',        # enabled by 'true'
+                'shard-size': 1000,         # rows per shard sent to a --workers process (or per --coordinator chunk)
+                'worker': '',               # work queue database whose chunks are checked
+                'workers': 1,               # processes checking rows; 1 checks them in this process
             },
             Config.SECTION_LOCATIONIQ: {
                 'api-host': 'us1.locationiq.com',
                 'api-token': 'you-need-to-configure-your-api-token',
+                'expected-latency-seconds': 0.5,
+                'max-concurrency': 1,
+                'pace-by-backoff': 'true',  # disabled by '' (empty string)
+                'requests-per-second': 0,   # 0 is no fixed rate limit
                 'reverse-url-format': (f'https://{{host}}/v1/reverse.php?key={{token}}' + '&' +
                                        f'lat={{latitude}}' + '&' +
                                        f'lon={{longitude}}' + '&' +
@@ -93,6 +145,28 @@ class Config:
                                        f'showdistance=1' + '&' +
                                        f'format=json'),
             },
+            Config.SECTION_BOUNDARY: {
+                'border-distance-meters': 0,  # 0 never treats a point as near a border
+                'boundary-file': '',        # GeoJSON or compiled (.gqcb) boundary file
+                'country-property': 'country,ADM0_NAME,NAME_0,admin',
+                'fallback-provider': '',    # provider for ambiguous points; e.g. 'locationiq'
+                'grid-cell-degrees': 1.0,
+                'pd1-property': 'pd1,ADM1_NAME,NAME_1',
+                'pd2-property': 'pd2,ADM2_NAME,NAME_2',
+            },
+            Config.SECTION_NOMINATIM: {
+                'api-host': 'localhost:8080',
+                'expected-latency-seconds': 0.01,
+                'max-concurrency': 16,
+                'pace-by-backoff': '',      # enabled by 'true'
+                'requests-per-second': 0,   # 0 is no fixed rate limit
+                'reverse-url-format': (f'http://{{host}}/reverse?' +
+                                       f'lat={{latitude}}' + '&' +
+                                       f'lon={{longitude}}' + '&' +
+                                       f'addressdetails=1' + '&' +
+                                       f'zoom=18' + '&' +
+                                       f'format=jsonv2'),
+            },
             Config.SECTION_SYSTEM: {
                 'argv': sys.argv,
                 'backoff-decay-factor': 0.1,
@@ -100,6 +174,13 @@ class Config:
                 'backoff-learning-factor': 0.2,
                 'backoff-max-seconds': 30,
                 'backoff-min-seconds': 1,
+                'connect-timeout-seconds': 10,
+                'hedge-max-rate': 0.05,
+                'hedge-min-samples': 20,
+                'hedge-quantile': 0.95,
+                'hedge-requests': '',       # enabled by 'true'
+                'read-timeout-seconds': 30,
+                'total-timeout-seconds': 60,
                 'command': subprocess.list2cmdline([sys.executable] + sys.argv),
                 'inifiles': [
                     '/usr/local/selby/include/gqc.cfg',
@@ -166,6 +247,8 @@ class Config:
         logging.debug(f'gqc.input: {self.value("separator")}')
         logging.debug(f'location-iq.api-host: {self.value("api-host", section=Config.SECTION_LOCATIONIQ)}')
         logging.debug(f'location-iq.api-token: {self.value("api-token", section=Config.SECTION_LOCATIONIQ)}')
+        logging.debug(f'gqc.provider: {self.value("provider")}')
+        logging.debug(f'nominatim.api-host: {self.value("api-host", section=Config.SECTION_NOMINATIM)}')
 
     def merge(self, dictionary):
         assert type(self.config) == dict, f'Need self.config to be dict: found [{type(self.config)}]{self.config}'
@@ -191,7 +274,8 @@ class Config:
 
     @staticmethod
     def __configparser_to_dict(config):
-        r = {}
+        # the [gqc] section is the default section: configparser does not list it
+        r = { config.default_section: dict(config.defaults()) } if config.defaults() else {}
         for s in config.sections():
             if not s in r: r[s] = {}
             for o in config.options(s):
@@ -200,17 +284,27 @@ class Config:
 
     def _merge_options(self, argv):
         assert type(argv) == list, f'Need argv to be list: found [{type(argv)}]{argv}'
-        result = {Config.SECTION_GQC: {}, Config.SECTION_LOCATIONIQ: {}}
+        result = {Config.SECTION_GQC: {}, Config.SECTION_BOUNDARY: {}, Config.SECTION_LOCATIONIQ: {}, Config.SECTION_NOMINATIM: {}}
         try:
             opts, _args = getopt.getopt(argv, 'c:C:fhi:L:l:no:s:', [
                                              'api-token=', 
                                              'api-host=',
+                                             'boundary-file=',
                                              'cache-file=',
                                              'cache-only',
+                                             'checkpoint-file=',
                                              'column=',
                                              'column-assignment=',
                                              'comment-character=',
+                                             'compression=',
+                                             'coordinator=',
                                              'copyright',
+                                             'deadline=',
+                                             'extent-index',
+                                             'exclude-verdict=',
+                                             'extent-index-validate',
+                                             'fields=',
+                                             'gazetteer-file=',
                                              'disable-cache'
                                              'enable-cache'
                                              'first-line-is-header',
@@ -221,15 +315,37 @@ class Config:
                                              'log-file=',
                                              'log-level=',
                                              'longitude-precision=',
+                                             'lookup-threads=',
+                                             'manifest=',
                                              'noheader',
                                              'no-header',
                                              'output=',
-                                             'separator='])
+                                             'plan',
+                                             'dry-run',
+                                             'prefetch',
+                                             'prefetch-permutations',
+                                             'previous=',
+                                             'provider=',
+                                             'results-store=',
+                                             'resume',
+                                             'sample=',
+                                             'sample-report=',
+                                             'sample-seed=',
+                                             'separator=',
+                                             'serve=',
+                                             'spatial-order',
+                                             'time-budget=',
+                                             'worker=',
+                                             'workers='])
             for opt, arg in opts:
                 if opt in ['--api-token']:
                     result[Config.SECTION_LOCATIONIQ]['api-token'] = arg
                 elif opt in ['--api-host']:
                     result[Config.SECTION_LOCATIONIQ]['api-host'] = arg
+                elif opt in ['--boundary-file']:
+                    path = os.path.realpath(arg)
+                    if not Validate.file_readable(path): raise ValueError(f'Can not read boundary file: {path}')
+                    result[Config.SECTION_BOUNDARY]['boundary-file'] = path
                 elif opt in ['-C', '--cache-file']:
                     path = os.path.realpath(arg)
                     if not Validate.file_writable(path): raise ValueError(f'Can not write to cache file: {path}')
@@ -245,6 +361,13 @@ class Config:
                     result[Config.SECTION_GQC]['column-assignment'] |= assignments
                 elif opt in ['--comment-character']:
                     result[Config.SECTION_GQC]['comment-character'] = arg
+                elif opt in ['--compression']:
+                    if not Compression.available(arg): raise ValueError(f'Bad or unavailable compression value (one of {", ".join(Compression.CODECS)}): {arg}')
+                    result[Config.SECTION_GQC]['compression'] = '' if arg == Compression.NONE else arg
+                elif opt in ['--coordinator']:
+                    path = os.path.realpath(arg)
+                    if not Validate.file_writable(path): raise ValueError(f'Can not write to work queue: {path}')
+                    result[Config.SECTION_GQC]['coordinator'] = path
                 elif opt in ['--copyright']:
                     print(self.doco.copyright())
                     sys.exit()
@@ -252,9 +375,33 @@ class Config:
                     result[Config.SECTION_GQC]['cache-enabled'] = ''
                 elif opt in ['--enable-cache']:
                     result[Config.SECTION_GQC]['cache-enabled'] = 'true'
+                elif opt in ['--extent-index']:
+                    result[Config.SECTION_GQC]['extent-index'] = 'true'
+                elif opt in ['--extent-index-validate']:
+                    result[Config.SECTION_GQC]['extent-index'] = 'true'
+                    result[Config.SECTION_GQC]['extent-index-validate'] = 'true'
+                elif opt in ['--gazetteer-file']:
+                    path = os.path.realpath(arg)
+                    if not Validate.file_readable(path): raise ValueError(f'Can not read gazetteer file: {path}')
+                    result[Config.SECTION_GQC]['gazetteer-file'] = path
                 elif opt in ['-h', '--help']:
                     print(self.doco.usage())
                     sys.exit()
+                elif opt in ['--checkpoint-file']:
+                    path = os.path.realpath(arg)
+                    if not Validate.file_writable(path): raise ValueError(f'Can not write to checkpoint file: {path}')
+                    result[Config.SECTION_GQC]['checkpoint-file'] = path
+                elif opt in ['--deadline']:
+                    try:
+                        result[Config.SECTION_GQC]['deadline'] = str(Deadline.parse_time(arg))
+                    except ValueError:
+                        raise ValueError(f'Bad deadline value (HH:MM or an ISO date and time): {arg}')
+                elif opt in ['--exclude-verdict']:
+                    if not re.match(r'^[\w-]+(:[\w-]+)?$', arg): raise ValueError(f'Bad exclude-verdict value (action[:reason]): {arg}')
+                    result[Config.SECTION_GQC]['exclude-verdicts'] = ' '.join(filter(None, [result[Config.SECTION_GQC].get('exclude-verdicts'), arg]))
+                elif opt in ['--fields']:
+                    if not Projection.FIELDS.match(arg): raise ValueError(f'Bad fields value: {arg}')
+                    result[Config.SECTION_GQC]['fields'] = arg
                 elif opt in ['-f', '--header', '--first-line-is-header']:
                     result[Config.SECTION_GQC]['first-line-is-header'] = True
                 elif opt in ['-i', '--input', '--input-file']:
@@ -275,14 +422,67 @@ class Config:
                 elif opt in ['--longitude-precision']:
                     if not (arg.isdigit() and int(arg) >= 0): raise ValueError(f'longitude-precision must be an integer > 0: {arg}')
                     result[Config.SECTION_GQC]['longitude-precision'] = arg
+                elif opt in ['--lookup-threads']:
+                    if not (arg.isdigit() and int(arg) > 0): raise ValueError(f'lookup-threads must be an integer > 0: {arg}')
+                    result[Config.SECTION_GQC]['lookup-threads'] = arg
+                elif opt in ['--manifest']:
+                    path = os.path.realpath(arg)
+                    if not Validate.file_readable(path): raise ValueError(f'Can not read manifest file: {path}')
+                    result[Config.SECTION_GQC]['manifest'] = path
                 elif opt in ['-n', '--noheader', '--no-header']:
                     result[Config.SECTION_GQC]['first-line-is-header'] = False
                 elif opt in ['-o', '--output', '--output-file']:
                     path = os.path.realpath(arg)
                     if not Validate.file_writable(path): raise ValueError(f'Can not write to output file: {path}')
                     result[Config.SECTION_GQC]['output-file'] = path
+                elif opt in ['--plan', '--dry-run']:
+                    result[Config.SECTION_GQC]['plan'] = 'true'
+                elif opt in ['--previous']:
+                    path = os.path.realpath(arg)
+                    if not Validate.file_readable(path): raise ValueError(f'Can not read previous results file: {path}')
+                    result[Config.SECTION_GQC]['previous'] = path
+                elif opt in ['--prefetch']:
+                    result[Config.SECTION_GQC]['prefetch'] = 'true'
+                elif opt in ['--prefetch-permutations']:
+                    result[Config.SECTION_GQC]['prefetch'] = 'true'
+                    result[Config.SECTION_GQC]['prefetch-permutations'] = 'true'
+                elif opt in ['--provider']:
+                    from reverse_geocoder import ReverseGeocoder
+                    if arg not in ReverseGeocoder.PROVIDERS: raise ValueError(f'Bad provider value (one of {", ".join(ReverseGeocoder.PROVIDERS)}): {arg}')
+                    result[Config.SECTION_GQC]['provider'] = arg
+                elif opt in ['--results-store']:
+                    path = os.path.realpath(arg)
+                    if not Validate.file_writable(path): raise ValueError(f'Can not write to results store: {path}')
+                    result[Config.SECTION_GQC]['results-store'] = path
+                elif opt in ['--resume']:
+                    result[Config.SECTION_GQC]['resume'] = 'true'
+                elif opt in ['--sample']:
+                    Sample.parse(arg)
+                    result[Config.SECTION_GQC]['sample'] = arg
+                elif opt in ['--sample-report']:
+                    path = os.path.realpath(arg)
+                    if not Validate.file_writable(path): raise ValueError(f'Can not write to sample report file: {path}')
+                    result[Config.SECTION_GQC]['sample-report'] = path
+                elif opt in ['--sample-seed']:
+                    if not arg.isdigit(): raise ValueError(f'sample seed must be an integer >= 0: {arg}')
+                    result[Config.SECTION_GQC]['sample-seed'] = arg
                 elif opt in ['-s', '--separator']:
                     result[Config.SECTION_GQC]['separator'] = arg
+                elif opt in ['--serve']:
+                    Service.parse_address(arg)
+                    result[Config.SECTION_GQC]['serve'] = arg
+                elif opt in ['--spatial-order']:
+                    result[Config.SECTION_GQC]['prefetch'] = 'true'
+                    result[Config.SECTION_GQC]['spatial-order'] = 'true'
+                elif opt in ['--time-budget']:
+                    result[Config.SECTION_GQC]['deadline'] = str(time.time() + Deadline.parse_duration(arg))
+                elif opt in ['--worker']:
+                    path = os.path.realpath(arg)
+                    if not Validate.file_writable(path): raise ValueError(f'Can not write to work queue: {path}')
+                    result[Config.SECTION_GQC]['worker'] = path
+                elif opt in ['--workers']:
+                    if not (arg.isdigit() and int(arg) > 0): raise ValueError(f'workers must be an integer > 0: {arg}')
+                    result[Config.SECTION_GQC]['workers'] = arg
                 else:
                     assert False, f'unhandled option: {opt}'
         except getopt.GetoptError as exception:
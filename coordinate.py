@@ -70,7 +70,11 @@ class Coordinate(____CoordinateBase):
 
     def distance(self, coordinate: Coordinate, unit: Unit = Unit.METERS) -> float:
         """ Return the distance between the two coordinates """
-        distance = haversine((self.latitude, self.longitude), (coordinate.latitude, coordinate.longitude), unit)
+        return self.distance_to(coordinate.latitude, coordinate.longitude, unit)
+
+    def distance_to(self, latitude: float, longitude: float, unit: Unit = Unit.METERS) -> float:
+        """ Return the distance to the latitude and longitude, without making a Coordinate of them """
+        distance = haversine((self.latitude, self.longitude), (latitude, longitude), unit)
         # FIXME - calculate 3 from first principles
         result = float('{0:.3f}'.format(float(distance)))
         return result
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+from projection import Projection
+
 import csv
 import errno
 import getopt
@@ -22,7 +24,7 @@ class CSVCut:
             raise Exception('This class is a singleton!')
         self.input_file = __class__.DEFAULT_INPUT_FILE
         self.output_file = __class__.DEFAULT_OUTPUT_FILE
-        self.fields = []
+        self.projection = None
         try:
             opts, _args = getopt.getopt(argv, 'f:hi:o:', [
                                              'copyright',
@@ -32,11 +34,8 @@ class CSVCut:
                                              'output=', 'output-file='])
             for opt, arg in opts:
                 if opt in ['-f', '--field', '--fields']:
-                    regex = re.compile('^([+-]?\d+)(-([+-]?\d+))?(\,([+-]?\d+)(-([+-]?\d+))?)*$')
-                    if not regex.match(arg): raise ValueError(f'Bad {opt} value: {arg}')
-                    args = [ f.split('-') for f in arg.split(',') ]
-                    ranges = [ (int(i[0]), int(i[0])+1) if len(i) == 1 else (int(i[0]), int(i[1])+1) for i in args ]
-                    self.fields = sorted(list(set.union(*[ set([ i for i in range(r[0], r[1]) ]) for r in ranges ])))
+                    if not Projection.FIELDS.match(arg): raise ValueError(f'Bad {opt} value: {arg}')
+                    self.projection = Projection.parse(arg)
                 elif opt in ['--copyright']:
                     print(self.copyright())
                     sys.exit()
@@ -86,16 +85,10 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
             n = 0
             with open(self.input_file, newline='') as csv_input:
                 reader = csv.reader(csv_input, dialect='excel', skipinitialspace=True)
-                for row in reader:
-                    if self.fields:
-                        data = [None] * len(self.fields)
-                        for i in range(len(self.fields)):
-                            j = self.fields[i] - 1
-                            if j >= 0 and j < len(row):
-                                data[i] = row[j]
-                        writer.writerow(data)
-                    else:
-                        writer.writerow(row)
+                if self.projection:
+                    writer.writerows(map(self.projection, reader))
+                else:
+                    writer.writerows(reader)
 
 
     def usage(self):
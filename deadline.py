@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+from compression import Compression
+
+from collections import Counter, deque
+import datetime
+import os
+import re
+import threading
+import time
+
+
+class Deadline:
+    '''
+    Keeps a run within its time budget (`--deadline`, `--time-budget`).
+
+    The rows written are counted (`done`) and the rate of the most recent
+    ones projected over the rows left (when the number of rows is known).
+    When the projection overruns the deadline the run steps down a `mode`:
+
+        *   `full`: every check, with every lookup it needs
+        *   `no-corrections`: the sign and territory corrections use only the
+            locations already cached
+        *   `cache-only`: rows whose location is not cached are not looked up
+
+    and when the projection is comfortably within the deadline again it steps
+    back up. Past the deadline (less the `reserve` seconds kept to finish
+    writing) the run is `cache-only`.
+    '''
+    FULL = 'full'
+    NO_CORRECTIONS = 'no-corrections'
+    CACHE_ONLY = 'cache-only'
+    MODES = (FULL, NO_CORRECTIONS, CACHE_ONLY)
+    # the projection must be within this fraction of the time left to step back up
+    HEADROOM = 0.8
+    # the rows of the rate, and the rows between reconsidering the mode
+    WINDOW = 500
+    INTERVAL = 50
+
+    def __init__(self, end: float, total: int = None, reserve: float = 60.0, clock=time.time) -> None:
+        self.end = end
+        self.total = total
+        self.reserve = reserve
+        self.clock = clock
+        self.mode = Deadline.FULL
+        self.statistics = Counter()
+        self.__done = 0
+        self.__times = deque(maxlen=Deadline.WINDOW)
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def parse_time(text: str, now: datetime.datetime = None) -> float:
+        ''' The epoch time of a `--deadline`: an ISO date and time, or a time of day (the next one) '''
+        now = now or datetime.datetime.now()
+        if re.match(r'^\d{1,2}:\d{2}(:\d{2})?$', text):
+            t = datetime.time.fromisoformat(text if len(text.split(':')[0]) == 2 else f'0{text}')
+            result = datetime.datetime.combine(now.date(), t)
+            if result <= now:
+                result += datetime.timedelta(days=1)
+            return result.timestamp()
+        return datetime.datetime.fromisoformat(text).timestamp()
+
+    @staticmethod
+    def parse_duration(text: str) -> float:
+        ''' The seconds of a `--time-budget`: seconds, or a duration such as '1h30m' or '90m' '''
+        match = re.match(r'^(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?$', text)
+        if not text or not match:
+            raise ValueError(f'Bad time budget: {text}')
+        (hours, minutes, seconds) = (int(g) if g else 0 for g in match.groups())
+        return float(hours * 3600 + minutes * 60 + seconds)
+
+    @staticmethod
+    def count_rows(paths) -> int:
+        ''' The number of lines of the files, as the number of rows; `None` unless they are all regular files '''
+        if not all(os.path.isfile(p) for p in paths):
+            return None
+        result = 0
+        for path in paths:
+            with Compression.open(path, 'rb') as filehandle:
+                for chunk in iter(lambda: filehandle.read(1 << 20), b''):
+                    result += chunk.count(b'\n')
+        return result
+
+    def done(self, rows: int = 1) -> None:
+        ''' Note rows written, and reconsider the mode every so often '''
+        with self.__lock:
+            now = self.clock()
+            for _ in range(rows):
+                self.__done += 1
+                self.__times.append(now)
+                if self.__done % Deadline.INTERVAL == 0:
+                    self._reconsider(now)
+            self.statistics[self.mode] += rows
+
+    def current(self) -> str:
+        ''' The mode of the rows checked now '''
+        if self.clock() >= self.end - self.reserve:
+            self.mode = Deadline.CACHE_ONLY
+        return self.mode
+
+    def projection(self, now: float) -> float:
+        ''' The seconds the rows left will take at the recent rate; `None` if not known '''
+        if (self.total is None) or (len(self.__times) < 2) or (self.__times[-1] <= self.__times[0]):
+            return None
+        rate = (len(self.__times) - 1) / (self.__times[-1] - self.__times[0])
+        return max(self.total - self.__done, 0) / rate
+
+    def _reconsider(self, now: float) -> None:
+        left = self.end - self.reserve - now
+        projection = self.projection(now)
+        if left <= 0:
+            mode = Deadline.CACHE_ONLY
+        elif projection is None:
+            mode = self.mode
+        else:
+            i = Deadline.MODES.index(self.mode)
+            if (projection > left) and (i < len(Deadline.MODES) - 1):
+                i += 1
+            elif (projection < left * Deadline.HEADROOM) and (i > 0):
+                i -= 1
+            mode = Deadline.MODES[i]
+        if mode != self.mode:
+            self.statistics['mode-changes'] += 1
+            self.mode = mode
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+from config import Config
+from deadline import Deadline
+from results_store import ResultsStore
+
+import copy
+import itertools
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+class WorkQueue:
+    '''
+    A queue of the chunks of rows of gqc jobs, in an SQLite database on a
+    filesystem shared by the machines of a distributed run.
+
+    A coordinator (`submit`) adds the chunks of its job, each a run of
+    consecutive (row-number, raw-row) items. Workers `lease` a chunk for a
+    while, `renew` the lease while they check it, and `complete` it with its
+    results and the cache entries they looked up. A chunk whose lease has
+    expired (its worker died, or lost the filesystem) is leased again to the
+    next worker that asks; the first completion of a chunk is the one kept.
+    The coordinator collects the completed chunks in order (`collect`), and
+    renews the heartbeat of its job (`beat`) while it does; a job whose
+    heartbeat has expired (its coordinator died) is abandoned, and its chunks
+    dropped, by the next worker that asks for a chunk.
+
+    The database uses the default rollback journal, not WAL, so that it works
+    on network filesystems (with working file locks).
+    '''
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            coordinator TEXT NOT NULL,
+            settings TEXT NOT NULL,
+            created REAL NOT NULL,
+            state TEXT NOT NULL DEFAULT 'open',
+            heartbeat_expires REAL
+        );
+        CREATE TABLE IF NOT EXISTS chunks (
+            job_id INTEGER NOT NULL REFERENCES jobs(job_id),
+            chunk_id INTEGER NOT NULL,
+            items TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            worker TEXT,
+            lease_expires REAL,
+            leases INTEGER NOT NULL DEFAULT 0,
+            results TEXT,
+            changes TEXT,
+            PRIMARY KEY (job_id, chunk_id)
+        );
+        CREATE INDEX IF NOT EXISTS chunks_state ON chunks (state, job_id, chunk_id);
+    '''
+
+    def __init__(self, path: str, timeout: float = 60.0) -> None:
+        self.path = path
+        # transactions are begun explicitly: leasing must lock the database before it reads
+        self.__connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__lock:
+            self.__connection.executescript(WorkQueue.SCHEMA)
+            # a queue created before jobs had a heartbeat
+            if 'heartbeat_expires' not in [column[1] for column in self.__connection.execute('PRAGMA table_info(jobs)')]:
+                self.__connection.execute('ALTER TABLE jobs ADD COLUMN heartbeat_expires REAL')
+
+    def _transaction(self, statements) -> Any:
+        ''' The result of `statements(connection)`, run in an immediate (write locked) transaction '''
+        with self.__lock:
+            self.__connection.execute('BEGIN IMMEDIATE')
+            try:
+                result = statements(self.__connection)
+                self.__connection.execute('COMMIT')
+                return result
+            except BaseException:
+                self.__connection.execute('ROLLBACK')
+                raise
+
+    def create_job(self, coordinator: str, settings: Dict[str, Any], heartbeat: float = 300.0) -> int:
+        ''' A new job, abandoned unless its heartbeat is renewed (`beat`) within `heartbeat` seconds '''
+        now = time.time()
+        return self._transaction(lambda c: c.execute('INSERT INTO jobs (coordinator, settings, created, heartbeat_expires) VALUES (?, ?, ?, ?)',
+                                                     (coordinator, json.dumps(settings), now, now + heartbeat)).lastrowid)
+
+    def beat(self, job_id: int, heartbeat: float) -> bool:
+        ''' Renew the heartbeat of the job for `heartbeat` seconds: false if the job is no longer open (it was abandoned) '''
+        return self._transaction(lambda c: c.execute("UPDATE jobs SET heartbeat_expires = ? WHERE job_id = ? AND state = 'open'",
+                                                     (time.time() + heartbeat, job_id)).rowcount) == 1
+
+    def submit(self, job_id: int, chunk_id: int, items: List[Tuple[int, List[str]]]) -> None:
+        self._transaction(lambda c: c.execute('INSERT INTO chunks (job_id, chunk_id, items) VALUES (?, ?, ?)',
+                                              (job_id, chunk_id, json.dumps(items))))
+
+    def finish_job(self, job_id: int) -> None:
+        def statements(c):
+            c.execute('DELETE FROM chunks WHERE job_id = ?', (job_id,))
+            c.execute("UPDATE jobs SET state = 'done' WHERE job_id = ?", (job_id,))
+        self._transaction(statements)
+
+    def lease(self, worker: str, seconds: float) -> Tuple[int, int, Dict[str, Any], List[Tuple[int, List[str]]]]:
+        ''' The (job-id, chunk-id, job settings, items) of the next chunk, leased to the worker; `None` if there is none '''
+        def statements(c):
+            now = time.time()
+            # the jobs of dead coordinators
+            if c.execute("UPDATE jobs SET state = 'abandoned' WHERE state = 'open' AND heartbeat_expires < ?", (now,)).rowcount:
+                c.execute("DELETE FROM chunks WHERE job_id IN (SELECT job_id FROM jobs WHERE state = 'abandoned')")
+            row = c.execute("SELECT chunks.job_id, chunk_id, settings, items FROM chunks JOIN jobs USING (job_id) "
+                            "WHERE jobs.state = 'open' AND (chunks.state = 'pending' OR (chunks.state = 'leased' AND lease_expires < ?)) "
+                            "ORDER BY chunks.job_id, chunk_id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            c.execute("UPDATE chunks SET state = 'leased', worker = ?, lease_expires = ?, leases = leases + 1 WHERE job_id = ? AND chunk_id = ?",
+                      (worker, now + seconds, row[0], row[1]))
+            return (row[0], row[1], json.loads(row[2]), [tuple(item) for item in json.loads(row[3])])
+        return self._transaction(statements)
+
+    def renew(self, job_id: int, chunk_id: int, worker: str, seconds: float) -> bool:
+        ''' Extend the lease of the worker on the chunk: false if the worker no longer holds it '''
+        return self._transaction(lambda c: c.execute("UPDATE chunks SET lease_expires = ? WHERE job_id = ? AND chunk_id = ? AND state = 'leased' AND worker = ?",
+                                                     (time.time() + seconds, job_id, chunk_id, worker)).rowcount) == 1
+
+    def complete(self, job_id: int, chunk_id: int, worker: str, results: List[Any], changes: Dict[str, str]) -> bool:
+        ''' Record the results of the chunk: false if it was completed already (by a worker it was leased to again) '''
+        return self._transaction(lambda c: c.execute("UPDATE chunks SET state = 'done', worker = ?, results = ?, changes = ? WHERE job_id = ? AND chunk_id = ? AND state != 'done'",
+                                                     (worker, json.dumps(results), json.dumps(changes), job_id, chunk_id)).rowcount) == 1
+
+    def collect(self, job_id: int, chunk_id: int) -> Tuple[List[Tuple[int, List[str], List[Any]]], Dict[str, str]]:
+        ''' The (results, cache entries) of the chunk, removed from the queue; `None` if it is not complete '''
+        def statements(c):
+            row = c.execute("SELECT results, changes FROM chunks WHERE job_id = ? AND chunk_id = ? AND state = 'done'", (job_id, chunk_id)).fetchone()
+            if row is None:
+                return None
+            c.execute('DELETE FROM chunks WHERE job_id = ? AND chunk_id = ?', (job_id, chunk_id))
+            return ([tuple(result) for result in json.loads(row[0])], json.loads(row[1]))
+        return self._transaction(statements)
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
+
+
+class Coordinator:
+    '''
+    Checks the rows on the machines running `gqc --worker` on the same
+    `WorkQueue` (`--coordinator`), in place of a `ShardPool`.
+
+    The rows are read here and queued in chunks of `shard_size` rows, at most
+    `ahead` chunks at a time; the results are yielded in the order of the
+    rows as the chunks are completed, and the cache entries the workers
+    looked up merged into this process' cache. The job carries the settings
+    the workers need to check the rows as this process would (`settings`).
+    Its heartbeat
+    is renewed every third of `heartbeat` seconds while the chunks are
+    collected; should this process die, the workers abandon the job once it
+    expires.
+    '''
+    # the settings of the coordinator the workers check the rows with, besides those that decide the verdicts
+    DEADLINE_SETTINGS = ('deadline', 'deadline-reserve-seconds')
+
+    def __init__(self, gqc, queue: WorkQueue, shard_size: int = 1000, ahead: int = 64, poll: float = 1.0, heartbeat: float = 300.0) -> None:
+        assert shard_size > 0, f'shard-size must be greater than zero: current value is {shard_size}'
+        assert ahead > 0, f'distributed-chunks-ahead must be greater than zero: current value is {ahead}'
+        assert heartbeat > 0, f'distributed-heartbeat-seconds must be greater than zero: current value is {heartbeat}'
+        self.gqc = gqc
+        self.queue = queue
+        self.shard_size = shard_size
+        self.ahead = ahead
+        self.poll = poll
+        self.heartbeat = heartbeat
+
+    @staticmethod
+    def settings(config) -> Dict[str, Dict[str, Any]]:
+        ''' The settings, by section, the workers check the rows with: those that decide the verdicts, and the deadline '''
+        result = ResultsStore.settings(config)
+        result[Config.SECTION_GQC].update({ k: config.value(k) for k in Coordinator.DEADLINE_SETTINGS })
+        return result
+
+    def run(self, items: Iterable[Tuple[int, List[str]]]) -> Iterator[Tuple[int, List[str], List[Any]]]:
+        ''' The (row-number, raw-row, result-columns) of the (row-number, raw-row) items, in order '''
+        settings = Coordinator.settings(self.gqc.config)
+        job_id = self.queue.create_job(f'{socket.gethostname()}:{os.getpid()}', settings, self.heartbeat)
+        logging.info(f'coordinator: job {job_id} in {self.queue.path}')
+        items = iter(items)
+        (submitted, collected) = (0, 0)
+        beat = time.monotonic() + self.heartbeat / 3
+        try:
+            while True:
+                if time.monotonic() >= beat:
+                    if not self.queue.beat(job_id, self.heartbeat):
+                        raise RuntimeError(f'coordinator: job {job_id} was abandoned by the workers: its heartbeat expired')
+                    beat = time.monotonic() + self.heartbeat / 3
+                while submitted - collected < self.ahead:
+                    chunk = list(itertools.islice(items, self.shard_size))
+                    if not chunk:
+                        break
+                    self.queue.submit(job_id, submitted, chunk)
+                    submitted += 1
+                if collected == submitted:
+                    break
+                chunk = self.queue.collect(job_id, collected)
+                if chunk is None:
+                    time.sleep(self.poll)
+                    continue
+                (results, changes) = chunk
+                self.gqc.cache.merge(changes)
+                collected += 1
+                logging.info(f'coordinator: job {job_id} chunk {collected - 1} collected; {submitted - collected} in the queue')
+                yield from results
+        finally:
+            self.queue.finish_job(job_id)
+
+
+class Worker:
+    '''
+    Checks the chunks of the jobs of a `WorkQueue` (`--worker`) until there
+    has been nothing to do for `idle` seconds.
+
+    Each chunk is leased for `lease` seconds, renewed every third of that
+    while the chunk is checked with the normal `GQC.check_rows` path (with
+    the settings of the job, and this worker's own API key), and completed
+    with its results and the cache entries looked up, which are also saved
+    to this worker's cache.
+
+    The settings of a job replace this worker's own (`Coordinator.settings`)
+    for as long as it checks the chunks of that job: the parts of the
+    checker that follow them are rebuilt (`GQC.configure`), and this
+    worker's own settings are restored for the next job and at the end.
+    '''
+    def __init__(self, gqc, queue: WorkQueue, lease: float = 300.0, idle: float = 300.0, poll: float = 1.0) -> None:
+        assert lease > 0, f'distributed-lease-seconds must be greater than zero: current value is {lease}'
+        self.gqc = gqc
+        self.queue = queue
+        self.lease = lease
+        self.idle = idle
+        self.poll = poll
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.statistics = { 'chunks': 0, 'rows': 0, 'lost': 0 }
+        # this worker's own settings
+        self.settings = copy.deepcopy(gqc.config.config)
+
+    def execute(self) -> None:
+        logging.info(f'worker {self.name}: waiting for chunks in {self.queue.path}')
+        # the cache entries looked up are sent back with each chunk
+        self.gqc.cache.persist = False
+        job = None
+        waiting = time.monotonic()
+        while True:
+            leased = self.queue.lease(self.name, self.lease)
+            if leased is None:
+                if time.monotonic() - waiting > self.idle:
+                    break
+                time.sleep(self.poll)
+                continue
+            (job_id, chunk_id, settings, items) = leased
+            if job != job_id:
+                self.use(settings)
+                job = job_id
+            self.check(job_id, chunk_id, items)
+            waiting = time.monotonic()
+        self.use({})
+        self.gqc.cache.persist = True
+        logging.info(f'worker {self.name}: idle for {self.idle} seconds: stopping; {self.statistics}')
+
+    def use(self, settings: Dict[str, Dict[str, Any]]) -> None:
+        ''' Check with this worker's own settings replaced by the (section => key => value) `settings` '''
+        config = self.gqc.config
+        before = config.config
+        config.config = copy.deepcopy(self.settings)
+        for (section, values) in settings.items():
+            for (key, value) in values.items():
+                config.put(key, value, section)
+        changed = { (section, key) for section in config.config if isinstance(config.config[section], dict)
+                    for key in config.config[section] if before.get(section, {}).get(key) != config.config[section][key] }
+        if changed:
+            logging.info(f'worker {self.name}: settings {sorted(changed)} changed')
+            self.gqc.configure(changed)
+        # the rows left are not known here: only the end of the deadline (less the reserve) is kept to
+        self.gqc.deadline = Deadline(float(config.value('deadline')), None, float(config.value('deadline-reserve-seconds'))) if config.value('deadline') else None
+
+    def check(self, job_id: int, chunk_id: int, items: List[Tuple[int, List[str]]]) -> None:
+        stop = threading.Event()
+        def renew():
+            while not stop.wait(self.lease / 3):
+                if not self.queue.renew(job_id, chunk_id, self.name, self.lease):
+                    logging.warning(f'worker {self.name}: lost the lease of job {job_id} chunk {chunk_id}')
+                    return
+        renewer = threading.Thread(target=renew, name='gqc-lease', daemon=True)
+        renewer.start()
+        try:
+            results = list(self.gqc.check_rows(items))
+        finally:
+            stop.set()
+            renewer.join()
+        changes = self.gqc.cache.changes(save=True)
+        if self.queue.complete(job_id, chunk_id, self.name, results, changes):
+            self.statistics['chunks'] += 1
+            self.statistics['rows'] += len(results)
+        else:
+            self.statistics['lost'] += 1
+            logging.warning(f'worker {self.name}: job {job_id} chunk {chunk_id} was completed by another worker')
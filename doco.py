@@ -47,8 +47,13 @@ unless the --output option is given.
 
       --api-token              LocationIQ API token
       --api-host               LocationIQ API endpoint hostname
+      --boundary-file f        Administrative boundary file (GeoJSON or compiled .gqcb)
+                               used by the 'boundary' provider
   -C, --cache-file c           Cache file; defaults to "{defaults[Config.SECTION_GQC]['cache-file']}"
       --cache-only             Only read from cache; do not perform reverse geolocation calls
+      --checkpoint-file c      Where the progress of the run is checkpointed every
+                               'checkpoint-rows' rows (see gqc.cfg); defaults to the
+                               output file name followed by '.gqc-checkpoint.json'
   -c, --column, --column-assignment C:N[,C:N]*
                                Column assignments. 'C' is one of 'country', 'pd1', 'pd2', 'pd3',
                                'pd4', 'pd5', 'accession-number', 'latitude' or 'longitude'. 'N'
@@ -57,7 +62,41 @@ unless the --output option is given.
       --comment-character c    All input records starting at any amount of
                                whitespace followed by the comment character will
                                be ignored; defaults character if '{defaults[Config.SECTION_GQC]['comment-character']}'
+      --compression c          Compress the output with 'c' (one of 'gzip', 'bz2', 'xz',
+                               'zstd' or 'none') when its name has no '.gz', '.bz2',
+                               '.xz' or '.zst' extension; compressed input is detected
+      --coordinator db         Check the rows on the machines running gqc --worker db:
+                               the input is queued in chunks of 'shard-size' rows in
+                               the SQLite work queue 'db' (on a filesystem they all
+                               share) and the results written here in input order
       --copyright              Display the copyright and exit
+      --deadline t             Finish the run by the time 't' (HH:MM, the next one, or
+                               an ISO date and time): when the rate of the run projects
+                               an overrun the typo corrections stop looking up
+                               coordinates, then rows that are not cached are deferred
+                               (see 'deadline-reserve-seconds' in gqc.cfg)
+      --exclude-verdict v      Skip the input rows with the verdict 'v' ('action' or
+                               'action:reason', such as 'pass:matching-location');
+                               for an input that is a results file of an earlier
+                               run; may be repeated
+      --extent-index           Before looking up a coordinate that is not in the cache,
+                               classify it against the country and pd1 extents of the
+                               cached locations: rows confidently inside the claimed pd1
+                               pass ('matching-extent') and rows confidently outside it
+                               fail ('country-outside-extent' or 'pd1-outside-extent')
+                               without a reverse geolocation call
+      --extent-index-validate  Classify every row against the extent index, but look
+                               them all up anyway and log the precision and recall of
+                               the classifications
+      --gazetteer-file f       CSV file of 'level,id,name[,name]*' rows adding division
+                               names and aliases (e.g. 'pd1,BO-L,La Paz,Chuquiago')
+                               to the built-in gazetteer of country names, ISO codes
+                               and territories; names it knows are compared without
+                               fuzzy matching
+      --fields F[,F]*          Check only these fields of the input rows, as 'csvcut -f'
+                               selects them: 'F' is a column number ('N') or a range
+                               of column numbers ('N-M'), starting from 1; the
+                               column assignment is of the selected fields
   -f, --first-line-is-header   Treat the first row of the input file as a header -- the
                                second line of the input file is the first record
                                processed.
@@ -72,9 +111,65 @@ unless the --output option is given.
                                defaults to {defaults[Config.SECTION_GQC]['log-level']}
       --longitude-precision p  Number of fractional digits of precision in
                                longitude; defaults to {defaults[Config.SECTION_GQC]['longitude-precision']}
+      --lookup-threads n       Number of rows looked up at the same time; rows found in
+                               the cache are checked while others wait on the reverse
+                               geolocation service, and the output stays in input
+                               order; defaults to {defaults[Config.SECTION_GQC]['lookup-threads']}
+      --manifest file          Check many files in one run: a CSV file of «input,output»
+                               file pairs; the files share the cache, the request
+                               rate limit and the lookup threads (or --workers),
+                               taking turns of 'batch-size' rows (see gqc.cfg)
   -n, --noheader, --no-header  Treat the first row of the input file as data -- not as a header
   -o, --output file            Output file; defaults to {defaults[Config.SECTION_GQC]['output-file']}
+      --plan, --dry-run        Do not check anything; instead report the number of
+                               unique coordinates, expected cache hits, required
+                               API calls (including the worst case sign permutation
+                               calls) and the estimated wall time of the run
+      --prefetch               Before checking the rows, look up every unique
+                               coordinate that is not cached, 'lookup-threads' at
+                               a time, so that checking the rows reads the cache
+      --prefetch-permutations  As --prefetch, and also look up the sign permutations
+                               of the rows whose location is unknown or in another
+                               country
+      --previous file          A results file of an earlier run; rows whose accession
+                               number and checked columns are unchanged get their
+                               previous verdict (unless it was an internal-error)
+                               and only new or modified rows are checked
+      --provider p             Reverse geolocation service provider; one of 'locationiq',
+                               'nominatim' (a Nominatim compatible server configured
+                               in the [nominatim] section of gqc.cfg) or 'boundary'
+                               (offline point-in-polygon lookups in the polygons of
+                               the --boundary-file); defaults to
+                               '{defaults[Config.SECTION_GQC]['provider']}'
+      --results-store db       Also write the results, with the run and its settings,
+                               to the SQLite database 'db' (created if need be), indexed
+                               by accession number, country and reason
+      --resume                 Continue an interrupted run from its checkpoint,
+                               appending to its output file; the input and output
+                               files must be the same as the interrupted run's
+      --sample n               Check a random sample of 'n' rows (or, for 0 < n < 1, that
+                               fraction of the rows) stratified by country and pd1, and
+                               estimate the rate of each action.reason in the input
+      --sample-report file     Write the estimates of a --sample run to a CSV file
+      --sample-seed n          Seed of the --sample; the same seed is the same sample
+      --serve address          Do not read the input; instead check rows for other
+                               programs over HTTP on 'address', a [host:]port (the
+                               host defaults to 127.0.0.1) or the path of a Unix
+                               socket, keeping the cache warm between requests:
+                               POST /check (a JSON row), POST /check-csv (CSV rows)
+                               and GET /status
   -s, --separator s            Field separator; defaults to '{defaults[Config.SECTION_GQC]['separator']}'
+      --spatial-order          As --prefetch, looking the coordinates up in the order
+                               of a Hilbert curve, so that nearby coordinates are
+                               looked up together; the output stays in input order
+      --time-budget d          As --deadline, 'd' from now: seconds or a duration such
+                               as '90m' or '1h30m'
+      --worker db              Check the chunks of the jobs of the --coordinator work
+                               queue 'db', with this machine's gqc.cfg and cache, until
+                               there has been no work for 'distributed-idle-seconds'
+      --workers n              Number of processes checking rows; the input is split
+                               into shards of 'shard-size' rows (see gqc.cfg) and the
+                               output merged back in input order; defaults to {defaults[Config.SECTION_GQC]['workers']}
       --                       Terminates the list of options
 
 
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+from canonicalize import Canonicalize
+from coordinate import Coordinate
+from gazetteer import Gazetteer
+from political_division import PoliticalDivision
+
+from collections import Counter
+import functools
+from fuzzywuzzy import fuzz
+import json
+import logging
+import math
+import os
+import threading
+from typing import Dict, Iterable, Tuple
+
+
+class ExtentIndex:
+    '''
+    Country and pd1 extents derived from the reverse lookup cache.
+
+    The index is an occupancy grid: for each cell of `cell_degrees` on a side
+    it counts the cached locations of each (country, pd1). A coordinate is
+    classified against the cell it falls in and the eight cells around it:
+
+        *   `inside`: at least `min_support` cached locations in its cell, and
+            every location in the neighbourhood matches the claimed country
+            and pd1
+        *   `outside`: at least `min_support` cached locations in its cell,
+            all of a single (country, pd1), and none in the neighbourhood
+            matching the claimed country (or pd1)
+        *   `unknown`: anything else
+
+    so only the `unknown` rows need a reverse lookup.
+    '''
+    INSIDE = 'inside'
+    OUTSIDE = 'outside'
+    UNKNOWN = 'unknown'
+    VERSION = 2
+
+    def __init__(self, cell_degrees: float = 0.1, min_support: int = 2, min_fuzzy_score: int = PoliticalDivision.MIN_FUZZY_SCORE) -> None:
+        assert cell_degrees > 0.0, f'extent-index-cell-degrees must be greater than zero: current value is {cell_degrees}'
+        assert min_support > 0, f'extent-index-min-support must be greater than zero: current value is {min_support}'
+        self.cell_degrees = cell_degrees
+        self.min_support = min_support
+        self.min_fuzzy_score = min_fuzzy_score
+        self.cells = {}
+        # the cache keys indexed
+        self.keys = set()
+        # (prediction, actual) => count, for the precision and recall report
+        self.scores = Counter()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=65536)
+    def normalize(name: str) -> str:
+        ''' The Latin letters of the name: '' when it has none (Cyrillic, CJK, Arabic, ...), as when it is empty '''
+        return Canonicalize.alpha_element(name) if name else ''
+
+    @staticmethod
+    def unknown(name: str) -> bool:
+        ''' True if the name is given but has nothing the index can compare '''
+        return bool(name) and not ExtentIndex.normalize(name)
+
+    @functools.lru_cache(maxsize=65536)
+    def _equal(self, a: str, b: str, level: str) -> bool:
+        if a == b:
+            return True
+        if not (a and b):
+            return False
+        score = Gazetteer.instance().score(a, b, level)
+        return (fuzz.token_set_ratio(a, b) if score is None else score) >= self.min_fuzzy_score
+
+    def cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        longitude = ((longitude + 180.0) % 360.0) - 180.0
+        return (math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees))
+
+    def add(self, coordinate: Coordinate, country: str, pd1: str) -> None:
+        ''' Count one resolved location of (country, pd1) at the coordinate '''
+        division = (ExtentIndex.normalize(country), ExtentIndex.normalize(pd1))
+        if (not division[0]) or ExtentIndex.unknown(pd1):
+            return
+        with self.__lock:
+            self.cells.setdefault(self.cell(coordinate.latitude, coordinate.longitude), Counter())[division] += 1
+
+    @property
+    def indexed(self) -> int:
+        return len(self.keys)
+
+    def observe(self, key: str, coordinate: Coordinate, location) -> None:
+        ''' Add a location just added to the reverse lookup cache under the key '''
+        with self.__lock:
+            if key in self.keys:
+                return
+            self.keys.add(key)
+        self.add(coordinate, location.political_division.country, location.political_division.pd1)
+
+    def add_cache_entries(self, entries: Iterable[Tuple[str, str]]) -> int:
+        ''' Add the (key, value) entries of the reverse lookup cache; the number added '''
+        n = 0
+        for (key, value) in entries:
+            try:
+                query = dict(p.split(':', 1) for p in key.split(','))
+                pd = json.loads(value).get('political_division', {})
+                self.add(Coordinate(query['latitude'], query['longitude']), pd.get('country'), pd.get('pd1'))
+                n += 1
+            except (KeyError, ValueError, AttributeError) as exception:
+                logging.debug(f'ignoring cache entry {key}: {exception}')
+        return n
+
+    def classify(self, coordinate: Coordinate, political_division: PoliticalDivision) -> Tuple[str, str, Tuple[str, str]]:
+        '''
+        The (classification, level, division) of the claimed political division
+        at the coordinate; `level` is the first of 'country' or 'pd1' that does
+        not match and `division` the (country, pd1) found there when `outside`
+        '''
+        country = ExtentIndex.normalize(political_division.country)
+        pd1 = ExtentIndex.normalize(political_division.pd1)
+        (i, j) = self.cell(coordinate.latitude, coordinate.longitude)
+        with self.__lock:
+            center = dict(self.cells.get((i, j), {}))
+            neighbourhood = Counter()
+            for di in (-1, 0, 1):
+                for dj in (-1, 0, 1):
+                    neighbourhood.update(self.cells.get((i + di, j + dj), {}))
+        if (not country) or ExtentIndex.unknown(political_division.pd1) or sum(center.values()) < self.min_support:
+            return (ExtentIndex.UNKNOWN, None, None)
+        def matches(division, level):
+            if not self._equal(country, division[0], 'country'):
+                return False
+            return (level == 'country') or (not pd1) or self._equal(pd1, division[1], 'pd1')
+        if all(matches(d, 'pd1') for d in neighbourhood):
+            return (ExtentIndex.INSIDE, None, None)
+        if len(center) == 1:
+            division = next(iter(center))
+            if not any(matches(d, 'country') for d in neighbourhood):
+                return (ExtentIndex.OUTSIDE, 'country', division)
+            if pd1 and matches(division, 'country') and not any(matches(d, 'pd1') for d in neighbourhood):
+                return (ExtentIndex.OUTSIDE, 'pd1', division)
+        return (ExtentIndex.UNKNOWN, None, None)
+
+    @staticmethod
+    def load(path: str, cell_degrees: float, min_support: int) -> ExtentIndex:
+        ''' The saved index, or an empty one when there is none built with the same cell size '''
+        result = ExtentIndex(cell_degrees, min_support)
+        if os.path.isfile(path) and os.access(path, os.R_OK):
+            with open(path, 'r') as filehandle:
+                data = json.load(filehandle)
+            if data.get('version') == ExtentIndex.VERSION and float(data.get('cell-degrees')) == cell_degrees:
+                for (i, j, country, pd1, count) in data['cells']:
+                    result.cells.setdefault((i, j), Counter())[(country, pd1)] = count
+                result.keys = set(data['keys'])
+            else:
+                logging.info(f'rebuilding extent index {path}: it was built with different settings')
+        return result
+
+    def refresh(self, cache) -> int:
+        '''
+        Add the cache entries not yet indexed, whatever their order in the
+        cache (entries merged from --workers or distributed workers are not
+        in the order they were observed); the number added
+        '''
+        keys = set(cache)
+        with self.__lock:
+            if not (self.keys <= keys):
+                # Entries were removed (or the cache replaced): start over
+                self.cells = {}
+                self.keys = set()
+            new = keys - self.keys
+            self.keys |= new
+        return self.add_cache_entries((key, cache[key]) for key in new)
+
+    def report(self) -> Dict[str, float]:
+        ''' The precision and recall of the `inside` and `outside` predictions validated so far '''
+        result = {}
+        with self.__lock:
+            scores = Counter(self.scores)
+        for label in (ExtentIndex.INSIDE, ExtentIndex.OUTSIDE):
+            predicted = sum(n for ((p, _), n) in scores.items() if p == label)
+            actual = sum(n for ((_, a), n) in scores.items() if a == label)
+            correct = scores[(label, label)]
+            result[f'{label}-predicted'] = predicted
+            result[f'{label}-precision'] = (correct / predicted) if predicted else None
+            result[f'{label}-recall'] = (correct / actual) if actual else None
+        result['unknown-predicted'] = sum(n for ((p, _), n) in scores.items() if p == ExtentIndex.UNKNOWN)
+        return result
+
+    def save(self, path: str) -> None:
+        with self.__lock:
+            cells = [[i, j, c, p, n] for ((i, j), counts) in self.cells.items() for ((c, p), n) in counts.items()]
+            keys = sorted(self.keys)
+        data = { 'version': ExtentIndex.VERSION, 'cell-degrees': self.cell_degrees, 'keys': keys, 'cells': cells }
+        with open(f'{path}.tmp', 'w') as filehandle:
+            json.dump(data, filehandle)
+        os.replace(f'{path}.tmp', path)
+
+    def score(self, prediction: str, inside: bool) -> None:
+        ''' Record a prediction against the outcome of the actual lookup '''
+        with self.__lock:
+            self.scores[(prediction, ExtentIndex.INSIDE if inside else ExtentIndex.OUTSIDE)] += 1
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import csv
+import functools
+import logging
+import re
+import threading
+import unicodedata
+from typing import Dict, FrozenSet, Iterable, Union
+
+
+class Gazetteer:
+    '''
+    Political division names and their aliases, hashed by normalized name.
+
+    Each name of a division level maps to the canonical ids it may refer to
+    (ISO 3166-1 alpha-2 codes for the built-in countries); two names are the
+    same division when they share an id, and different divisions when both
+    are known but share none. Only names unknown to the gazetteer need fuzzy
+    scoring.
+
+    Territories are listed both as countries and as pd1 of their sovereign
+    under the same id, so a territory named as a country matches the same
+    territory named as a pd1.
+
+    More aliases are read from the `gazetteer-file`: CSV rows of
+    `level,id,name[,name]*` where `level` is one of 'country', 'pd1', ... 'pd5'.
+    '''
+    LEVELS = ['country', 'pd1', 'pd2', 'pd3', 'pd4', 'pd5']
+    MATCH = 100
+    MISMATCH = 0
+    __instance = None
+
+    # id: [alpha-3 code, name, aliases...]
+    COUNTRIES = {
+        'AD': ['AND', 'Andorra'],
+        'AE': ['ARE', 'United Arab Emirates', 'UAE'],
+        'AF': ['AFG', 'Afghanistan'],
+        'AG': ['ATG', 'Antigua and Barbuda', 'Antigua'],
+        'AI': ['AIA', 'Anguilla'],
+        'AL': ['ALB', 'Albania', 'Shqipëria'],
+        'AM': ['ARM', 'Armenia'],
+        'AO': ['AGO', 'Angola'],
+        'AQ': ['ATA', 'Antarctica'],
+        'AR': ['ARG', 'Argentina', 'Argentine Republic'],
+        'AS': ['ASM', 'American Samoa'],
+        'AT': ['AUT', 'Austria', 'Österreich'],
+        'AU': ['AUS', 'Australia'],
+        'AW': ['ABW', 'Aruba'],
+        'AX': ['ALA', 'Åland Islands', 'Aland'],
+        'AZ': ['AZE', 'Azerbaijan'],
+        'BA': ['BIH', 'Bosnia and Herzegovina', 'Bosnia'],
+        'BB': ['BRB', 'Barbados'],
+        'BD': ['BGD', 'Bangladesh'],
+        'BE': ['BEL', 'Belgium', 'België', 'Belgique'],
+        'BF': ['BFA', 'Burkina Faso'],
+        'BG': ['BGR', 'Bulgaria'],
+        'BH': ['BHR', 'Bahrain'],
+        'BI': ['BDI', 'Burundi'],
+        'BJ': ['BEN', 'Benin'],
+        'BL': ['BLM', 'Saint Barthélemy', 'St Barthélemy', 'St Barts'],
+        'BM': ['BMU', 'Bermuda'],
+        'BN': ['BRN', 'Brunei', 'Brunei Darussalam'],
+        'BO': ['BOL', 'Bolivia', 'Plurinational State of Bolivia', 'Estado Plurinacional de Bolivia'],
+        'BQ': ['BES', 'Caribbean Netherlands', 'Bonaire, Sint Eustatius and Saba', 'Bonaire'],
+        'BR': ['BRA', 'Brazil', 'Brasil'],
+        'BS': ['BHS', 'Bahamas', 'The Bahamas', 'Commonwealth of The Bahamas'],
+        'BT': ['BTN', 'Bhutan'],
+        'BV': ['BVT', 'Bouvet Island'],
+        'BW': ['BWA', 'Botswana'],
+        'BY': ['BLR', 'Belarus'],
+        'BZ': ['BLZ', 'Belize'],
+        'CA': ['CAN', 'Canada'],
+        'CC': ['CCK', 'Cocos (Keeling) Islands', 'Cocos Islands'],
+        'CD': ['COD', 'Democratic Republic of the Congo', 'DR Congo', 'Congo-Kinshasa', 'Congo', 'Zaire'],
+        'CF': ['CAF', 'Central African Republic'],
+        'CG': ['COG', 'Republic of the Congo', 'Congo-Brazzaville', 'Congo'],
+        'CH': ['CHE', 'Switzerland', 'Schweiz', 'Suisse', 'Svizzera'],
+        'CI': ['CIV', "Côte d'Ivoire", 'Ivory Coast'],
+        'CK': ['COK', 'Cook Islands'],
+        'CL': ['CHL', 'Chile'],
+        'CM': ['CMR', 'Cameroon', 'Cameroun'],
+        'CN': ['CHN', 'China', "People's Republic of China"],
+        'CO': ['COL', 'Colombia', 'Republic of Colombia'],
+        'CR': ['CRI', 'Costa Rica'],
+        'CU': ['CUB', 'Cuba'],
+        'CV': ['CPV', 'Cabo Verde', 'Cape Verde'],
+        'CW': ['CUW', 'Curaçao', 'Curacao'],
+        'CX': ['CXR', 'Christmas Island'],
+        'CY': ['CYP', 'Cyprus'],
+        'CZ': ['CZE', 'Czechia', 'Czech Republic'],
+        'DE': ['DEU', 'Germany', 'Deutschland'],
+        'DJ': ['DJI', 'Djibouti'],
+        'DK': ['DNK', 'Denmark', 'Danmark'],
+        'DM': ['DMA', 'Dominica'],
+        'DO': ['DOM', 'Dominican Republic', 'República Dominicana'],
+        'DZ': ['DZA', 'Algeria'],
+        'EC': ['ECU', 'Ecuador'],
+        'EE': ['EST', 'Estonia'],
+        'EG': ['EGY', 'Egypt'],
+        'EH': ['ESH', 'Western Sahara'],
+        'ER': ['ERI', 'Eritrea'],
+        'ES': ['ESP', 'Spain', 'España'],
+        'ET': ['ETH', 'Ethiopia'],
+        'FI': ['FIN', 'Finland', 'Suomi'],
+        'FJ': ['FJI', 'Fiji'],
+        'FK': ['FLK', 'Falkland Islands', 'Islas Malvinas', 'Malvinas'],
+        'FM': ['FSM', 'Micronesia', 'Federated States of Micronesia'],
+        'FO': ['FRO', 'Faroe Islands'],
+        'FR': ['FRA', 'France'],
+        'GA': ['GAB', 'Gabon'],
+        'GB': ['GBR', 'United Kingdom', 'UK', 'Great Britain', 'United Kingdom of Great Britain and Northern Ireland'],
+        'GD': ['GRD', 'Grenada'],
+        'GE': ['GEO', 'Georgia'],
+        'GF': ['GUF', 'French Guiana', 'Guyane', 'Guyane française'],
+        'GG': ['GGY', 'Guernsey'],
+        'GH': ['GHA', 'Ghana'],
+        'GI': ['GIB', 'Gibraltar'],
+        'GL': ['GRL', 'Greenland', 'Kalaallit Nunaat'],
+        'GM': ['GMB', 'Gambia', 'The Gambia'],
+        'GN': ['GIN', 'Guinea'],
+        'GP': ['GLP', 'Guadeloupe'],
+        'GQ': ['GNQ', 'Equatorial Guinea'],
+        'GR': ['GRC', 'Greece', 'Hellas'],
+        'GS': ['SGS', 'South Georgia and the South Sandwich Islands'],
+        'GT': ['GTM', 'Guatemala'],
+        'GU': ['GUM', 'Guam'],
+        'GW': ['GNB', 'Guinea-Bissau'],
+        'GY': ['GUY', 'Guyana'],
+        'HK': ['HKG', 'Hong Kong'],
+        'HM': ['HMD', 'Heard Island and McDonald Islands'],
+        'HN': ['HND', 'Honduras'],
+        'HR': ['HRV', 'Croatia', 'Hrvatska'],
+        'HT': ['HTI', 'Haiti', 'Haïti'],
+        'HU': ['HUN', 'Hungary', 'Magyarország'],
+        'ID': ['IDN', 'Indonesia'],
+        'IE': ['IRL', 'Ireland', 'Éire'],
+        'IL': ['ISR', 'Israel'],
+        'IM': ['IMN', 'Isle of Man'],
+        'IN': ['IND', 'India'],
+        'IO': ['IOT', 'British Indian Ocean Territory'],
+        'IQ': ['IRQ', 'Iraq'],
+        'IR': ['IRN', 'Iran', 'Islamic Republic of Iran'],
+        'IS': ['ISL', 'Iceland', 'Ísland'],
+        'IT': ['ITA', 'Italy', 'Italia'],
+        'JE': ['JEY', 'Jersey'],
+        'JM': ['JAM', 'Jamaica'],
+        'JO': ['JOR', 'Jordan'],
+        'JP': ['JPN', 'Japan'],
+        'KE': ['KEN', 'Kenya'],
+        'KG': ['KGZ', 'Kyrgyzstan'],
+        'KH': ['KHM', 'Cambodia'],
+        'KI': ['KIR', 'Kiribati'],
+        'KM': ['COM', 'Comoros'],
+        'KN': ['KNA', 'Saint Kitts and Nevis', 'St Kitts and Nevis'],
+        'KP': ['PRK', 'North Korea', "Democratic People's Republic of Korea"],
+        'KR': ['KOR', 'South Korea', 'Republic of Korea'],
+        'KW': ['KWT', 'Kuwait'],
+        'KY': ['CYM', 'Cayman Islands'],
+        'KZ': ['KAZ', 'Kazakhstan'],
+        'LA': ['LAO', 'Laos', "Lao People's Democratic Republic"],
+        'LB': ['LBN', 'Lebanon'],
+        'LC': ['LCA', 'Saint Lucia', 'St Lucia'],
+        'LI': ['LIE', 'Liechtenstein'],
+        'LK': ['LKA', 'Sri Lanka'],
+        'LR': ['LBR', 'Liberia'],
+        'LS': ['LSO', 'Lesotho'],
+        'LT': ['LTU', 'Lithuania'],
+        'LU': ['LUX', 'Luxembourg'],
+        'LV': ['LVA', 'Latvia'],
+        'LY': ['LBY', 'Libya'],
+        'MA': ['MAR', 'Morocco'],
+        'MC': ['MCO', 'Monaco'],
+        'MD': ['MDA', 'Moldova', 'Republic of Moldova'],
+        'ME': ['MNE', 'Montenegro'],
+        'MF': ['MAF', 'Saint Martin', 'St Martin'],
+        'MG': ['MDG', 'Madagascar'],
+        'MH': ['MHL', 'Marshall Islands'],
+        'MK': ['MKD', 'North Macedonia', 'Macedonia'],
+        'ML': ['MLI', 'Mali'],
+        'MM': ['MMR', 'Myanmar', 'Burma'],
+        'MN': ['MNG', 'Mongolia'],
+        'MO': ['MAC', 'Macao', 'Macau'],
+        'MP': ['MNP', 'Northern Mariana Islands'],
+        'MQ': ['MTQ', 'Martinique'],
+        'MR': ['MRT', 'Mauritania'],
+        'MS': ['MSR', 'Montserrat'],
+        'MT': ['MLT', 'Malta'],
+        'MU': ['MUS', 'Mauritius'],
+        'MV': ['MDV', 'Maldives'],
+        'MW': ['MWI', 'Malawi'],
+        'MX': ['MEX', 'Mexico', 'México', 'Estados Unidos Mexicanos'],
+        'MY': ['MYS', 'Malaysia'],
+        'MZ': ['MOZ', 'Mozambique', 'Moçambique'],
+        'NA': ['NAM', 'Namibia'],
+        'NC': ['NCL', 'New Caledonia', 'Nouvelle-Calédonie'],
+        'NE': ['NER', 'Niger'],
+        'NF': ['NFK', 'Norfolk Island'],
+        'NG': ['NGA', 'Nigeria'],
+        'NI': ['NIC', 'Nicaragua'],
+        'NL': ['NLD', 'Netherlands', 'The Netherlands', 'Nederland', 'Holland'],
+        'NO': ['NOR', 'Norway', 'Norge'],
+        'NP': ['NPL', 'Nepal'],
+        'NR': ['NRU', 'Nauru'],
+        'NU': ['NIU', 'Niue'],
+        'NZ': ['NZL', 'New Zealand', 'Aotearoa'],
+        'OM': ['OMN', 'Oman'],
+        'PA': ['PAN', 'Panama', 'Panamá'],
+        'PE': ['PER', 'Peru', 'Perú'],
+        'PF': ['PYF', 'French Polynesia', 'Polynésie française'],
+        'PG': ['PNG', 'Papua New Guinea'],
+        'PH': ['PHL', 'Philippines', 'Pilipinas'],
+        'PK': ['PAK', 'Pakistan'],
+        'PL': ['POL', 'Poland', 'Polska'],
+        'PM': ['SPM', 'Saint Pierre and Miquelon'],
+        'PN': ['PCN', 'Pitcairn Islands', 'Pitcairn'],
+        'PR': ['PRI', 'Puerto Rico'],
+        'PS': ['PSE', 'Palestine', 'State of Palestine'],
+        'PT': ['PRT', 'Portugal'],
+        'PW': ['PLW', 'Palau'],
+        'PY': ['PRY', 'Paraguay'],
+        'QA': ['QAT', 'Qatar'],
+        'RE': ['REU', 'Réunion', 'Reunion'],
+        'RO': ['ROU', 'Romania', 'România'],
+        'RS': ['SRB', 'Serbia', 'Srbija'],
+        'RU': ['RUS', 'Russia', 'Russian Federation'],
+        'RW': ['RWA', 'Rwanda'],
+        'SA': ['SAU', 'Saudi Arabia'],
+        'SB': ['SLB', 'Solomon Islands'],
+        'SC': ['SYC', 'Seychelles'],
+        'SD': ['SDN', 'Sudan'],
+        'SE': ['SWE', 'Sweden', 'Sverige'],
+        'SG': ['SGP', 'Singapore'],
+        'SH': ['SHN', 'Saint Helena, Ascension and Tristan da Cunha', 'Saint Helena', 'St Helena'],
+        'SI': ['SVN', 'Slovenia', 'Slovenija'],
+        'SJ': ['SJM', 'Svalbard and Jan Mayen'],
+        'SK': ['SVK', 'Slovakia', 'Slovensko'],
+        'SL': ['SLE', 'Sierra Leone'],
+        'SM': ['SMR', 'San Marino'],
+        'SN': ['SEN', 'Senegal', 'Sénégal'],
+        'SO': ['SOM', 'Somalia'],
+        'SR': ['SUR', 'Suriname', 'Surinam'],
+        'SS': ['SSD', 'South Sudan'],
+        'ST': ['STP', 'São Tomé and Príncipe', 'Sao Tome and Principe'],
+        'SV': ['SLV', 'El Salvador'],
+        'SX': ['SXM', 'Sint Maarten'],
+        'SY': ['SYR', 'Syria', 'Syrian Arab Republic'],
+        'SZ': ['SWZ', 'Eswatini', 'Swaziland'],
+        'TC': ['TCA', 'Turks and Caicos Islands'],
+        'TD': ['TCD', 'Chad', 'Tchad'],
+        'TF': ['ATF', 'French Southern Territories', 'French Southern and Antarctic Lands'],
+        'TG': ['TGO', 'Togo'],
+        'TH': ['THA', 'Thailand'],
+        'TJ': ['TJK', 'Tajikistan'],
+        'TK': ['TKL', 'Tokelau'],
+        'TL': ['TLS', 'Timor-Leste', 'East Timor'],
+        'TM': ['TKM', 'Turkmenistan'],
+        'TN': ['TUN', 'Tunisia'],
+        'TO': ['TON', 'Tonga'],
+        'TR': ['TUR', 'Turkey', 'Türkiye'],
+        'TT': ['TTO', 'Trinidad and Tobago', 'Trinidad'],
+        'TV': ['TUV', 'Tuvalu'],
+        'TW': ['TWN', 'Taiwan'],
+        'TZ': ['TZA', 'Tanzania', 'United Republic of Tanzania'],
+        'UA': ['UKR', 'Ukraine'],
+        'UG': ['UGA', 'Uganda'],
+        'UM': ['UMI', 'United States Minor Outlying Islands'],
+        'US': ['USA', 'United States', 'United States of America', 'US'],
+        'UY': ['URY', 'Uruguay'],
+        'UZ': ['UZB', 'Uzbekistan'],
+        'VA': ['VAT', 'Vatican City', 'Holy See'],
+        'VC': ['VCT', 'Saint Vincent and the Grenadines', 'St Vincent and the Grenadines'],
+        'VE': ['VEN', 'Venezuela', 'Bolivarian Republic of Venezuela', 'República Bolivariana de Venezuela'],
+        'VG': ['VGB', 'British Virgin Islands'],
+        'VI': ['VIR', 'United States Virgin Islands', 'US Virgin Islands', 'U.S. Virgin Islands'],
+        'VN': ['VNM', 'Vietnam', 'Viet Nam'],
+        'VU': ['VUT', 'Vanuatu'],
+        'WF': ['WLF', 'Wallis and Futuna'],
+        'WS': ['WSM', 'Samoa'],
+        'YE': ['YEM', 'Yemen'],
+        'YT': ['MYT', 'Mayotte'],
+        'ZA': ['ZAF', 'South Africa'],
+        'ZM': ['ZMB', 'Zambia'],
+        'ZW': ['ZWE', 'Zimbabwe'],
+    }
+
+    # territory id: sovereign id, for the territories geocoders report as either
+    TERRITORIES = {
+        'AS': 'US', 'GU': 'US', 'MP': 'US', 'PR': 'US', 'UM': 'US', 'VI': 'US',
+        'AW': 'NL', 'BQ': 'NL', 'CW': 'NL', 'SX': 'NL',
+        'BL': 'FR', 'GF': 'FR', 'GP': 'FR', 'MF': 'FR', 'MQ': 'FR', 'NC': 'FR', 'PF': 'FR', 'PM': 'FR', 'RE': 'FR', 'WF': 'FR', 'YT': 'FR',
+        'AI': 'GB', 'BM': 'GB', 'FK': 'GB', 'GI': 'GB', 'KY': 'GB', 'MS': 'GB', 'PN': 'GB', 'SH': 'GB', 'TC': 'GB', 'VG': 'GB',
+        'FO': 'DK', 'GL': 'DK',
+        'HK': 'CN', 'MO': 'CN',
+        'CC': 'AU', 'CX': 'AU', 'NF': 'AU',
+        'AX': 'FI', 'SJ': 'NO',
+    }
+
+    def __init__(self) -> None:
+        self.names = { level: {} for level in Gazetteer.LEVELS }
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        for (id, names) in Gazetteer.COUNTRIES.items():
+            self.add('country', id, [id, *names])
+        for id in Gazetteer.TERRITORIES:
+            self.add('pd1', id, Gazetteer.COUNTRIES[id][1:])
+
+    @classmethod
+    def instance(cls) -> Gazetteer:
+        if cls.__instance is None:
+            cls.__instance = Gazetteer()
+        return cls.__instance
+
+    @classmethod
+    def reset(cls) -> Gazetteer:
+        ''' Replace the instance by one with the built-in names only, keeping its statistics '''
+        statistics = cls.instance().statistics()
+        cls.__instance = Gazetteer()
+        cls.__instance.add_statistics(statistics)
+        return cls.__instance
+
+    @staticmethod
+    @functools.lru_cache(maxsize=65536)
+    def normalize(name: str) -> str:
+        ''' The lower case letters of the name, without diacritics '''
+        return re.sub('[^a-z]', '', unicodedata.normalize('NFKD', str(name)).lower())
+
+    def add(self, level: str, id: str, names: Iterable[str]) -> None:
+        ''' Add the names (and aliases) of the division `id` at the level '''
+        assert level in Gazetteer.LEVELS, f'gazetteer level «{level}» is not one of {Gazetteer.LEVELS}'
+        for name in names:
+            key = Gazetteer.normalize(name)
+            if key:
+                self.names[level][key] = self.names[level].get(key, frozenset()) | {id}
+        self._ids.cache_clear()
+
+    def load(self, path: str) -> int:
+        ''' Add the `level,id,name[,name]*` rows of a CSV file; the number of rows added '''
+        n = 0
+        with open(path, 'r', newline='') as filehandle:
+            for row in csv.reader(filehandle):
+                if not row or row[0].lstrip().startswith('#'):
+                    continue
+                if len(row) < 3 or row[0].strip() not in Gazetteer.LEVELS:
+                    logging.warning(f'{path}: ignoring gazetteer row {row}')
+                    continue
+                self.add(row[0].strip(), row[1].strip(), [r.strip() for r in row[2:]])
+                n += 1
+        logging.info(f'{path}: added {n} gazetteer rows')
+        return n
+
+    def ids(self, name: str, level: Union[str, None] = None) -> FrozenSet[str]:
+        ''' The ids the name may refer to at the level (or at any level) '''
+        return self._ids(Gazetteer.normalize(name) if name else '', level)
+
+    @functools.lru_cache(maxsize=65536)
+    def _ids(self, key: str, level: Union[str, None]) -> FrozenSet[str]:
+        if level is not None:
+            return self.names[level].get(key, frozenset())
+        return frozenset().union(*(self.names[l].get(key, frozenset()) for l in Gazetteer.LEVELS))
+
+    def score(self, a: str, b: str, level: Union[str, None] = None, other_level: Union[str, None] = None) -> Union[int, None]:
+        '''
+        `MATCH` when the name `a` (at `level`) and the name `b` (at
+        `other_level`, by default the same level) are the same division,
+        `MISMATCH` when they are known to be different divisions, and `None`
+        when that takes a fuzzy comparison
+        '''
+        if not (a and b):
+            return None
+        (key_a, key_b) = (Gazetteer.normalize(a), Gazetteer.normalize(b))
+        if not (key_a and key_b):
+            # no Latin letters (Cyrillic, CJK, Arabic, ...): the names are not known
+            result = None
+        elif key_a == key_b:
+            result = Gazetteer.MATCH
+        else:
+            (ids_a, ids_b) = (self.ids(a, level), self.ids(b, other_level or level))
+            if ids_a and ids_b:
+                result = Gazetteer.MATCH if (ids_a & ids_b) else Gazetteer.MISMATCH
+            else:
+                result = None
+        with self.__lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def sovereign(self, id: str) -> str:
+        ''' The id of the sovereign of a territory; otherwise the id itself '''
+        return Gazetteer.TERRITORIES.get(id, id)
+
+    def statistics(self) -> Dict[str, int]:
+        with self.__lock:
+            return { 'gazetteer-hits': self.hits, 'fuzzy-comparisons': self.misses }
+
+    def add_statistics(self, statistics: Dict[str, int]) -> None:
+        ''' Count the comparisons of the `statistics` of another process too '''
+        with self.__lock:
+            self.hits += statistics.get('gazetteer-hits', 0)
+            self.misses += statistics.get('fuzzy-comparisons', 0)
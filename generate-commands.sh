@@ -54,6 +54,9 @@ field-cut-selector() {
 
 
 execute() {
+    # every country is checked by one gqc process, sharing its cache and rate limit
+    manifest="${DATA}/${DATE}.manifest.csv"
+    echo "rm -f '${manifest}'"
     for country in $(find "${HOME}/data" -type f -name '*.original.csv' | \
                      rev | \
                      cut -d/ -f1 | \
@@ -67,9 +70,7 @@ execute() {
                      sort | \
                      uniq
                     ); do
-        inputfile="${DATA}/${DATE}--${country}.input.csv"
         resultsfile="${DATA}/${DATE}--${country}.results.csv"
-        cachefile="~/.gqc/gqc.reverse-lookup.${country}.cache"
         for datafile in $(find "data" -type f -name '*'${country}'.results.csv' | \
                           grep -v "${DATE}--" | \
                           sort | \
@@ -81,10 +82,11 @@ execute() {
             else
                 columnMap=$(column-map "${header}")
                 fields=$(field-cut-selector "${header}")
-                echo "cat '${datafile}' | grep -v ',pass,matching-country-and-pd1,' | python ./csvcut.py -f${fields} | tee '${inputfile}' | python ./gqc.py --cache-file "${cachefile}" > '${resultsfile}' &"
+                echo "echo '${HOME}/${datafile},${resultsfile},\"${fields}\"' >> '${manifest}'"
             fi
         done
     done
+    echo "python ./gqc.py --exclude-verdict pass:matching-country-and-pd1 --manifest '${manifest}'"
 }
 
 
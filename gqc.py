@@ -1,16 +1,41 @@
 #!/usr/bin/env python3
 
+from batch_validate import BatchValidator
 from cache import Cache
 from canonicalize import Canonicalize
+from checkpoint import Checkpoint, LineReader
+from compression import Compression
 from config import Config
 from coordinate import Coordinate
+from deadline import Deadline
+from distributed import Coordinator, WorkQueue, Worker
 from doco import Doco
+from extent_index import ExtentIndex
+from gazetteer import Gazetteer
 from location import Location
-from locationiq import LocationIQ
+from manifest import Manifest
+from planner import Planner
+from pipeline import Pipeline
 from political_division import PoliticalDivision
-
+from prefetch import Prefetcher
+from projection import Projection, VerdictFilter
+from previous import PreviousResults
+from response_status import ResponseStatus
+from results_store import ResultsStore
+from reverse_geocoder import ReverseGeocoder
+from row_context import RowContext
+from row_result import RowResult
+from sampling import Sample
+from service import Service
+from shard_pool import ShardPool
+
+from collections import Counter, deque
+import concurrent.futures
 import csv
+import datetime
 import errno
+import itertools
+import locale
 from fuzzywuzzy import fuzz
 import json
 import logging
@@ -18,6 +43,7 @@ import os.path
 import pathlib
 import re
 import sys
+import threading
 from typing import Any, Dict
 import urllib.error
 
@@ -26,6 +52,9 @@ class GQC:
     '''Geolocation Quality Control (gqc)'''
     SUPER_VERBOSE = False
     MIN_FUZZY_SCORE = 85
+    RESULT_KEYS = RowResult.KEYS
+    # sign permutations of a row looked up at a time (see `_lookup_permutations`)
+    PERMUTATION_LOOKAHEAD = 2
     __instance = None
 
     def __init__(self, argv):
@@ -45,6 +74,7 @@ class GQC:
                             filemode=c[Config.SECTION_SYSTEM]['logging']['filemode'],
                             level=getattr(logging, c[Config.SECTION_GQC]['log-level'].upper(), getattr(logging, 'DEBUG')))
 
+        self.argv = argv
         self.config = Config.instance(argv)
 
         try:
@@ -63,167 +93,496 @@ class GQC:
 
         self.cache = Cache(self.config.value('cache-file'));
 
-        self.locationiq = LocationIQ(self.config)
+        self.deadline = None
+        self.results_store = None
+        self.row_statistics = Counter()
+        self._correction_executor = None
+        self._lock = threading.Lock()
+        self.extent_index = None
+
+        self.configure()
         self.config.log_on_startup()
         return
 
-    def copy_location_to_response(self, coordinate: Coordinate, location: Location, response: Dict[str,Any]):
+    def configure(self, changed=None):
+        '''
+        (Re)build the parts of the checker that follow the settings: all of
+        them, or those that follow the `changed` (section, key) settings (as
+        when a --worker takes the settings of a job)
+        '''
+        def any_changed(*keys):
+            return (changed is None) or any(k in keys for (_, k) in changed)
+
+        if (changed is None) or any((s != Config.SECTION_GQC) or (k == 'provider') for (s, k) in changed):
+            self.geocoder = ReverseGeocoder.create(self.config)
+
+        if any_changed('gazetteer-file'):
+            if changed is not None:
+                # the names of the previous file go too
+                Gazetteer.reset()
+            if self.config.value('gazetteer-file'):
+                Gazetteer.instance().load(self.config.value('gazetteer-file'))
+
+        if any_changed('previous', 'column-assignment', 'first-line-is-header'):
+            self.previous = None
+            if self.config.value('previous'):
+                self.previous = PreviousResults.load(self.config.value('previous'), self.config.active_columns(),
+                                                     len(GQC.RESULT_KEYS), bool(self.config.value('first-line-is-header')))
+
+        # (the index remembers the comparisons of names it made with the gazetteer)
+        if any_changed('extent-index', 'extent-index-file', 'extent-index-cell-degrees', 'extent-index-min-support', 'gazetteer-file'):
+            if self.extent_index:
+                # keep what was observed with the settings replaced
+                self.extent_index.refresh(self.cache)
+                self.extent_index.save(self.extent_index_file)
+            self.extent_index = None
+            if self.config.value('extent-index'):
+                self.extent_index_file = self.config.value('extent-index-file')
+                self.extent_index = ExtentIndex.load(self.extent_index_file,
+                                                     float(self.config.value('extent-index-cell-degrees')),
+                                                     int(self.config.value('extent-index-min-support')))
+                added = self.extent_index.refresh(self.cache)
+                logging.info(f'extent index: added {added} of {len(self.cache)} cache entries')
+
+    def copy_location_to_response(self, coordinate: Coordinate, location: Location, response: RowResult):
         location_coordinate = location.coordinate
         latitude = Canonicalize.latitude(location_coordinate.latitude)
         longitude = Canonicalize.longitude(location_coordinate.longitude)
-        political_division = location.political_division
-        for k,v in political_division.as_dict().items():
-            response[f'location-{k}'] = v
-        response['location-latitude'] = Canonicalize.latitude(latitude)
-        response['location-longitude'] = Canonicalize.longitude(longitude)
-        response['location-error-distance'] = coordinate.distance(location_coordinate)
-        boundingbox = dict(zip(['latitude-south', 'latitude-north', 'longitude-east', 'longitude-west'], (location.metadata['boundingbox'] if 'boundingbox' in location.metadata else [''] * 4)))
-        if boundingbox['latitude-south']:
-            boundingbox['latitude-south'] = Canonicalize.latitude(boundingbox['latitude-south'])
-        if boundingbox['latitude-north']:
-            boundingbox['latitude-north'] = Canonicalize.latitude(boundingbox['latitude-north'])
-        if boundingbox['longitude-east']:
-            boundingbox['longitude-east'] = Canonicalize.longitude(boundingbox['longitude-east'])
-        if boundingbox['longitude-west']: 
-            boundingbox['longitude-west'] = Canonicalize.longitude(boundingbox['longitude-west'])
-        response['location-bounding-box'] = boundingbox
-        if (boundingbox['latitude-south'] and boundingbox['latitude-north'] and boundingbox['longitude-east'] and boundingbox['longitude-west']): 
-            response['location-bounding-box-error-distances'] = {
-                'latitude-north': coordinate.distance(Coordinate(boundingbox['latitude-north'], longitude)),
-                'latitude-south': coordinate.distance(Coordinate(boundingbox['latitude-south'], longitude)),
-                'longitude-east': coordinate.distance(Coordinate(latitude, boundingbox['longitude-east'])),
-                'longitude-west': coordinate.distance(Coordinate(latitude, boundingbox['longitude-west'])),
+        (response.location_country, response.location_pd1, response.location_pd2,
+         response.location_pd3, response.location_pd4, response.location_pd5) = location.political_division
+        response.location_latitude = latitude
+        response.location_longitude = longitude
+        response.location_error_distance = coordinate.distance(location_coordinate)
+        (south, north, east, west) = location.metadata['boundingbox'][:4] if 'boundingbox' in location.metadata else ('', '', '', '')
+        if south:
+            south = Canonicalize.latitude(south)
+        if north:
+            north = Canonicalize.latitude(north)
+        if east:
+            east = Canonicalize.longitude(east)
+        if west:
+            west = Canonicalize.longitude(west)
+        response.location_bounding_box = { 'latitude-south': south, 'latitude-north': north, 'longitude-east': east, 'longitude-west': west }
+        if (south and north and east and west):
+            response.location_bounding_box_error_distances = {
+                'latitude-north': coordinate.distance_to(north, longitude),
+                'latitude-south': coordinate.distance_to(south, longitude),
+                'longitude-east': coordinate.distance_to(latitude, east),
+                'longitude-west': coordinate.distance_to(latitude, west),
             }
         logging.debug(f'coordinate {coordinate}, location {location} => {response}')
 
 
-    def correct_for_territories(self, inrow, response):
-        logging.debug(f'inrow {inrow}')
-        assert 'latitude' in inrow, f'missing "latitude" element'
-        assert 'longitude' in inrow, f'missing "longitude" element'
+    def correct_for_territories(self, context, response):
+        logging.debug(f'inrow {context.row}')
         logging.debug(f'input response {response}')
         # convenience variables
-        coordinate = Coordinate(inrow['latitude'], inrow['longitude'])
+        coordinate = context.input_coordinate
         # the input political devisions in descending order
-        pd = PoliticalDivision(**{c:inrow[c] for c in self.config.location_columns()})
+        pd = context.political_division
         logging.debug(f'pd {pd}')
-        reverse_location = self.reverse_geolocate(coordinate, usecache=True, wait=False)
+        reverse_location = context.location(coordinate, lambda c: self.reverse_geolocate(c, usecache=True, wait=False))
         if reverse_location:
             reverse_pd = reverse_location.political_division
-            if not self._fuzzy_compare_equal(pd.country, reverse_pd.country):
-                response['action'] = 'error'
-                response['reason'] = f'country-mismatch'
-                response['note'] = f'input location «{pd}» {tuple(coordinate)} does not match response location «{reverse_pd}» {tuple(reverse_location.coordinate.canonicalize())}'
-                if self._fuzzy_compare_equal(pd.pd1, reverse_pd.country):
-                    response['reason'] = f'pd1-is-reverse-country'
-                    response['note'] = f'suggestion: change location of {coordinate} from {pd} => {reverse_pd}'
+            if not self._fuzzy_compare_equal(pd.country, reverse_pd.country, 'country', context=context):
+                response.action = 'error'
+                response.reason = f'country-mismatch'
+                response.note = f'input location «{pd}» {tuple(coordinate)} does not match response location «{reverse_pd}» {tuple(reverse_location.coordinate.canonicalize())}'
+                if self._fuzzy_compare_equal(pd.pd1, reverse_pd.country, 'pd1', 'country', context=context):
+                    response.reason = f'pd1-is-reverse-country'
+                    response.note = f'suggestion: change location of {coordinate} from {pd} => {reverse_pd}'
                     self.copy_location_to_response(coordinate, Location(coordinate, reverse_pd), response)
-                if self._fuzzy_compare_equal(pd.country, reverse_pd.pd1):
-                    response['reason'] = f'country-is-reverse-pd1'
-                    response['note'] = f'suggestion: change location of {coordinate} from {pd} => {reverse_pd}'
+                if self._fuzzy_compare_equal(pd.country, reverse_pd.pd1, 'country', 'pd1', context=context):
+                    response.reason = f'country-is-reverse-pd1'
+                    response.note = f'suggestion: change location of {coordinate} from {pd} => {reverse_pd}'
                     self.copy_location_to_response(coordinate, Location(coordinate, reverse_pd), response)
         logging.debug(f'returned response {response}')
         return response
 
 
-    def correct_sign_swap_typos(self, inrow, response):
-        logging.debug(f'inrow {inrow}')
-        assert 'latitude' in inrow, f'missing "latitude" element'
-        assert 'longitude' in inrow, f'missing "longitude" element'
+    def correct_sign_swap_typos(self, context, response):
+        ''' Look for a sign permutation of the coordinate that is in the input political division '''
+        logging.debug(f'inrow {context.row}')
         logging.debug(f'response {response}')
         # convenience variables
-        in_coordinate = Coordinate(inrow['latitude'], inrow['longitude'])
+        in_coordinate = context.input_coordinate
         # the input political devisions in descending order
-        in_pd = PoliticalDivision(**{c:inrow[c] for c in self.config.location_columns()})
+        in_pd = context.political_division
         # the list of locations tuples to try
         coordinates_to_try = in_coordinate.permutations_by_sign()
-        # dictionary mapping each location tuple with it's distance from the input location
-        matches = []
-        for coordinate in coordinates_to_try:
-            logging.debug(f'coordinate {coordinate}')
-            location = self.reverse_geolocate(coordinate, usecache=True, wait=False)
-            logging.debug(f'reverse_geolocate: coordinate {coordinate} => location {location}')
-            if location:
-                comparison = in_pd.fuzzy_compare(location.political_division)
-                if comparison.is_equal:
-                    matches.append((comparison.nmatches, coordinate, comparison, location))
-        if matches:
-            best = max(matches, key=lambda match: match[0])
+        order = { c: n for (n, c) in reversed(list(enumerate(coordinates_to_try))) }
+        # no permutation can match more divisions than the input has
+        depth = len(in_pd.contract())
+        # the permutation matching the most divisions is the best, the first of them (as they are ordered) when they match as many
+        best = None
+        lookups = self._lookup_permutations(coordinates_to_try, context)
+        try:
+            for (n, (coordinate, location)) in enumerate(lookups):
+                context.record(coordinate, location)
+                logging.debug(f'reverse_geolocate: coordinate {coordinate} => location {location}')
+                if location:
+                    comparison = context.compare(location)
+                    if comparison.is_equal and ((best is None) or (comparison.nmatches, -order[coordinate]) > (best[0], -order[best[1]])):
+                        best = (comparison.nmatches, coordinate, comparison, location)
+                        if best[0] >= depth:
+                            if n < len(order) - 1:
+                                context.statistics['permutations-stopped-early'] += 1
+                            break
+        finally:
+            # the permutations not looked up yet are not needed
+            lookups.close()
+        if best:
             logging.debug(f'best {best}')
-            if best:
-                if best[3].coordinate.almostEqual(in_coordinate):
-                    response['action'] = f'pass'
-                    response['reason'] = f'matching-location'
-                else:
-                    # Our "best" is different the original coordinate
-                    distance = best[3].coordinate.distance(in_coordinate)
-                    response['action'] = f'error'
-                    response['reason'] = f'coordinate-sign-error'
-                    response['note'] = f'suggestion: change location from {in_coordinate} to {best[1]} => {best[2].other}'
-                self.copy_location_to_response(in_coordinate, best[3], response)
+            if best[3].coordinate.almostEqual(in_coordinate):
+                response.action = f'pass'
+                response.reason = f'matching-location'
+            else:
+                # Our "best" is different the original coordinate
+                response.action = f'error'
+                response.reason = f'coordinate-sign-error'
+                response.note = f'suggestion: change location from {in_coordinate} to {best[1]} => {best[2].other}'
+            self.copy_location_to_response(in_coordinate, best[3], response)
         logging.debug(f'response {response}')
         return response
 
 
-    def correct_typos(self, inrow, response):
-        result = self.correct_sign_swap_typos(inrow, response)
-        if (response['action'] == 'error') and (response['reason'] == f'country-mismatch'):
-            result = self.correct_for_territories(inrow, response)
+    def _lookup_permutations(self, coordinates, context):
+        '''
+        The (coordinate, location) of the distinct coordinates, most plausible
+        first: the coordinates the row has looked up already and the cached
+        coordinates, then those inside the extent of the input political
+        division (when there is an extent index), then the rest; the
+        coordinates outside that extent last. At most `PERMUTATION_LOOKAHEAD`
+        of them are looked up at a time, in the correction threads, so that
+        closing the generator (when a permutation matches) saves the lookups
+        of the rest.
+        '''
+        known = context.locations
+        political_division = context.political_division
+        ranks = { ExtentIndex.INSIDE: 1, ExtentIndex.UNKNOWN: 2, ExtentIndex.OUTSIDE: 3 }
+        def rank(item):
+            (n, coordinate) = item
+            if (coordinate in known) or (self.cache_key(coordinate) in self.cache):
+                return (0, n)
+            if self.extent_index:
+                return (ranks[self.extent_index.classify(coordinate, political_division)[0]], n)
+            return (2, n)
+        def lookup(coordinate):
+            result = concurrent.futures.Future()
+            if coordinate in known:
+                result.set_result(known[coordinate])
+            elif self.cache_key(coordinate) in self.cache:
+                result.set_result(self.reverse_geolocate(coordinate, True, False))
+            elif context.corrections_cache_only:
+                result.set_result(None)
+                context.statistics['correction-lookups-skipped'] += 1
+            else:
+                result = self._corrections().submit(self.reverse_geolocate, coordinate, True, False)
+            return result
+        ordered = iter(dict.fromkeys(c for (_, c) in sorted(enumerate(coordinates), key=rank)))
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < GQC.PERMUTATION_LOOKAHEAD:
+                    coordinate = next(ordered, None)
+                    if coordinate is None:
+                        break
+                    pending.append((coordinate, lookup(coordinate)))
+                if not pending:
+                    return
+                (coordinate, future) = pending.popleft()
+                yield (coordinate, future.result())
+        finally:
+            for (_, future) in pending:
+                future.cancel()
+
+    def _corrections(self):
+        ''' The threads looking up the sign permutations '''
+        with self._lock:
+            if self._correction_executor is None:
+                self._correction_executor = concurrent.futures.ThreadPoolExecutor(max_workers=int(self.config.value('lookup-threads')),
+                                                                                  thread_name_prefix='gqc-correction')
+            return self._correction_executor
+
+    def correct_typos(self, context, response):
+        result = self.correct_sign_swap_typos(context, response)
+        if (response.action == 'error') and (response.reason == f'country-mismatch'):
+            result = self.correct_for_territories(context, response)
+        if context.statistics['correction-lookups-skipped'] and (response.action == 'error') and \
+           (response.reason in ('country-mismatch', 'incorrect-latitude-longitude')):
+            # a correction might have been found with the lookups skipped
+            response.note = f'{response.reason}: {response.note}'
+            response.reason = 'deadline-correction-skipped'
         return result
 
 
     def execute(self):
-        inputkeys = ('accession-number', 'country', 'pd1', 'latitude', 'longitude')
-        newkeys = ('action', 'reason',
-                   'location-country', 
-                   'location-pd1', 'location-pd2', 'location-pd3', 'location-pd4', 'location-pd5', 
-                   'location-latitude', 'location-longitude', 
-                   'location-error-distance', 'location-bounding-box', 'location-bounding-box-error-distances',
-                   'note'
-                   )
-        columns = self.config.active_columns()
-        logging.debug(f'columns: {columns}')
+        logging.debug(f'columns: {self.config.active_columns()}')
+
+        if self.config.value('plan'):
+            return Planner(self).execute()
 
         try:
-            if not self.reverse_geolocate(Coordinate(latitude=0, longitude=0), usecache=False, wait=False):
-                logging.warning('unable to connect to reverse geolocation service: running in --cache-only mode')
-                self.config.put('cache-enabled', '')
+            reachable = self.config.value('cache-only') or self.geocoder.probe()
         except Exception as e:
             logging.debug(sys.exc_info())
             logging.warning(e, exc_info=True)
+            reachable = False
+        if not reachable:
+            if self.config.value('serve'):
+                # a service lives on: it must not check every row it is sent without the provider
+                raise RuntimeError('unable to connect to reverse geolocation service: not serving (--cache-only serves from the cache alone)')
             logging.warning('unable to connect to reverse geolocation service: running in --cache-only mode')
             self.config.put('cache-enabled', '')
 
-        with open(self.config.value('output-file'), 'w', newline='') as csv_output:
+        if self.config.value('worker'):
+            Worker(self, WorkQueue(self.config.value('worker')), float(self.config.value('distributed-lease-seconds')),
+                   float(self.config.value('distributed-idle-seconds')), float(self.config.value('distributed-poll-seconds'))).execute()
+            return self.finish()
+
+        if self.config.value('serve'):
+            Service(self, self.config.value('serve')).execute()
+            return self.finish()
+
+        if self.config.value('results-store'):
+            self.results_store = ResultsStore(self.config.value('results-store'), GQC.RESULT_KEYS)
+            self.results_store.start(self.config)
+
+        if self.config.value('manifest'):
+            manifest = Manifest.load(self.config.value('manifest'))
+            self.start_deadline([input_file for (input_file, _, _) in manifest.entries])
+            manifest.execute(self)
+            return self.finish()
+
+        input_file = self.config.value('input-file')
+        self.start_deadline([input_file])
+        if self.config.value('sample'):
+            return self.execute_sample(input_file)
+        prefetcher = None
+        if self.config.value('prefetch'):
+            prefetcher = Prefetcher(self)
+            input_file = prefetcher.execute()
+
+        output_file = self.config.value('output-file')
+        file_id = self.results_store.file(self.config.value('input-file'), output_file) if self.results_store else None
+        checkpoint = None
+        resume = None
+        codec = self.config.value('compression')
+        if (int(self.config.value('checkpoint-rows')) > 0) and (input_file == self.config.value('input-file')) and not codec and Checkpoint.applicable(input_file, output_file):
+            checkpoint = Checkpoint(self.config.value('checkpoint-file') or Checkpoint.path_for(output_file), input_file, output_file,
+                                    int(self.config.value('checkpoint-rows')))
+            if self.config.value('resume'):
+                resume = checkpoint.load()
+                logging.info(f'resuming after row {resume["row-number"]} of {input_file}')
+        elif self.config.value('resume'):
+            raise ValueError(f'can only resume a run with checkpoints from a regular uncompressed input file to a regular uncompressed output file')
+
+        with (open(output_file, 'r+' if resume else 'w', newline='') if checkpoint else Compression.open(output_file, 'w', codec)) as csv_output:
+            if resume:
+                # drop anything written after the checkpoint
+                csv_output.truncate(resume['output-offset'])
+                csv_output.seek(resume['output-offset'])
             writer = csv.writer(csv_output)
-            with open(self.config.value('input-file'), newline='') as csv_input:
-                reader = csv.reader(csv_input)
-                row_number = 0
-                for rawrow in reader:
-                    logging.debug(f'rawrow[{row_number}]: {json.dumps(rawrow)}')
-                    row = [''] * len(rawrow)
-                    append = [''] * len(newkeys)
-                    if ((row_number == 0) and self.config.value("first-line-is-header")):
-                        # header row
-                        append = list(newkeys)
-                    else:
-                        row = { k: str(r).strip() for (k,r) in { k: rawrow[c:c+1][0] if bool(rawrow[c:c+1]) else '' for (k, c) in columns.items() }.items() }
-                        logging.debug(f'row[{row_number}]: {json.dumps(row)}')
-                        result = self.process_row(row)
-                        logging.debug(f'process-row-result[{row_number}] {json.dumps(result)}')
-                        for k in newkeys:
-                            assert (k in result), f'process-row result missing an "{k}": result {result}'
-                        append = [result[k] for k in newkeys]
-                    logging.debug(f'row[{row_number}]: {json.dumps(row)}')
-                    logging.debug(f'append[{row_number}]: {json.dumps(append)}')
-                    result = rawrow + append
-                    logging.info(f'result[{row_number}] {result}')
-                    writer.writerow(result)
-                    row_number += 1
-
+            with (open(input_file, 'rb') if checkpoint else Compression.open(input_file)) as csv_input:
+                if checkpoint:
+                    lines = LineReader(csv_input, locale.getpreferredencoding(False))
+                    header = None
+                    if resume:
+                        if self.config.value('first-line-is-header'):
+                            header = next(csv.reader(lines), [])
+                        csv_input.seek(resume['input-offset'])
+                        lines.offset = resume['input-offset']
+                    items = checkpoint.rows(self.select_rows(csv.reader(lines), header=header), lines, (resume['row-number'] + 1) if resume else 0)
+                else:
+                    items = enumerate(self.select_rows(csv.reader(csv_input)))
+                try:
+                    for (row_number, rawrow, append) in self.results(items):
+                        logging.debug(f'append[{row_number}]: {json.dumps(append)}')
+                        result = rawrow + append
+                        logging.info(f'result[{row_number}] {result}')
+                        writer.writerow(result)
+                        self.store_result(file_id, row_number, rawrow, append)
+                        if self.deadline:
+                            self.deadline.done()
+                        if checkpoint:
+                            checkpoint.written(row_number, csv_output)
+                except BaseException:
+                    if checkpoint:
+                        checkpoint.save(csv_output)
+                        logging.warning(f'interrupted: resume with --resume from checkpoint {checkpoint.path}')
+                    raise
+        if checkpoint:
+            checkpoint.remove()
+        if prefetcher:
+            prefetcher.cleanup()
+        return self.finish()
+
+
+    def execute_sample(self, input_file):
+        '''
+        Check a `Sample` of the rows of the input, stratified by country and pd1,
+        writing their results to the output, and estimate the rate of each
+        `action.reason` in the whole input
+        '''
+        seed = self.config.value('sample-seed')
+        sample = Sample.parse(self.config.value('sample'), int(seed) if seed else None)
+        sample.confidence = float(self.config.value('sample-confidence'))
+        columns = self.config.active_columns()
+        strata = { k: columns[k] for k in ('country', 'pd1') }
+        stratum = lambda rawrow: tuple(v.casefold() for v in GQC.row_from_raw(rawrow, strata).values())
+        with Compression.open(input_file) as csv_input:
+            items = enumerate(self.select_rows(csv.reader(csv_input)))
+            header = list(itertools.islice(items, 1)) if self.config.value('first-line-is-header') else []
+            rows = sample.select(items, stratum)
+        logging.info(f'sample: checking {len(rows)} of {sum(sample.population.values())} rows in {len(sample.population)} strata')
+        if self.deadline:
+            self.deadline.total = len(rows)
+        file_id = self.results_store.file(input_file, self.config.value('output-file')) if self.results_store else None
+        with Compression.open(self.config.value('output-file'), 'w', self.config.value('compression')) as csv_output:
+            writer = csv.writer(csv_output)
+            for (row_number, rawrow, append) in self.results(header + rows):
+                result = rawrow + append
+                logging.info(f'result[{row_number}] {result}')
+                writer.writerow(result)
+                self.store_result(file_id, row_number, rawrow, append)
+                if self.deadline:
+                    self.deadline.done()
+                if not (header and row_number == header[0][0]):
+                    sample.record(row_number, ResponseStatus(append[0], append[1]))
+        self.report_sample(sample)
+        return self.finish()
+
+    def report_sample(self, sample):
+        ''' Log the estimates of the sample, and write them to the --sample-report '''
+        estimates = sample.estimates()
+        percent = round(100 * sample.confidence)
+        logging.info(f'sample: estimates ({percent}% intervals) of {sum(sample.population.values())} rows, {100 * sample.coverage():.1f}% in the sampled strata')
+        for e in estimates:
+            logging.info(f'sample: {e.status} {100 * e.rate:.1f}% [{100 * e.low:.1f}%, {100 * e.high:.1f}%] ~{e.rows} rows ({e.sampled} sampled)')
+        if self.config.value('sample-report'):
+            with open(self.config.value('sample-report'), 'w', newline='') as report:
+                writer = csv.writer(report)
+                writer.writerow(['action', 'reason', 'sampled', 'rate', f'low-{percent}', f'high-{percent}', 'estimated-rows'])
+                for e in estimates:
+                    writer.writerow([e.status.action, e.status.reason, e.sampled, f'{e.rate:.4f}', f'{e.low:.4f}', f'{e.high:.4f}', e.rows])
+
+    def store_result(self, file_id, row_number, rawrow, append):
+        ''' Store the result of a row (but not of the header) in the --results-store '''
+        if self.results_store and not ((row_number == 0) and self.config.value('first-line-is-header')):
+            self.results_store.add(file_id, row_number, GQC.row_from_raw(rawrow, self.config.active_columns()), append)
+
+    def start_deadline(self, input_files):
+        ''' Start keeping to the --deadline (or --time-budget) of a run of the input files '''
+        if self.config.value('deadline'):
+            self.deadline = Deadline(float(self.config.value('deadline')), Deadline.count_rows(input_files),
+                                     float(self.config.value('deadline-reserve-seconds')))
+            logging.info(f'deadline {datetime.datetime.fromtimestamp(self.deadline.end).isoformat()} for {self.deadline.total} rows')
+
+    def finish(self):
+        ''' Log the statistics of the run and save the extent index '''
+        logging.info(f'name comparisons {Gazetteer.instance().statistics()}')
+        if self.previous:
+            logging.info(f'previous results {self.previous.statistics}')
+        if self.deadline:
+            logging.info(f'deadline rows by mode {dict(self.deadline.statistics)}')
+        if self.row_statistics:
+            logging.info(f'row evaluation {dict(self.row_statistics)}')
+        if self.geocoder.hedger:
+            logging.info(f'hedging {self.geocoder.hedger.statistics()}')
+        if self.results_store:
+            self.results_store.finish()
+        if self.extent_index:
+            self.extent_index.refresh(self.cache)
+            self.extent_index.save(self.extent_index_file)
+            if self.config.value('extent-index-validate'):
+                logging.info(f'extent index validation {self.extent_index.report()}')
         logging.info('That''s all folks!')
 
 
+    def select_rows(self, reader, fields=None, header=None):
+        '''
+        The raw rows of the reader less the --exclude-verdict rows, projected to
+        the --fields (or `fields`); a reader that does not start at the header
+        row (when resuming) needs the `header` of the input
+        '''
+        fields = fields or self.config.value('fields')
+        projection = Projection.parse(fields) if fields else None
+        exclusions = None
+        if self.config.value('exclude-verdicts'):
+            exclusions = VerdictFilter(self.config.value('exclude-verdicts'), len(GQC.RESULT_KEYS))
+        if not (projection or exclusions):
+            return reader
+        if exclusions and header:
+            exclusions.use_header(header)
+        return self._select_rows(reader, projection, exclusions, header is None)
+
+    def _select_rows(self, reader, projection, exclusions, at_header):
+        for (row_number, row) in enumerate(reader):
+            if at_header and (row_number == 0) and self.config.value('first-line-is-header'):
+                if exclusions:
+                    exclusions.use_header(row)
+            elif exclusions and exclusions.excludes(row):
+                continue
+            yield projection(row) if projection else row
+
+    def results(self, items):
+        '''
+        The `check_rows` results of the items, checked by the --worker processes
+        of the work queue of a --coordinator, or in a `ShardPool` when there are
+        --workers
+        '''
+        if self.config.value('coordinator'):
+            return Coordinator(self, WorkQueue(self.config.value('coordinator')), int(self.config.value('shard-size')),
+                               int(self.config.value('distributed-chunks-ahead')), float(self.config.value('distributed-poll-seconds')),
+                               float(self.config.value('distributed-heartbeat-seconds'))).run(items)
+        workers = int(self.config.value('workers'))
+        if workers > 1:
+            return ShardPool(self, workers, int(self.config.value('shard-size'))).run(items)
+        return self.check_rows(items)
+
+    def check_rows(self, items):
+        ''' The (row-number, raw-row, result-columns) of the (row-number, raw-row) items, in order '''
+        pipeline = Pipeline(self.prepare_row, self.lookup_row, int(self.config.value('lookup-threads')), int(self.config.value('queue-size')))
+        return pipeline.run(self.validate_rows(items))
+
+    def validate_rows(self, items):
+        ''' The (row-number, raw-row, row, validation) of the (row-number, raw-row) items, validated in batches '''
+        validator = BatchValidator(int(self.config.value('latitude-precision')), int(self.config.value('longitude-precision')))
+        batch_size = int(self.config.value('batch-size'))
+        columns = self.config.active_columns()
+        items = iter(items)
+        while True:
+            batch = list(itertools.islice(items, batch_size))
+            if not batch:
+                return
+            rows = [self.row_from_raw(rawrow, columns) for (_, rawrow) in batch]
+            for ((row_number, rawrow), row, validation) in zip(batch, rows, validator.validate(rows)):
+                yield (row_number, rawrow, row, validation)
+
+    def prepare_row(self, item):
+        ''' Check a (row-number, raw-row, row, validation) item: only the valid rows need a lookup '''
+        (row_number, rawrow, row, validation) = item
+        logging.debug(f'rawrow[{row_number}]: {json.dumps(rawrow)}')
+        if ((row_number == 0) and self.config.value("first-line-is-header")):
+            # header row
+            return ((row_number, rawrow, list(GQC.RESULT_KEYS)), False)
+        if self.previous:
+            verdict = self.previous.verdict(rawrow)
+            if verdict is not None:
+                logging.debug(f'previous-verdict[{row_number}]: {json.dumps(verdict)}')
+                return ((row_number, rawrow, verdict), False)
+        logging.debug(f'row[{row_number}]: {json.dumps(row)}')
+        if self.validate_row(row, RowResult(), validation) is None:
+            return (self.lookup_row(item), False)
+        return (item, True)
+
+    def lookup_row(self, item):
+        ''' Reverse geolocate and judge a (row-number, raw-row, row, validation) item '''
+        (row_number, rawrow, row, validation) = item
+        result = self.process_row(row, validation)
+        logging.debug(f'process-row-result[{row_number}] {result}')
+        return (row_number, rawrow, result.columns())
+
     @classmethod
     def instance(cls, argv):
         if not cls.__instance:
@@ -231,7 +590,12 @@ class GQC:
         return cls.__instance
 
 
-    def process_row(self, row):
+    @staticmethod
+    def cache_key(coordinate: Coordinate) -> str:
+        return f'latitude:{coordinate.latitude},longitude:{coordinate.longitude}'
+
+
+    def process_row(self, row, validation=None):
         assert 'accession-number' in row, f'missing "accession-number" element'
         assert 'country' in row, f'missing "country" element'
         assert 'pd1' in row, f'missing "pd1" element'
@@ -239,142 +603,195 @@ class GQC:
         assert 'longitude' in row, f'missing "longitude" element'
         logging.debug(f'row {row}')
 
-        responsekeys = ['action', 'reason', 'accession-number',
-                        'location-bounding-box',
-                        'location-bounding-box-error-distances',
-                        'location-country', 'location-pd1', 'location-pd2', 'location-pd3', 'location-pd4', 'location-pd5',
-                        'location-latitude', 'location-longitude',
-                        'display-name', 'location-error-distance',
-                        'reverse-geolocate-response', 'note',]
-        # Init response
-        response = {k: '' for k in responsekeys}
+        response = RowResult()
+
+        coordinate = self.validate_row(row, response, validation)
+        if coordinate is None:
+            return response
+        context = RowContext(row, coordinate, self.config.location_columns())
+        political_division = context.political_division
+
+        prediction = None
+        if self.extent_index and not (self.config.value('cache-enabled') and (self.cache_key(coordinate) in self.cache)):
+            prediction, level, division = self.extent_index.classify(coordinate, political_division)
+            if not self.config.value('extent-index-validate'):
+                if prediction == ExtentIndex.INSIDE:
+                    response.action = 'pass'
+                    response.reason = 'matching-extent'
+                    response.accession_number = row['accession-number']
+                    response.note = f'input location «{political_division}» {tuple(coordinate)} is inside the extent of the cached locations'
+                    return response
+                if prediction == ExtentIndex.OUTSIDE:
+                    response.action = 'error'
+                    response.reason = f'{level}-outside-extent'
+                    response.accession_number = row['accession-number']
+                    response.note = f'input location «{political_division}» {tuple(coordinate)} is outside the extent of the cached locations: found «{", ".join(division)}»'
+                    return response
+
+        mode = self.deadline.current() if self.deadline else Deadline.FULL
+        if (mode == Deadline.CACHE_ONLY) and not self.config.value('cache-only') and \
+           not (self.config.value('cache-enabled') and (self.cache_key(coordinate) in self.cache)):
+            response.action = 'deferred'
+            response.reason = 'deadline-lookup-skipped'
+            response.accession_number = row['accession-number']
+            response.note = f'{tuple(coordinate)} is not cached and was not looked up to finish by the deadline'
+            return response
+        # the corrections only use cached locations when the deadline is at risk
+        context.corrections_cache_only = (mode != Deadline.FULL)
+
+        try:
+            location = context.location(coordinate, self.reverse_geolocate)
+            logging.debug(f'reverse_geolocate({coordinate}) => {location}')
+            # the corrections need not look the coordinate up again as it was input
+            context.locations.setdefault(context.input_coordinate, location)
+            response.reverse_geolocate_response = location
+            response.accession_number = row['accession-number']
+            if location:
+                self.copy_location_to_response(coordinate, location, response)
+                comparison = context.compare(location)
+                mismatch = next((k for (k, v) in comparison.matches.items() if not v), None)
+                if prediction:
+                    self.extent_index.score(prediction, mismatch not in ('country', 'pd1'))
+                if (mismatch == 'country'):
+                    response.action = 'error'
+                    response.reason = f'{mismatch}-mismatch'
+                    response.note = f'input location «{political_division}» {tuple(coordinate)} does not match response location «{location.political_division}» {tuple(location.coordinate.canonicalize())}'
+                    response = self.correct_typos(context, response)
+                elif (mismatch == 'pd1'):
+                    response.action = 'error'
+                    response.reason = f'{mismatch}-mismatch'
+                    response.note = f'input location «{political_division}» {tuple(coordinate)} does not match response location «{location.political_division}» {tuple(location.coordinate.canonicalize())}'
+                else:
+                    response.action = 'pass'
+                    response.reason = 'matching-location'
+            else:
+                if prediction:
+                    self.extent_index.score(prediction, False)
+                response.action = 'error'
+                response.reason = f'incorrect-latitude-longitude'
+                response.note = f'reverse locate of {tuple(coordinate)} failed - either the latitude or longitude or both are seriously wrong'
+                response = self.correct_typos(context, response)
+        except urllib.error.HTTPError as exception:
+            response.action = f'internal-error'
+            response.reason = f'reverse-geolocate-error'
+            response.note = f'HTTP error «({exception.code}) {exception.reason}»'
+        except urllib.error.URLError as exception:
+            response.action = f'internal-error'
+            response.reason = f'reverse-geolocate-error'
+            response.note = f'error «{exception.reason}»'
+        except Exception as exception:
+            reason = str(exception)
+            logging.exception(f'reverse-geolocate-error~«{reason}»')
+            response.action = f'internal-error'
+            response.reason = f'reverse-geolocate-error'
+            response.note = f'error «{exception}»'
+        with self._lock:
+            self.row_statistics.update(context.statistics)
+        logging.debug(f'response (row {row} {tuple(coordinate)}) => {response}')
+        return response
 
+    @staticmethod
+    def row_from_raw(rawrow, columns) -> Dict[str, str]:
+        ''' The stripped values of the assigned `columns` of a raw CSV row '''
+        return { k: str(rawrow[c]).strip() if c < len(rawrow) else '' for (k, c) in columns.items() }
+
+    def validate_row(self, row, response, validation=None) -> Coordinate:
+        '''
+        Returns the canonical coordinate of the row, or `None` when the row is
+        to be ignored or is in error; in which case the `action`, `reason` and
+        `note` of the response describe why. A `validation` already computed
+        by `BatchValidator` is used as is.
+        '''
+        if validation is not None:
+            (coordinate, fields) = validation
+            response.update(fields)
+            return coordinate
         stringified_row = ''.join(row.values())
         if stringified_row == '':
-            response['action'] = 'ignore'
-            response['reason'] = 'blank-line'
-            return response
+            response.action = 'ignore'
+            response.reason = 'blank-line'
+            return None
         if re.match(r'^\s*#', stringified_row):
-            response['action'] = 'ignore'
-            response['reason'] = 'comment-line'
-            return response
+            response.action = 'ignore'
+            response.reason = 'comment-line'
+            return None
 
         if row['accession-number'] == '':
-            response['action'] = 'error'
-            response['reason'] = 'no-accession-number'
+            response.action = 'error'
+            response.reason = 'no-accession-number'
         if not row['accession-number'].isdecimal():
-            response['action'] = 'error'
-            response['reason'] = 'accession-number-not-integer'
-            response['note' ] = f'«accession-number {row["accession-number"]}» should be a decimal integer'
-            return response
+            response.action = 'error'
+            response.reason = 'accession-number-not-integer'
+            response.note = f'«accession-number {row["accession-number"]}» should be a decimal integer'
+            return None
 
         if not (row['latitude'] or row['longitude']):
-            response['action'] = 'error'
-            response['reason'] = 'no-latitude-or-longitude'
-            return response
+            response.action = 'error'
+            response.reason = 'no-latitude-or-longitude'
+            return None
 
         if not row['latitude']:
-            response['action'] = 'error'
-            response['reason'] = 'no-latitude'
-            return response
+            response.action = 'error'
+            response.reason = 'no-latitude'
+            return None
         try:
             latitude = float(row['latitude'])
             if latitude < -90.0 or latitude > 90.0:
-                response['action'] = 'error'
-                response['reason'] = 'latitude-range-error'
-                response['note' ] = f'latitude «{row["latitude"]}» cannot not be less than -90 or greater then +90'
-                return response
+                response.action = 'error'
+                response.reason = 'latitude-range-error'
+                response.note = f'latitude «{row["latitude"]}» cannot not be less than -90 or greater then +90'
+                return None
         except ValueError:
-            response['action'] = 'error'
-            response['reason'] = 'latitude-number-not-decimal-float'
-            response['note' ] = f'latitude «{row["latitude"]}» must be a floating point (real) number'
-            return response
+            response.action = 'error'
+            response.reason = 'latitude-number-not-decimal-float'
+            response.note = f'latitude «{row["latitude"]}» must be a floating point (real) number'
+            return None
 
         if not row['longitude']:
-            response['action'] = 'error'
-            response['reason'] = 'no-longitude'
-            return response
+            response.action = 'error'
+            response.reason = 'no-longitude'
+            return None
         try:
             longitude = float(row['longitude'])
             if longitude < -360.0 or longitude > 360.0:
-                response['action'] = 'error'
-                response['reason'] = 'longitude-range-error'
-                response['note' ] = f'longitude «{row["longitude"]}» cannot not be less than -360 or greater then +360'
-                return response
+                response.action = 'error'
+                response.reason = 'longitude-range-error'
+                response.note = f'longitude «{row["longitude"]}» cannot not be less than -360 or greater then +360'
+                return None
         except ValueError:
-            response['action'] = 'error'
-            response['reason'] = 'longitude-number-not-decimal-float'
-            response['note' ] = f'longitude «{row["longitude"]}» must be a floating point (real) number'
-            return response
+            response.action = 'error'
+            response.reason = 'longitude-number-not-decimal-float'
+            response.note = f'longitude «{row["longitude"]}» must be a floating point (real) number'
+            return None
 
         latitude = Canonicalize.latitude(row['latitude'])
         longitude = Canonicalize.longitude(row['longitude'])
-        coordinate = Coordinate(latitude, longitude)
-        political_division = PoliticalDivision(**{k: row[k] for k in self.config.location_columns() })
-
-        try:
-            location = self.reverse_geolocate(coordinate)
-            logging.debug(f'reverse_geolocate({coordinate}) => {location}')
-            response['reverse-geolocate-response'] = location
-            response['accession-number'] = row['accession-number']
-            if location:
-                self.copy_location_to_response(coordinate, location, response)
-                mismatch = location.political_division.first_different_division(political_division, contract=True)
-                if (mismatch == 'country'):
-                    response['action'] = 'error'
-                    response['reason'] = f'{mismatch}-mismatch'
-                    response['note'] = f'input location «{political_division}» {tuple(coordinate)} does not match response location «{location.political_division}» {tuple(location.coordinate.canonicalize())}'
-                    response = self.correct_typos(row, response)
-                elif (mismatch == 'pd1'):
-                    response['action'] = 'error'
-                    response['reason'] = f'{mismatch}-mismatch'
-                    response['note'] = f'input location «{political_division}» {tuple(coordinate)} does not match response location «{location.political_division}» {tuple(location.coordinate.canonicalize())}'
-                else:
-                    response['action'] = 'pass'
-                    response['reason'] = 'matching-location'
-            else:
-                response['action'] = 'error'
-                response['reason'] = f'incorrect-latitude-longitude'
-                response['note'] = f'reverse locate of {tuple(coordinate)} failed - either the latitude or longitude or both are seriously wrong'
-                response = self.correct_typos(row, response)
-        except urllib.error.HTTPError as exception:
-            response['action'] = f'internal-error'
-            response['reason'] = f'reverse-geolocate-error'
-            response['note'] = f'HTTP error «({exception.code}) {exception.reason}»'
-        except urllib.error.URLError as exception:
-            response['action'] = f'internal-error'
-            response['reason'] = f'reverse-geolocate-error'
-            response['note'] = f'error «{exception.reason}»'
-        except Exception as exception:
-            reason = str(exception)
-            logging.exception(f'reverse-geolocate-error~«{reason}»')
-            response['action'] = f'internal-error'
-            response['reason'] = f'reverse-geolocate-error'
-            response['note'] = f'error «{exception}»'
-        logging.debug(f'response (row {row} ({latitude}, {longitude})) => {response}')
-        return response
+        return Coordinate(latitude, longitude)
 
     def reverse_geolocate(self, coordinate, usecache=None, wait=True) -> Location:
         if usecache is None:
             usecache = self.config.value('cache-enabled')
-        cachekey=f'latitude:{coordinate.latitude},longitude:{coordinate.longitude}'
+        cachekey = self.cache_key(coordinate)
         location = None
         if usecache and (cachekey in self.cache):
             location = Location.from_json(self.cache[cachekey])
         elif not self.config.value("cache-only"):
-            location = self.locationiq.reverse_geolocate(coordinate, wait)
-            if location and usecache:
+            location = self.geocoder.reverse_geolocate(coordinate, wait)
+            if location and usecache and self.geocoder.is_cacheable(location):
                 self.cache[cachekey] = location.as_json()
+                if self.extent_index:
+                    self.extent_index.observe(cachekey, coordinate, location)
         return location
 
-    def _fuzzy_compare_score(self, a: str, b: str) -> int:
-        return fuzz.token_set_ratio(a, b) if (a and b) else 0
-        result = 0
-        if (a and b):
-            result = fuzz.token_set_ratio(a, b)
-        return result
-    def _fuzzy_compare_equal(self, a: str, b: str) -> int:
-        return (self._fuzzy_compare_score(a, b) >= self.MIN_FUZZY_SCORE)
+    def _fuzzy_compare_score(self, a: str, b: str, level: str = None, other_level: str = None, context=None) -> int:
+        if context:
+            return context.score(a, b, level, other_level, self._fuzzy_compare_score)
+        if not (a and b):
+            return 0
+        result = Gazetteer.instance().score(a, b, level, other_level)
+        return fuzz.token_set_ratio(a, b) if result is None else result
+    def _fuzzy_compare_equal(self, a: str, b: str, level: str = None, other_level: str = None, context=None) -> int:
+        return (self._fuzzy_compare_score(a, b, level, other_level, context) >= self.MIN_FUZZY_SCORE)
 
 
 if __name__ == '__main__':
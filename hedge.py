@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+from collections import deque
+import concurrent.futures
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable
+
+
+class LatencyTracker:
+    ''' The latencies, in seconds, of the most recent requests '''
+    def __init__(self, size: int = 1000) -> None:
+        assert size > 0, f'size must be greater than zero: current value is {size}'
+        self.__latencies = deque(maxlen=size)
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__latencies)
+
+    def observe(self, seconds: float) -> None:
+        with self.__lock:
+            self.__latencies.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        ''' The `q` quantile (nearest rank) of the latencies; `None` if there are none '''
+        assert (q >= 0.0 and q <= 1.0), f'quantile «{q}» is not a number between 0 and 1'
+        with self.__lock:
+            latencies = sorted(self.__latencies)
+        if not latencies:
+            return None
+        return latencies[max(math.ceil(q * len(latencies)) - 1, 0)]
+
+
+class Cancellation:
+    ''' Tells a request that it lost to its duplicate: `cancel()` runs the registered callbacks, such as closing its connection '''
+    def __init__(self) -> None:
+        self.cancelled = False
+        self.__callbacks = []
+        self.__lock = threading.Lock()
+
+    def add(self, callback: Callable[[], None]) -> None:
+        ''' Run `callback` on `cancel()`, or now when already cancelled '''
+        with self.__lock:
+            if not self.cancelled:
+                self.__callbacks.append(callback)
+                return
+        Cancellation.__run(callback)
+
+    def cancel(self) -> None:
+        with self.__lock:
+            self.cancelled = True
+            (callbacks, self.__callbacks) = (self.__callbacks, [])
+        for callback in callbacks:
+            Cancellation.__run(callback)
+
+    @staticmethod
+    def __run(callback: Callable[[], None]) -> None:
+        try:
+            callback()
+        except OSError as exception:
+            logging.debug(f'cancelling a request: {exception}')
+
+
+class Hedger:
+    '''
+    Hedged requests: when a request has not completed by the `quantile` of the
+    latencies observed so far, a duplicate request is issued and whichever
+    answers first wins. At most `max_rate` of the requests are hedged, no
+    request is hedged until `min_samples` latencies have been observed, and
+    at most `max_in_flight` hedges run at a time: the hedges have slots of
+    their own, so that a hedge does not wait behind the slow request it is
+    meant to overtake.
+
+    The request that loses is cancelled (see `Cancellation`) and keeps the
+    hedge slot until it has ended, so that the requests left running count
+    against `max_in_flight` as well.
+    '''
+    def __init__(self, quantile: float = 0.95, max_rate: float = 0.05, min_samples: int = 20, max_workers: int = 4, max_in_flight: int = 1) -> None:
+        assert (quantile > 0.0 and quantile < 1.0), f'hedge-quantile must be between 0 and 1: current value is {quantile}'
+        assert (max_rate >= 0.0 and max_rate <= 1.0), f'hedge-max-rate must be between 0 and 1: current value is {max_rate}'
+        assert max_in_flight > 0, f'max_in_flight must be greater than zero: current value is {max_in_flight}'
+        self.quantile = quantile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers + max_in_flight, thread_name_prefix='gqc-hedge')
+        self.__slots = threading.BoundedSemaphore(max_in_flight)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.__lock = threading.Lock()
+
+    def call(self, fn: Callable[[Cancellation], Any]) -> Any:
+        ''' The result of `fn(cancellation)`, hedged with a duplicate `fn(cancellation)` when it is slow '''
+        with self.__lock:
+            self.requests += 1
+        threshold = self.latencies.quantile(self.quantile) if len(self.latencies) >= self.min_samples else None
+        start = time.monotonic()
+        cancellations = { 'primary': Cancellation(), 'hedge': Cancellation() }
+        primary = self.executor.submit(fn, cancellations['primary'])
+        if threshold is not None:
+            concurrent.futures.wait([primary], timeout=threshold)
+        if primary.done() or (threshold is None) or not self._allow_hedge():
+            result = primary.result()
+            self.latencies.observe(time.monotonic() - start)
+            return result
+        logging.debug(f'hedging a request still running after {threshold:.3f} seconds')
+        hedge = self.executor.submit(fn, cancellations['hedge'])
+        # the slot is free once both requests have ended, the winner and the loser
+        hedge.add_done_callback(lambda _: primary.add_done_callback(lambda _: self.__slots.release()))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.latencies.observe(time.monotonic() - start)
+                    cancellations['primary' if future is hedge else 'hedge'].cancel()
+                    if future is hedge:
+                        with self.__lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _allow_hedge(self) -> bool:
+        with self.__lock:
+            if self.hedges + 1 > self.max_rate * self.requests:
+                return False
+            if not self.__slots.acquire(blocking=False):
+                return False
+            self.hedges += 1
+            return True
+
+    def statistics(self) -> dict:
+        with self.__lock:
+            return { 'requests': self.requests, 'hedges': self.hedges, 'hedge-wins': self.hedge_wins,
+                     f'p{round(self.quantile * 100)}-seconds': self.latencies.quantile(self.quantile) }
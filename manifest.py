@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+from compression import Compression
+from projection import Projection
+from validate import Validate
+
+from collections import deque
+import contextlib
+import csv
+import itertools
+import logging
+import os
+import re
+from typing import Iterator, List, Tuple
+
+
+class Manifest:
+    '''
+    A batch of input files to check in one run (`--manifest`), each with the
+    output file of its results.
+
+    The manifest is a CSV file of `input,output[,fields]` lines, where the
+    optional (quoted) `fields` are the --fields of that input file; blank
+    lines and lines starting with '#' are ignored, and relative paths are
+    relative to the directory of the manifest.
+
+    The files are checked by one `GQC`, so the cache is loaded, the service
+    probed and the request rate limited once for all of them, and the rows of
+    all the files share one pipeline (or pool of --workers). The files take
+    turns of `batch-size` rows, round robin, so every file makes progress
+    whatever the size of the others.
+    '''
+    COMMENT = re.compile(r'^\s*#')
+
+    def __init__(self, entries: List[Tuple[str, str, str]]) -> None:
+        assert entries, f'a manifest needs at least one input and output file'
+        outputs = [o for (_, o, _) in entries]
+        assert len(set(outputs)) == len(outputs), f'manifest output files must be different: {outputs}'
+        self.entries = entries
+
+    @staticmethod
+    def load(path: str) -> 'Manifest':
+        directory = os.path.dirname(os.path.realpath(path))
+        entries = []
+        with open(path, newline='') as filehandle:
+            for (line_number, row) in enumerate(csv.reader(filehandle), 1):
+                if (not ''.join(row).strip()) or Manifest.COMMENT.match(row[0]):
+                    continue
+                if len(row) not in (2, 3):
+                    raise ValueError(f'{path}:{line_number}: expected «input,output[,fields]», not «{",".join(row)}»')
+                (input_file, output_file) = (os.path.join(directory, f.strip()) for f in row[:2])
+                fields = row[2].strip() if len(row) == 3 else ''
+                if fields: Projection.parse(fields)
+                if not Validate.file_readable(input_file): raise ValueError(f'{path}:{line_number}: Can not read input file: {input_file}')
+                if not Validate.file_writable(output_file): raise ValueError(f'{path}:{line_number}: Can not write to output file: {output_file}')
+                entries.append((input_file, output_file, fields))
+        return Manifest(entries)
+
+    def execute(self, gqc) -> None:
+        turn = int(gqc.config.value('batch-size'))
+        # the file of each row handed to the pipeline, in order: the results come back in the same order
+        owners = deque()
+        counts = [0] * len(self.entries)
+        with contextlib.ExitStack() as stack:
+            readers = []
+            writers = []
+            file_ids = []
+            for (input_file, output_file, fields) in self.entries:
+                reader = csv.reader(stack.enter_context(Compression.open(input_file)))
+                readers.append(enumerate(gqc.select_rows(reader, fields)))
+                writers.append(csv.writer(stack.enter_context(Compression.open(output_file, 'w', gqc.config.value('compression')))))
+                file_ids.append(gqc.results_store.file(input_file, output_file) if gqc.results_store else None)
+            logging.info(f'manifest: checking {len(self.entries)} files')
+            for (row_number, rawrow, append) in gqc.results(self._schedule(readers, turn, owners)):
+                i = owners.popleft()
+                result = rawrow + append
+                logging.info(f'result[{i}:{row_number}] {result}')
+                writers[i].writerow(result)
+                gqc.store_result(file_ids[i], row_number, rawrow, append)
+                counts[i] += 1
+                if gqc.deadline:
+                    gqc.deadline.done()
+        for ((input_file, output_file, _), count) in zip(self.entries, counts):
+            logging.info(f'manifest: {count} rows from {input_file} to {output_file}')
+
+    @staticmethod
+    def _schedule(readers: List[Iterator], turn: int, owners: deque) -> Iterator[Tuple[int, List[str]]]:
+        ''' The rows of the readers, `turn` rows of each in turn, noting the reader of each in `owners` '''
+        active = deque(enumerate(readers))
+        while active:
+            (i, reader) = active.popleft()
+            rows = list(itertools.islice(reader, turn))
+            for item in rows:
+                owners.append(i)
+                yield item
+            if len(rows) == turn:
+                active.append((i, reader))
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+from config import Config
+from reverse_geocoder import ReverseGeocoder
+
+
+class Nominatim(ReverseGeocoder):
+    '''
+    A Nominatim compatible reverse geolocation service, such as a
+    self-hosted Nominatim server (https://nominatim.org)
+    '''
+    # Nominatim does not normalize the address the way LocationIQ does, so
+    # the political division may be found under several different keys
+    ADDRESS_KEYS = {
+        'country': ['country'],
+        'pd1': ['state', 'province', 'region'],
+        'pd2': ['county', 'state_district'],
+        'pd3': ['city', 'town', 'village', 'municipality', 'hamlet'],
+        'pd4': ['suburb', 'city_district', 'borough'],
+        'pd5': ['neighbourhood', 'quarter'],
+    }
+    # Nominatim answers an unknown location with `200 OK` and an error message
+    # where LocationIQ answers `404 NOT FOUND`
+    NOT_FOUND_ERRORS = ['unable to geocode']
+
+    def __init__(self, config: Config) -> None:
+        super().__init__(config, Config.SECTION_NOMINATIM)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+
+class Pipeline:
+    '''
+    A streaming pipeline of three stages connected by bounded queues:
+
+        *   a reader thread that pulls the items and `prepare`s each one;
+            `prepare(item)` returns `(result, True)` when the result still
+            needs the (slow) `process` stage, and `(result, False)` when it is
+            already final
+        *   `workers` threads that `process` the results that need it
+        *   the caller, iterating `run(items)`, which receives the final
+            results in the order of the items
+
+    Results that finish early wait in a reorder buffer until every earlier
+    result has been delivered. At most `queue_size` items are in flight
+    (queued, processing or waiting to be delivered), so memory does not grow
+    with the number of items.
+
+    When the caller stops iterating early (a failure is raised, or it closes
+    the iterator) the reader stops reading, the workers drop the results not
+    yet processed, and all the threads end.
+    '''
+    __END = object()
+
+    class _Failure:
+        def __init__(self, exception: BaseException) -> None:
+            self.exception = exception
+
+    def __init__(self, prepare: Callable[[Any], Tuple[Any, bool]], process: Callable[[Any], Any], workers: int = 8, queue_size: int = 1000) -> None:
+        assert workers > 0, f'workers must be greater than zero: current value is {workers}'
+        assert queue_size > 0, f'queue-size must be greater than zero: current value is {queue_size}'
+        self.prepare = prepare
+        self.process = process
+        self.workers = workers
+        self.queue_size = queue_size
+
+    def run(self, items: Iterable[Any]) -> Iterator[Any]:
+        ''' The final results of the items, in the order of the items '''
+        slots = threading.BoundedSemaphore(self.queue_size)
+        # bounded by the slots
+        work = queue.Queue()
+        stop = threading.Event()
+        finished = {}
+        condition = threading.Condition()
+        total = [None]
+
+        def deliver(n, result):
+            with condition:
+                finished[n] = result
+                condition.notify()
+
+        def reader():
+            n = 0
+            try:
+                for item in items:
+                    slots.acquire()
+                    if stop.is_set():
+                        break
+                    try:
+                        (result, more) = self.prepare(item)
+                    except Exception as exception:
+                        (result, more) = (Pipeline._Failure(exception), False)
+                    if more:
+                        work.put((n, result))
+                    else:
+                        deliver(n, result)
+                    n += 1
+            except Exception as exception:
+                logging.exception(f'pipeline reader failed after {n} items')
+                slots.acquire()
+                deliver(n, Pipeline._Failure(exception))
+                n += 1
+            finally:
+                for _ in range(self.workers):
+                    work.put(Pipeline.__END)
+                with condition:
+                    total[0] = n
+                    condition.notify()
+
+        def worker():
+            while True:
+                task = work.get()
+                if task is Pipeline.__END:
+                    return
+                if stop.is_set():
+                    continue
+                (n, result) = task
+                try:
+                    result = self.process(result)
+                except Exception as exception:
+                    result = Pipeline._Failure(exception)
+                deliver(n, result)
+
+        threads = [threading.Thread(target=reader, name='gqc-reader', daemon=True)]
+        threads += [threading.Thread(target=worker, name=f'gqc-worker-{i}', daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        n = 0
+        try:
+            while True:
+                with condition:
+                    while (n not in finished) and (total[0] is None or n < total[0]):
+                        condition.wait()
+                    if n not in finished:
+                        break
+                    result = finished.pop(n)
+                slots.release()
+                if isinstance(result, Pipeline._Failure):
+                    raise result.exception
+                yield result
+                n += 1
+            for thread in threads:
+                thread.join()
+        finally:
+            if any(thread.is_alive() for thread in threads):
+                # stopped early: unblock the reader and the workers so that they end
+                stop.set()
+                for _ in range(self.queue_size):
+                    try:
+                        slots.release()
+                    except ValueError:
+                        break
+                for _ in range(self.workers):
+                    work.put(Pipeline.__END)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+from compression import Compression
+from row_result import RowResult
+
+import csv
+import logging
+from typing import Any, Dict
+
+
+class Planner:
+    '''
+    Estimates the work of a gqc run without performing it (`--plan`, `--dry-run`).
+
+    The input is streamed once, each row is validated and canonicalized the
+    same way `GQC.process_row` does it, and the cache is probed (never the
+    reverse geolocation service) to count how many lookups would be answered
+    from the cache and how many would need an API call.
+    '''
+    def __init__(self, gqc) -> None:
+        self.gqc = gqc
+        self.config = gqc.config
+
+    def execute(self) -> None:
+        plan = self.plan()
+        logging.info(f'plan {plan}')
+        with open(self.config.value('output-file'), 'w') as output:
+            output.write(self.report(plan))
+
+    def plan(self) -> Dict[str, Any]:
+        columns = self.config.active_columns()
+        cache_enabled = bool(self.config.value('cache-enabled'))
+        cache_only = bool(self.config.value('cache-only'))
+        rows = 0
+        ignored = 0
+        invalid = 0
+        valid = 0
+        row_cache_hits = 0
+        coordinates = set()
+        with Compression.open(self.config.value('input-file')) as csv_input:
+            reader = self.gqc.select_rows(csv.reader(csv_input))
+            for row_number, rawrow in enumerate(reader):
+                if (row_number == 0) and self.config.value('first-line-is-header'):
+                    continue
+                rows += 1
+                response = RowResult()
+                coordinate = self.gqc.validate_row(self.gqc.row_from_raw(rawrow, columns), response)
+                if coordinate is None:
+                    if response.action == 'ignore':
+                        ignored += 1
+                    else:
+                        invalid += 1
+                    continue
+                valid += 1
+                if cache_enabled and (self.gqc.cache_key(coordinate) in self.gqc.cache):
+                    row_cache_hits += 1
+                coordinates.add(coordinate)
+
+        cached = { c for c in coordinates if self.gqc.cache_key(c) in self.gqc.cache }
+        # Sign permutations are always looked up through the cache (see `GQC.correct_sign_swap_typos`)
+        permutations = { p for c in coordinates for p in c.permutations_by_sign() } - coordinates
+        uncached_permutations = { p for p in permutations if self.gqc.cache_key(p) not in self.gqc.cache }
+        if cache_only:
+            required_calls = 0
+            permutation_calls = 0
+        elif cache_enabled:
+            required_calls = len(coordinates) - len(cached)
+            permutation_calls = len(uncached_permutations)
+        else:
+            required_calls = valid
+            permutation_calls = len(uncached_permutations)
+        seconds_per_call = self.gqc.geocoder.estimated_seconds_per_request()
+        return {
+            'input-file': self.config.value('input-file'),
+            'rows': rows,
+            'ignored-rows': ignored,
+            'invalid-rows': invalid,
+            'valid-rows': valid,
+            'unique-coordinates': len(coordinates),
+            'cache-hits': row_cache_hits,
+            'unique-cache-hits': len(cached),
+            'api-calls': required_calls,
+            'api-calls-worst-case': required_calls + permutation_calls,
+            'seconds-per-api-call': seconds_per_call,
+            'wall-time-seconds': required_calls * seconds_per_call,
+            'wall-time-seconds-worst-case': (required_calls + permutation_calls) * seconds_per_call,
+        }
+
+    def report(self, plan: Dict[str, Any]) -> str:
+        lines = [f'{k}: {v}' for (k, v) in plan.items()]
+        lines.append(f'wall-time: {Planner.duration(plan["wall-time-seconds"])}')
+        lines.append(f'wall-time-worst-case: {Planner.duration(plan["wall-time-seconds-worst-case"])}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def duration(seconds: float) -> str:
+        ''' Format a number of seconds as «[Nd ]HH:MM:SS» '''
+        seconds = int(round(seconds))
+        days, seconds = divmod(seconds, 86400)
+        hours, seconds = divmod(seconds, 3600)
+        minutes, seconds = divmod(seconds, 60)
+        return (f'{days}d ' if days else '') + f'{hours:02d}:{minutes:02d}:{seconds:02d}'
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
 from __future__ import annotations
-from copy import deepcopy
 from fuzzywuzzy import fuzz
+from gazetteer import Gazetteer
 import json
 import logging
 import string
@@ -56,8 +56,8 @@ class PoliticalDivision(__PoliticalDivisionBase):
         return str(self.rcontract())
 
     def as_dict(self) -> Dict[str, str]:
-        '''Overrides the default implementation'''
-        return deepcopy(self._asdict())
+        '''Overrides the default implementation: the divisions are strings, so a new dict is a copy'''
+        return self._asdict()
 
     def as_json(self) -> str:
         return json.dumps(self.as_dict())
@@ -107,7 +107,7 @@ class PoliticalDivision(__PoliticalDivisionBase):
         _other = { **_empty, **_other}
         inputs = { f: (v, _other[f]) for (f, v) in _self.items() }
         equality = { f: (v[0] == v[1]) for (f, v) in inputs.items() }
-        scores = { f: fuzz.token_set_ratio(v[0], v[1]) for (f, v) in inputs.items() if v[0] or v[1] }
+        scores = { f: PoliticalDivision.score(v[0], v[1], f) for (f, v) in inputs.items() if v[0] or v[1] }
         values = scores.values()
         max_score = max(values) if values else 0
         non_zero_values = [v for v in values if v > 0]
@@ -129,6 +129,12 @@ class PoliticalDivision(__PoliticalDivisionBase):
                                                       is_contracted=contract)
         return result
 
+    @staticmethod
+    def score(a: str, b: str, level: str = None) -> int:
+        ''' The gazetteer score of the names when they are known to it; otherwise their fuzzy score '''
+        result = Gazetteer.instance().score(a, b, level)
+        return fuzz.token_set_ratio(a, b) if result is None else result
+
     def is_equal(self, other: PoliticalDivision, contract: bool = False) -> bool:
         nonemptyfields = len(list(filter(None, self.as_dict().values())))
         compare = self.fuzzy_compare(other, contract=contract)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+from compression import Compression
+from coordinate import Coordinate
+from deadline import Deadline
+from extent_index import ExtentIndex
+from location import Location
+from political_division import PoliticalDivision
+from row_result import RowResult
+from spatial import Spatial
+
+from collections import deque
+import concurrent.futures
+import csv
+import logging
+import os
+import shutil
+import sqlite3
+import stat
+from typing import Callable, Iterator, Tuple
+
+
+class CoordinateSet:
+    '''
+    A set of coordinates that spills to an SQLite table on disk once it holds
+    more than `spill_size` coordinates, so that it is not limited by memory.
+    Iterating the set gives the coordinates in the order of their `key` (such
+    as `Spatial.key`), or else in the order they were added.
+    '''
+    def __init__(self, path: str, spill_size: int = 1000000, key: Callable[[Coordinate], int] = None) -> None:
+        assert spill_size > 0, f'prefetch-spill-size must be greater than zero: current value is {spill_size}'
+        self.path = path
+        self.spill_size = spill_size
+        self.key = key
+        self.__memory = {}
+        self.__db = None
+        self.__length = 0
+
+    def __contains__(self, coordinate: Coordinate) -> bool:
+        if self.__db is None:
+            return coordinate in self.__memory
+        return self.__db.execute('SELECT 1 FROM coordinates WHERE latitude = ? AND longitude = ?', tuple(coordinate)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[Coordinate]:
+        if self.__db is None:
+            yield from (sorted(self.__memory, key=self.key) if self.key else list(self.__memory))
+            return
+        for (latitude, longitude) in self.__db.execute('SELECT latitude, longitude FROM coordinates ORDER BY position, rowid'):
+            yield Coordinate(latitude, longitude)
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def add(self, coordinate: Coordinate) -> bool:
+        ''' Add the coordinate; `True` if it was not already in the set '''
+        if self.__db is None:
+            if coordinate in self.__memory:
+                return False
+            self.__memory[coordinate] = None
+            self.__length += 1
+            if self.__length > self.spill_size:
+                self._spill()
+            return True
+        if self.__db.execute('INSERT OR IGNORE INTO coordinates VALUES (?, ?, ?)', self._record(coordinate)).rowcount:
+            self.__length += 1
+            return True
+        return False
+
+    def close(self) -> None:
+        if self.__db is not None:
+            self.__db.close()
+            self.__db = None
+            os.remove(self.path)
+        self.__memory = {}
+
+    def _spill(self) -> None:
+        logging.info(f'spilling {self.__length} coordinates to {self.path}')
+        self.__db = sqlite3.connect(self.path, isolation_level=None)
+        self.__db.execute('PRAGMA journal_mode = OFF')
+        self.__db.execute('PRAGMA synchronous = OFF')
+        self.__db.execute('CREATE TABLE coordinates (latitude REAL, longitude REAL, position INTEGER, PRIMARY KEY (latitude, longitude))')
+        self.__db.executemany('INSERT INTO coordinates VALUES (?, ?, ?)', (self._record(c) for c in self.__memory))
+        self.__memory = {}
+
+    def _record(self, coordinate: Coordinate) -> Tuple[float, float, int]:
+        return (coordinate.latitude, coordinate.longitude, self.key(coordinate) if self.key else None)
+
+
+class Prefetcher:
+    '''
+    Resolves the coordinates of the input in bulk before the rows are checked
+    (`--prefetch`), so that checking the rows only reads the cache.
+
+    The input is streamed once to collect the unique valid coordinates that
+    are not cached, which are then looked up by `lookup-threads` threads at
+    once. With `--prefetch-permutations` a second pass collects the sign
+    permutations of the rows that `GQC.correct_sign_swap_typos` will try (rows
+    whose location is unknown or in another country) and looks those up too.
+
+    With `--spatial-order` the coordinates are looked up in the order of a
+    Hilbert curve (see `Spatial`) rather than the order of the input, so that
+    nearby coordinates are looked up together; the output is in input order
+    all the same.
+
+    Input that is not a regular file (such as the default standard input) is
+    spooled to a temporary file while it is read, and `execute` returns the
+    file the rows are to be checked from.
+    '''
+    def __init__(self, gqc) -> None:
+        self.gqc = gqc
+        self.config = gqc.config
+        self.tmpdir = self.config.sys_get('tmpdir')
+        self.threads = int(self.config.value('lookup-threads'))
+        self.spill_size = int(self.config.value('prefetch-spill-size'))
+        # look nearby coordinates up together
+        self.key = Spatial.key if self.config.value('spatial-order') else None
+        self.statistics = { 'unique-coordinates': 0, 'prefetched': 0, 'permutations-prefetched': 0, 'failed': 0 }
+        self.spool = None
+
+    def cleanup(self) -> None:
+        if self.spool:
+            os.remove(self.spool)
+            self.spool = None
+
+    def execute(self) -> str:
+        ''' Prefetch the locations of the input; the path to check the rows from '''
+        input_file = self.config.value('input-file')
+        if not self.config.value('cache-enabled') or self.config.value('cache-only'):
+            logging.warning('prefetch needs the cache and the reverse geolocation service: not prefetching')
+            return input_file
+        if not stat.S_ISREG(os.stat(input_file).st_mode):
+            self.spool = os.path.join(self.tmpdir, 'input.csv')
+            with open(input_file, 'rb') as source, open(self.spool, 'wb') as target:
+                shutil.copyfileobj(source, target, 1 << 20)
+            input_file = self.spool
+        missing = CoordinateSet(os.path.join(self.tmpdir, 'prefetch.sqlite'), self.spill_size, self.key)
+        try:
+            for (_, row, coordinate) in self.rows(input_file):
+                if (self.gqc.cache_key(coordinate) not in self.gqc.cache) and not self.decided_by_extent(row, coordinate):
+                    missing.add(coordinate)
+            self.statistics['unique-coordinates'] = len(missing)
+            self.statistics['prefetched'] = self.resolve(missing)
+        finally:
+            missing.close()
+        if self.config.value('prefetch-permutations'):
+            permutations = CoordinateSet(os.path.join(self.tmpdir, 'prefetch-permutations.sqlite'), self.spill_size, self.key)
+            try:
+                for (_, row, coordinate) in self.rows(input_file):
+                    if self.needs_permutations(row, coordinate):
+                        for p in coordinate.permutations_by_sign():
+                            if self.gqc.cache_key(p) not in self.gqc.cache:
+                                permutations.add(p)
+                self.statistics['permutations-prefetched'] = self.resolve(permutations, wait=False)
+            finally:
+                permutations.close()
+        logging.info(f'prefetch {self.statistics}')
+        return input_file
+
+    def decided_by_extent(self, row, coordinate: Coordinate) -> bool:
+        ''' Whether the extent index decides the row without a lookup (see `GQC.process_row`) '''
+        if not self.gqc.extent_index or self.config.value('extent-index-validate'):
+            return False
+        political_division = PoliticalDivision(**{k: row[k] for k in self.config.location_columns()})
+        (prediction, _, _) = self.gqc.extent_index.classify(coordinate, political_division)
+        return prediction in (ExtentIndex.INSIDE, ExtentIndex.OUTSIDE)
+
+    def needs_permutations(self, row, coordinate: Coordinate) -> bool:
+        ''' Whether checking the row will try the sign permutations of its coordinate '''
+        key = self.gqc.cache_key(coordinate)
+        if key not in self.gqc.cache:
+            return not self.decided_by_extent(row, coordinate)
+        location = Location.from_json(self.gqc.cache[key])
+        political_division = PoliticalDivision(**{k: row[k] for k in self.config.location_columns()})
+        return location.political_division.first_different_division(political_division, contract=True) == 'country'
+
+    def resolve(self, coordinates: CoordinateSet, wait: bool = True) -> int:
+        '''
+        Look up the coordinates, `lookup-threads` at a time; the number found.
+        The lookups are paced as those of the rows are, unless `wait` is false,
+        as for the sign permutations, which are looked up without the
+        `pace-by-backoff` pauses when the rows are checked too (but within
+        `requests-per-second`)
+        '''
+        cache = self.gqc.cache
+        found = 0
+        # save the cache every so often rather than after every lookup
+        cache.persist = False
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='gqc-prefetch') as executor:
+                pending = deque()
+                def complete(future):
+                    nonlocal found
+                    try:
+                        found += 1 if future.result() else 0
+                    except Exception as exception:
+                        self.statistics['failed'] += 1
+                        logging.warning(f'prefetch failed: {exception}')
+                for (n, coordinate) in enumerate(coordinates):
+                    if self.gqc.deadline and (self.gqc.deadline.current() == Deadline.CACHE_ONLY):
+                        logging.warning(f'prefetch stopped after {n} lookups to finish by the deadline')
+                        break
+                    if len(pending) >= 2 * self.threads:
+                        complete(pending.popleft())
+                    pending.append(executor.submit(self.gqc.reverse_geolocate, coordinate, True, wait))
+                    if n % 1000 == 999:
+                        cache.flush()
+                while pending:
+                    complete(pending.popleft())
+        finally:
+            cache.persist = True
+            cache.flush()
+        return found
+
+    def rows(self, input_file: str):
+        ''' The (row-number, row, coordinate) of the valid rows of the input '''
+        with Compression.open(input_file) as csv_input:
+            items = enumerate(self.gqc.select_rows(csv.reader(csv_input)))
+            for (row_number, _, row, validation) in self.gqc.validate_rows(items):
+                if (row_number == 0) and self.config.value('first-line-is-header'):
+                    continue
+                coordinate = self.gqc.validate_row(row, RowResult(), validation)
+                if coordinate is not None:
+                    yield (row_number, row, coordinate)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+from compression import Compression
+
+import csv
+import hashlib
+import logging
+import os
+from typing import Dict, List, Sequence
+
+
+class PreviousResults:
+    '''
+    The verdicts of a previous results file (`--previous`), so that rows that
+    have not changed since are not checked again.
+
+    The verdicts are indexed by the row's `accession-number` and a digest of
+    the values of its assigned columns (see `Config.active_columns`), so a row
+    whose country, political divisions or coordinates changed -- or a new
+    row -- is not found and is checked. Verdicts of `internal-error` (such as
+    a failed request to the reverse geolocation service) and those cut short
+    by a deadline are not kept.
+    '''
+    SKIPPED_ACTIONS = ('internal-error', 'deferred')
+    SKIPPED_REASONS = ('deadline-correction-skipped',)
+
+    def __init__(self, columns: Dict[str, int]) -> None:
+        assert 'accession-number' in columns, f'the accession-number column must be assigned: columns {columns}'
+        self.columns = columns
+        self.verdicts = {}
+        self.statistics = { 'copied': 0, 'checked': 0 }
+
+    def digest(self, rawrow: Sequence[str]) -> bytes:
+        ''' The digest of the (stripped) values of the assigned columns of the raw row '''
+        values = [f'{k}={str(rawrow[c]).strip() if c < len(rawrow) else ""}' for (k, c) in sorted(self.columns.items())]
+        return hashlib.blake2b('\x1f'.join(values).encode('utf-8'), digest_size=16).digest()
+
+    def _key(self, rawrow: Sequence[str]):
+        c = self.columns['accession-number']
+        return (str(rawrow[c]).strip() if c < len(rawrow) else '', self.digest(rawrow))
+
+    @staticmethod
+    def load(path: str, columns: Dict[str, int], nresults: int, header: bool) -> 'PreviousResults':
+        ''' The verdicts of the results file at path: rows of the input columns followed by `nresults` result columns '''
+        result = PreviousResults(columns)
+        if not (os.path.isfile(path) and os.access(path, os.R_OK)):
+            raise ValueError(f'Can not read previous results file: {path}')
+        with Compression.open(path) as filehandle:
+            for (row_number, row) in enumerate(csv.reader(filehandle)):
+                if (header and row_number == 0) or (len(row) <= nresults):
+                    continue
+                (rawrow, verdict) = (row[:-nresults], row[-nresults:])
+                if (verdict[0] in PreviousResults.SKIPPED_ACTIONS) or (verdict[1] in PreviousResults.SKIPPED_REASONS):
+                    continue
+                result.verdicts[result._key(rawrow)] = verdict
+        logging.info(f'previous results: {len(result.verdicts)} verdicts from {path}')
+        return result
+
+    def verdict(self, rawrow: Sequence[str]) -> List[str]:
+        ''' The previous verdict (result columns) of the raw row if it has not changed, else `None` '''
+        result = self.verdicts.get(self._key(rawrow))
+        self.statistics['copied' if result is not None else 'checked'] += 1
+        return None if result is None else list(result)
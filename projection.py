@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import operator
+import re
+from typing import List, Sequence
+
+
+class Projection:
+    '''
+    Selects fields of CSV rows, as `csvcut -f` does: `F[,F]*`, each `F` a
+    field number (`N`) or a range of field numbers (`N-M`), counting from 1.
+    The fields are taken in ascending order, once each; fields the row does
+    not have are empty.
+    '''
+    FIELDS = re.compile(r'^([+-]?\d+)(-([+-]?\d+))?(\,([+-]?\d+)(-([+-]?\d+))?)*$')
+
+    def __init__(self, fields: List[int]) -> None:
+        assert fields, f'a projection needs at least one field'
+        self.fields = fields
+        self.width = max(fields)
+        # rows with all the fields take the fast path
+        self.__getter = operator.itemgetter(*[f - 1 for f in fields]) if min(fields) >= 1 else None
+        self.__single = (len(fields) == 1)
+
+    @staticmethod
+    def parse(spec: str) -> 'Projection':
+        if not Projection.FIELDS.match(spec): raise ValueError(f'Bad fields value: {spec}')
+        args = [ f.split('-') for f in spec.split(',') ]
+        ranges = [ (int(i[0]), int(i[0])+1) if len(i) == 1 else (int(i[0]), int(i[1])+1) for i in args ]
+        fields = sorted(set.union(*[ set(range(r[0], r[1])) for r in ranges ]))
+        if not fields: raise ValueError(f'Bad fields value: {spec}')
+        return Projection(fields)
+
+    def __call__(self, row: Sequence[str]) -> List[str]:
+        if self.__getter and len(row) >= self.width:
+            return [self.__getter(row)] if self.__single else list(self.__getter(row))
+        return [row[f - 1] if 1 <= f <= len(row) else '' for f in self.fields]
+
+
+class VerdictFilter:
+    '''
+    Excludes rows of a previous results file by their verdict: the `action`
+    and `reason` columns, named in the header (see `use_header`) or else the
+    first two of the `nresults` result columns at the end of each row. The
+    verdicts are a list of `action` or `action:reason` separated by white
+    space or commas.
+    '''
+    def __init__(self, verdicts: str, nresults: int) -> None:
+        assert nresults >= 2, f'the results must include the action and reason: nresults {nresults}'
+        self.action_column = -nresults
+        self.reason_column = 1 - nresults
+        self.width = nresults + 1
+        self.actions = set()
+        self.verdicts = set()
+        for verdict in re.split(r'[\s,]+', verdicts.strip()):
+            if not verdict:
+                continue
+            (action, _, reason) = verdict.partition(':')
+            if reason:
+                self.verdicts.add((action, reason))
+            else:
+                self.actions.add(action)
+
+    def use_header(self, header: Sequence[str]) -> None:
+        ''' Take the action and reason from the columns the header names so '''
+        columns = [c.strip().lower() for c in header]
+        if ('action' in columns) and ('reason' in columns):
+            self.action_column = columns.index('action')
+            self.reason_column = columns.index('reason')
+            self.width = max(self.action_column, self.reason_column) + 1
+
+    def excludes(self, row: Sequence[str]) -> bool:
+        if len(row) < self.width:
+            return False
+        action = row[self.action_column]
+        return (action in self.actions) or ((action, row[self.reason_column]) in self.verdicts)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+from config import Config
+
+import ast
+import datetime
+import hashlib
+import json
+import logging
+import sqlite3
+from typing import Any, Dict, List
+
+
+class ResultsStore:
+    '''
+    An SQLite database of the results of gqc runs (`--results-store`),
+    written alongside the CSV output so that reports and reviews can query
+    them rather than re-parse the results files.
+
+    Each run is a row of `runs` (its request id, start and finish times and
+    a hash of the settings that decide the verdicts), each of its input
+    files a row of `files`, and each checked row a row of `results` with the
+    input accession number, country, pd1 and coordinate, the verdict and the
+    location found; the bounding box and its error distances are JSON. The
+    results are indexed by accession number, country and reason. A run that
+    did not finish has no `finished` time.
+    '''
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            request_id TEXT,
+            started TEXT NOT NULL,
+            finished TEXT,
+            config_hash TEXT NOT NULL,
+            config TEXT NOT NULL,
+            rows INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id INTEGER NOT NULL REFERENCES runs(run_id),
+            input_file TEXT,
+            output_file TEXT
+        );
+        CREATE TABLE IF NOT EXISTS results (
+            run_id INTEGER NOT NULL REFERENCES runs(run_id),
+            file_id INTEGER NOT NULL REFERENCES files(file_id),
+            row_number INTEGER NOT NULL,
+            accession_number TEXT,
+            country TEXT,
+            pd1 TEXT,
+            latitude TEXT,
+            longitude TEXT,
+            action TEXT,
+            reason TEXT,
+            location_country TEXT,
+            location_pd1 TEXT,
+            location_pd2 TEXT,
+            location_pd3 TEXT,
+            location_pd4 TEXT,
+            location_pd5 TEXT,
+            location_latitude REAL,
+            location_longitude REAL,
+            location_error_distance REAL,
+            location_bounding_box TEXT,
+            location_bounding_box_error_distances TEXT,
+            note TEXT,
+            PRIMARY KEY (run_id, file_id, row_number)
+        );
+        CREATE INDEX IF NOT EXISTS results_accession_number ON results (accession_number, run_id);
+        CREATE INDEX IF NOT EXISTS results_country ON results (country, reason);
+        CREATE INDEX IF NOT EXISTS results_reason ON results (action, reason);
+    '''
+    INPUT_KEYS = ('accession-number', 'country', 'pd1', 'latitude', 'longitude')
+    # the result columns (`GQC.RESULT_KEYS`) stored as numbers, and as JSON
+    REAL_KEYS = ('location-latitude', 'location-longitude', 'location-error-distance')
+    JSON_KEYS = ('location-bounding-box', 'location-bounding-box-error-distances')
+    # the settings, by section, that decide the verdicts of a run (those that only decide how it runs are not hashed)
+    HASHED_KEYS = {
+        Config.SECTION_GQC: ('allowable-coordinate-error', 'cache-enabled', 'cache-only', 'column-assignment', 'comment-character',
+                             'exclude-verdicts', 'extent-index', 'extent-index-cell-degrees', 'extent-index-min-support',
+                             'extent-index-validate', 'fields', 'first-line-is-header', 'gazetteer-file', 'latitude-precision',
+                             'longitude-precision', 'minimum-fuzzy-score', 'previous', 'provider', 'sample', 'sample-seed'),
+        Config.SECTION_LOCATIONIQ: ('api-host', 'reverse-url-format'),
+        Config.SECTION_NOMINATIM: ('api-host', 'reverse-url-format'),
+        Config.SECTION_BOUNDARY: ('border-distance-meters', 'boundary-file', 'country-property', 'fallback-provider',
+                                  'pd1-property', 'pd2-property'),
+    }
+    BATCH_SIZE = 1000
+
+    def __init__(self, path: str, result_keys: List[str]) -> None:
+        self.path = path
+        self.result_keys = result_keys
+        self.run_id = None
+        self.rows = 0
+        self.__pending = []
+        self.__connection = sqlite3.connect(path)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.executescript(ResultsStore.SCHEMA)
+        columns = [k.replace('-', '_') for k in ResultsStore.INPUT_KEYS + tuple(result_keys)]
+        self.__insert = (f'INSERT OR REPLACE INTO results (run_id, file_id, row_number, {", ".join(columns)}) '
+                         f'VALUES ({", ".join(["?"] * (len(columns) + 3))})')
+
+    @staticmethod
+    def settings(config) -> Dict[str, Any]:
+        ''' The settings of the config that decide the verdicts: the [gqc] section and that of its provider '''
+        sections = { 'boundary': Config.SECTION_BOUNDARY, 'locationiq': Config.SECTION_LOCATIONIQ, 'nominatim': Config.SECTION_NOMINATIM }
+        result = {}
+        for section in (Config.SECTION_GQC, sections.get(config.value('provider'))):
+            values = config.config.get(section, {})
+            result[section] = {k: v for (k, v) in values.items() if k in ResultsStore.HASHED_KEYS.get(section, ())}
+        return result
+
+    @staticmethod
+    def config_hash(settings: Dict[str, Any]) -> str:
+        return hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def start(self, config) -> int:
+        ''' Begin a run with the settings of the config '''
+        settings = ResultsStore.settings(config)
+        with self.__connection:
+            cursor = self.__connection.execute('INSERT INTO runs (request_id, started, config_hash, config) VALUES (?, ?, ?, ?)',
+                                               (config.sys_get('request_id'), ResultsStore.now(),
+                                                ResultsStore.config_hash(settings), json.dumps(settings, sort_keys=True, default=str)))
+        self.run_id = cursor.lastrowid
+        logging.info(f'results store {self.path}: run {self.run_id}')
+        return self.run_id
+
+    def file(self, input_file: str, output_file: str) -> int:
+        ''' The id of an input file of the run, and the output file of its results '''
+        with self.__connection:
+            cursor = self.__connection.execute('INSERT INTO files (run_id, input_file, output_file) VALUES (?, ?, ?)',
+                                               (self.run_id, input_file, output_file))
+        return cursor.lastrowid
+
+    def add(self, file_id: int, row_number: int, row: Dict[str, str], result: List[Any]) -> None:
+        ''' Store the result columns of a row (the `row_from_raw` of its raw row) '''
+        values = [self.run_id, file_id, row_number] + [row.get(k) for k in ResultsStore.INPUT_KEYS]
+        for (k, v) in zip(self.result_keys, result):
+            if k in ResultsStore.REAL_KEYS:
+                v = ResultsStore.real(v)
+            elif k in ResultsStore.JSON_KEYS:
+                v = ResultsStore.json(v)
+            values.append(v)
+        self.__pending.append(values)
+        self.rows += 1
+        if len(self.__pending) >= ResultsStore.BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.__pending:
+            with self.__connection:
+                self.__connection.executemany(self.__insert, self.__pending)
+            self.__pending = []
+
+    def finish(self) -> None:
+        ''' End the run and close the database '''
+        self.flush()
+        with self.__connection:
+            self.__connection.execute('UPDATE runs SET finished = ?, rows = ? WHERE run_id = ?', (ResultsStore.now(), self.rows, self.run_id))
+        self.__connection.close()
+        logging.info(f'results store {self.path}: {self.rows} rows of run {self.run_id}')
+
+    @staticmethod
+    def now() -> str:
+        return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+
+    @staticmethod
+    def real(value: Any) -> float:
+        try:
+            return float(value) if value != '' else None
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def json(value: Any) -> str:
+        ''' A dict as JSON; previous results copied from a CSV file have the Python text of the dict '''
+        if isinstance(value, str):
+            if not value.startswith('{'):
+                return value or None
+            try:
+                value = ast.literal_eval(value)
+            except (SyntaxError, ValueError):
+                return value
+        return json.dumps(value)
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+from config import Config
+from coordinate import Coordinate
+from location import Location
+from political_division import PoliticalDivision
+
+import copy
+import ctypes
+import functools
+from hedge import Cancellation, Hedger
+import http
+import http.client
+import importlib
+import json
+import logging
+import socket
+import ssl
+import threading
+import time
+from typing import Any, Dict, Tuple
+import urllib.error
+import urllib.request
+
+
+class ReverseGeocoder:
+    '''
+    A reverse geolocation service provider.
+
+    A provider knows how to build the reverse lookup URL for a coordinate,
+    how to fetch it and how to map the response onto a `Location`. Each
+    provider reads its settings from its own configuration section, including
+    its `max-concurrency` (the number of requests it allows in flight) and its
+    `requests-per-second` (zero for no fixed rate limit).
+    '''
+    # Registered providers: the `provider` configuration value => (module, class)
+    PROVIDERS = {
+        'boundary': ('boundary', 'Boundary'),
+        'locationiq': ('locationiq', 'LocationIQ'),
+        'nominatim': ('nominatim', 'Nominatim'),
+    }
+    # Response `address` fields, in order of preference, for each political division
+    ADDRESS_KEYS = {
+        'country': ['country'],
+        'pd1': ['state'],
+        'pd2': ['county'],
+        'pd3': ['city'],
+        'pd4': ['suburb'],
+        'pd5': ['neighbourhood'],
+    }
+    # False for providers that do not make HTTP requests
+    HTTP = True
+    # Response `error` messages (lower case prefixes) that mean "no location here"
+    NOT_FOUND_ERRORS = []
+
+    def __init__(self, config: Config, section: str) -> None:
+        self.section = section
+        def setting(name, default=None):
+            return config.get(name, section, config.sys_get(name, default))
+        self.backoff_decay_factor = float(setting('backoff-decay-factor'))
+        assert self.backoff_decay_factor > 0.0, f'backoff-decay-factor must be greater than zero: current value is {self.backoff_decay_factor}'
+        self.backoff_min_seconds = float(setting('backoff-min-seconds'))
+        assert self.backoff_min_seconds > 0.0, f'backoff-min-seconds must be greater than zero: current value is {self.backoff_min_seconds}'
+        self.backoff_seconds = self.backoff_min_seconds
+        self.backoff_growth_factor = float(setting('backoff-growth-factor'))
+        assert self.backoff_growth_factor > 0.0, f'backoff-growth-factor must be greater than zero: current value is {self.backoff_growth_factor}'
+        self.backoff_learning_factor = float(setting('backoff-learning-factor'))
+        assert self.backoff_learning_factor > 0.0, f'backoff-learning-factor must be greater than zero: current value is {self.backoff_learning_factor}'
+        self.backoff_max_seconds = float(setting('backoff-max-seconds'))
+        assert self.backoff_max_seconds > 0.0, f'backoff-max-seconds must be greater than zero: current value is {self.backoff_max_seconds}'
+        self.expected_latency_seconds = float(setting('expected-latency-seconds', 0.0))
+        self.max_concurrency = int(setting('max-concurrency', 1))
+        assert self.max_concurrency > 0, f'max-concurrency must be greater than zero: current value is {self.max_concurrency}'
+        self.pace_by_backoff = bool(setting('pace-by-backoff', ''))
+        self.requests_per_second = float(setting('requests-per-second', 0))
+        assert self.requests_per_second >= 0.0, f'requests-per-second must not be negative: current value is {self.requests_per_second}'
+        self.host = config.get('api-host', section)
+        self.reverse_url_format = config.get('reverse-url-format', section)
+        if self.HTTP and not self.host:
+            raise ValueError(f'{section}.api-host is not set')
+        if self.HTTP and not self.reverse_url_format:
+            raise ValueError(f'{section}.reverse-url-format is not set')
+        self.connect_timeout_seconds = float(setting('connect-timeout-seconds', 10))
+        assert self.connect_timeout_seconds > 0.0, f'connect-timeout-seconds must be greater than zero: current value is {self.connect_timeout_seconds}'
+        self.read_timeout_seconds = float(setting('read-timeout-seconds', 30))
+        assert self.read_timeout_seconds > 0.0, f'read-timeout-seconds must be greater than zero: current value is {self.read_timeout_seconds}'
+        self.total_timeout_seconds = float(setting('total-timeout-seconds', 60))
+        assert self.total_timeout_seconds > 0.0, f'total-timeout-seconds must be greater than zero: current value is {self.total_timeout_seconds}'
+        self.hedger = None
+        if setting('hedge-requests', ''):
+            self.hedger = Hedger(quantile=float(setting('hedge-quantile', 0.95)),
+                                 max_rate=float(setting('hedge-max-rate', 0.05)),
+                                 min_samples=int(setting('hedge-min-samples', 20)),
+                                 max_workers=self.max_concurrency)
+            logging.info(f'{section}: hedging requests with one request in flight beyond max-concurrency {self.max_concurrency}')
+        self._opener = urllib.request.build_opener(_TimeoutHTTPHandler(self.read_timeout_seconds),
+                                                   _TimeoutHTTPSHandler(self.read_timeout_seconds, ssl._create_unverified_context()))
+        # a c_double, so that it can be shared with other processes (see `shared_limits`)
+        self._next_request_time = ctypes.c_double(0.0)
+        self._pacing_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    @staticmethod
+    def create(config: Config, provider: str = None) -> ReverseGeocoder:
+        ''' Return an instance of the configured (or given) `provider` '''
+        if provider is None:
+            provider = config.value('provider')
+        if provider not in ReverseGeocoder.PROVIDERS:
+            raise ValueError(f'Unknown reverse geolocation provider «{provider}»: must be one of {", ".join(ReverseGeocoder.PROVIDERS.keys())}')
+        module, cls = ReverseGeocoder.PROVIDERS[provider]
+        return getattr(importlib.import_module(module), cls)(config)
+
+    def estimated_seconds_per_request(self) -> float:
+        """
+        The expected wall time of one rate limited request: the configured
+        `expected-latency-seconds` of the service plus the pause that paces
+        the requests, which is `backoff-min-seconds` when pacing by backoff
+        and the interval implied by `requests-per-second` otherwise
+        """
+        pause = 1.0 / self.requests_per_second if self.requests_per_second > 0 else 0.0
+        if self.pace_by_backoff:
+            pause = max(pause, self.backoff_min_seconds)
+        return self.expected_latency_seconds + pause
+
+    def extract_political_division(self, reverse_response: Dict[str, Any]) -> PoliticalDivision:
+        """
+        Response `address` fields converted to a PoliticalDivision
+        """
+        address = reverse_response['address'] if 'address' in reverse_response else {}
+        pds = { l: next((address[k] for k in keys if k in address), '') for (l, keys) in self.ADDRESS_KEYS.items() }
+        logging.debug(f'pds {pds}]')
+        result = PoliticalDivision(**pds)
+        logging.debug(f'result {result}')
+        return result
+
+    def is_cacheable(self, location: Location) -> bool:
+        """
+        True if the location is worth keeping in the reverse lookup cache
+        """
+        return True
+
+    def location_from_response(self, coordinate: Coordinate, url: str, reverse: Dict[str, Any]) -> Location:
+        """
+        The decoded JSON response mapped onto a Location; `None` if the
+        response does not identify a location
+        """
+        result = None
+        if (('lat' in reverse) and ('lon' in reverse) and ('address' in reverse)):
+            c = Coordinate(reverse['lat'], reverse['lon'])
+            pd = self.extract_political_division(reverse)
+            meta = {}
+            meta['__request_position'] = coordinate
+            meta['__request_url'] = url
+            meta['__response'] = reverse
+            if ('boundingbox' in reverse):
+                meta['boundingbox'] = copy.deepcopy(reverse['boundingbox'])
+            if ('distance' in reverse):
+                meta['distance'] = reverse['distance']
+            result = Location(coordinate=c, political_division=pd, metadata=meta)
+        return result
+
+    def probe(self) -> bool:
+        """
+        True if the service appears to be usable; checked once on startup
+        """
+        return bool(self.reverse_geolocate(Coordinate(latitude=0, longitude=0), False))
+
+    def reverse_geolocate(self, coordinate: Coordinate, rate_limit=True) -> Location:
+        result = None
+        url = self.reverse_geolocate_url(coordinate)
+        logging.debug(f'request {coordinate} => url {url}')
+        reverse = self.reverse_geolocate_fetch(url, rate_limit)
+        logging.debug(f'response {coordinate} result={reverse}')
+        if reverse:
+            reverse = json.loads(reverse)
+            if 'error' in reverse:
+                if any(str(reverse['error']).lower().startswith(e) for e in self.NOT_FOUND_ERRORS):
+                    return None
+                raise RuntimeError(json.dumps(reverse))
+            result = self.location_from_response(coordinate, url, reverse)
+        logging.debug(f'result {result}')
+        return result
+
+    def reverse_geolocate_url(self, coordinate: Coordinate) -> str:
+        """
+        Returns the URL to reverse locate the given coordinate
+        """
+        return self.reverse_url_format.format(host=self.host, latitude=coordinate.latitude, longitude=coordinate.longitude)
+
+    def reverse_geolocate_fetch(self, url: str, rate_limit: bool = True):
+        """
+        Returns the response to evaluating the URL
+
+        A positive `requests-per-second` spaces all the requests evenly, the
+        provider's fixed rate limit. `rate_limit` equal to `True` also paces
+        them by backoff: with `pace-by-backoff` it sleeps after every request
+        by the *backoff seconds* (see below)
+
+        At most `max-concurrency` requests are in flight at the same time.
+
+        A request fails with a timeout when connecting takes longer than
+        `connect-timeout-seconds`, when the server is silent for longer than
+        `read-timeout-seconds`, or when the whole response takes longer than
+        `total-timeout-seconds`. With `hedge-requests` enabled a request still
+        running after the `hedge-quantile` of the observed latencies is
+        duplicated and the first answer wins; at most `hedge-max-rate` of the
+        requests are hedged, and one hedge at a time is in flight beyond
+        `max-concurrency`. The connection of the request that loses is shut
+        down, and it keeps the hedge slot until it has ended.
+
+        If the HTTP response is TOO_MANY_REQUESTS then the method will wait
+        *backoff seconds* (see below)
+
+        Five configuration parameters control the number of *backoff seconds*:
+            *    `backoff-decay-factor`
+            *    `backoff-growth-factor`
+            *    `backoff-learning-factor`
+            *    `backoff-max-seconds`
+            *    `backoff-min-seconds`
+
+        Each time a **`TOO_MANY_REQUESTS`** response occurs the method sleeps
+        *backoff seconds* amount of time before retrying the request. The
+        number of seconds to sleep is initially `backoff-min-seconds`.
+        Each spurned request causes the backoff time is increased by:::
+
+            backoff = backoff + ((backoff + sleep-secods) * backoff-learning-factor
+            backoff = min(max(backoff, backoff-min-seconds), backoff-max-seconds)
+
+        When a request is successful the backoff time is reduced by a factor of
+        `backoff-decay-factor`:::
+
+            backoff = backoff * (1 - backoff-decay-factor)
+
+        The new backoff time will be used on the next **`TOO_MANY_REQUESTS`** response.
+        Additionally, the new backoff time will be used when pacing by backoff.
+        """
+        result = '{}'
+        sleep_seconds = self.backoff_seconds
+        while True:
+            try:
+                self.throttle()
+                logging.debug(f'urlopen «{url}»')
+                if self.hedger:
+                    # the slot is taken here so that the latencies hedged on do not include waiting for it
+                    with self._slots:
+                        result = self.hedger.call(functools.partial(self._request, url))
+                else:
+                    result = self._open(url)
+                logging.debug(f'url={url} result={result}')
+                break
+            except urllib.error.HTTPError as exception:
+                logging.debug(f'url={url} result={result} exception {exception} code {exception.code} reason {exception.reason}')
+                if exception.code == http.HTTPStatus.TOO_MANY_REQUESTS:
+                    logging.debug(f'TOO_MANY_REQUESTS! {url}: wait {sleep_seconds} seconds to let the server cool down')
+                    time.sleep(sleep_seconds)
+                    sleep_seconds *= self.backoff_growth_factor
+                    logging.debug(f'new-sleep-seconds-after-backoff={sleep_seconds}')
+                elif exception.code == http.HTTPStatus.NOT_FOUND:
+                    return '{}'
+                else:
+                    raise
+        if not self.backoff_seconds == sleep_seconds:
+            logging.debug(f'sleep_seconds={sleep_seconds}, self.backoff_seconds={self.backoff_seconds}, self.backoff_learning_factor={self.backoff_learning_factor}')
+            new_backoff = self.backoff_seconds + ((self.backoff_seconds + sleep_seconds) * self.backoff_learning_factor)
+            new_backoff_seconds = min(max(new_backoff, self.backoff_min_seconds), self.backoff_max_seconds)
+            if not self.backoff_seconds == new_backoff_seconds:
+                logging.debug(f'modify backoff time from {self.backoff_seconds} seconds to {new_backoff_seconds} seconds')
+                self.backoff_seconds = new_backoff_seconds
+        else:
+            self.backoff_seconds *= (1 - self.backoff_decay_factor)
+        if rate_limit and self.pace_by_backoff:
+            # one meditation at a time, however many threads are fetching
+            with self._pacing_lock:
+                logging.debug(f'meditating for {self.backoff_seconds} seconds')
+                time.sleep(self.backoff_seconds)
+        return result
+
+    def _open(self, url: str) -> bytes:
+        ''' One request of the URL within the configured timeouts, in one of the `max-concurrency` slots '''
+        with self._slots:
+            return self._request(url)
+
+    def _request(self, url: str, cancellation: Cancellation = None) -> bytes:
+        ''' One request of the URL within the configured timeouts; `cancellation` shuts its connection down '''
+        deadline = time.monotonic() + self.total_timeout_seconds
+        _connecting.cancellation = cancellation
+        try:
+            response = self._opener.open(url, timeout=self.connect_timeout_seconds)
+        finally:
+            _connecting.cancellation = None
+        with response:
+            chunks = []
+            while True:
+                chunk = response.read1(65536)
+                if cancellation is not None and cancellation.cancelled:
+                    raise ConnectionAbortedError(f'request of «{url}» cancelled')
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f'response to «{url}» took longer than {self.total_timeout_seconds} seconds')
+            return b''.join(chunks)
+
+    def shared_limits(self, context) -> Tuple[Any, Any, Any]:
+        '''
+        The pacing lock, next request time and `max-concurrency` slots of a
+        provider shared by the processes of the multiprocessing `context`
+        (see `use_limits`): the processes pace their requests as the threads
+        of one process do
+        '''
+        # time.monotonic() is the same clock in every process of the machine
+        return (context.Lock(), context.Value(ctypes.c_double, 0.0, lock=False), context.BoundedSemaphore(self.max_concurrency))
+
+    def use_limits(self, limits: Tuple[Any, Any, Any]) -> None:
+        ''' Pace the requests by the `shared_limits` of a provider in another process '''
+        (self._pacing_lock, self._next_request_time, self._slots) = limits
+
+    def throttle(self) -> None:
+        """
+        Waits for the next request slot when `requests-per-second` is positive
+        """
+        if self.requests_per_second <= 0:
+            return
+        with self._pacing_lock:
+            now = time.monotonic()
+            start = max(now, self._next_request_time.value)
+            self._next_request_time.value = start + (1.0 / self.requests_per_second)
+        if start > now:
+            time.sleep(start - now)
+
+
+# the `Cancellation` of the request this thread is opening, for the connection to register with
+_connecting = threading.local()
+
+def _cancel_with(sock: socket.socket) -> None:
+    ''' Shut `sock` down when the request opening it is cancelled, waking a read blocked on it '''
+    cancellation = getattr(_connecting, 'cancellation', None)
+    if cancellation is not None:
+        cancellation.add(lambda: sock.shutdown(socket.SHUT_RDWR))
+
+
+class _TimeoutHTTPConnection(http.client.HTTPConnection):
+    ''' An HTTP connection using the `timeout` for connecting and `read_timeout` afterwards '''
+    def __init__(self, *args, read_timeout: float = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.read_timeout = read_timeout
+
+    def connect(self) -> None:
+        super().connect()
+        if self.read_timeout is not None:
+            self.sock.settimeout(self.read_timeout)
+        _cancel_with(self.sock)
+
+
+class _TimeoutHTTPSConnection(http.client.HTTPSConnection):
+    ''' An HTTPS connection using the `timeout` for connecting and `read_timeout` afterwards '''
+    def __init__(self, *args, read_timeout: float = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.read_timeout = read_timeout
+
+    def connect(self) -> None:
+        super().connect()
+        if self.read_timeout is not None:
+            self.sock.settimeout(self.read_timeout)
+        _cancel_with(self.sock)
+
+
+class _TimeoutHTTPHandler(urllib.request.HTTPHandler):
+    def __init__(self, read_timeout: float) -> None:
+        super().__init__()
+        self.read_timeout = read_timeout
+
+    def http_open(self, req):
+        return self.do_open(functools.partial(_TimeoutHTTPConnection, read_timeout=self.read_timeout), req)
+
+
+class _TimeoutHTTPSHandler(urllib.request.HTTPSHandler):
+    def __init__(self, read_timeout: float, context: ssl.SSLContext) -> None:
+        super().__init__(context=context)
+        self.read_timeout = read_timeout
+        self.https_context = context
+
+    def https_open(self, req):
+        return self.do_open(functools.partial(_TimeoutHTTPSConnection, read_timeout=self.read_timeout), req, context=self.https_context)
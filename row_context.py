@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+from coordinate import Coordinate
+from location import Location
+from political_division import PoliticalDivision
+
+from collections import Counter
+from typing import Callable, Dict, List
+
+
+class RowContext:
+    '''
+    The evaluation of one row, shared by the checks of `GQC.process_row`:
+    the parsed input, the locations looked up and the comparisons made, so
+    that each is done at most once for the row.
+
+    `statistics` counts the lookups and comparisons made and those saved by
+    reusing an earlier one (`lookups-saved`, `comparisons-saved` and
+    `scores-saved`).
+    '''
+    def __init__(self, row: Dict[str, str], coordinate: Coordinate, columns: List[str]) -> None:
+        self.row = row
+        # the canonical coordinate of the row, and the coordinate as it was input
+        self.coordinate = coordinate
+        self.input_coordinate = Coordinate(row['latitude'], row['longitude'])
+        self.political_division = PoliticalDivision(**{k: row[k] for k in columns})
+        self.locations = {}
+        # whether the corrections may only use cached locations (see `Deadline`)
+        self.corrections_cache_only = False
+        self.statistics = Counter()
+        self.__comparisons = {}
+        self.__scores = {}
+
+    def location(self, coordinate: Coordinate, lookup: Callable[[Coordinate], Location]) -> Location:
+        ''' The location of the coordinate, looked up with `lookup` the first time '''
+        if coordinate in self.locations:
+            self.statistics['lookups-saved'] += 1
+        else:
+            self.locations[coordinate] = lookup(coordinate)
+            self.statistics['lookups'] += 1
+        return self.locations[coordinate]
+
+    def record(self, coordinate: Coordinate, location: Location) -> None:
+        ''' Note the location of a coordinate looked up elsewhere '''
+        if coordinate not in self.locations:
+            self.locations[coordinate] = location
+            self.statistics['lookups'] += 1
+
+    def compare(self, location: Location) -> PoliticalDivision.FuzzyCompareResult:
+        ''' The fuzzy comparison of the input political division with that of the location '''
+        other = location.political_division
+        if other in self.__comparisons:
+            self.statistics['comparisons-saved'] += 1
+        else:
+            self.__comparisons[other] = self.political_division.fuzzy_compare(other)
+            self.statistics['comparisons'] += 1
+        return self.__comparisons[other]
+
+    def score(self, a: str, b: str, level: str, other_level: str, scorer: Callable[[str, str, str, str], int]) -> int:
+        ''' The score of the names, scored by `scorer` the first time '''
+        key = (a, b, level, other_level)
+        if key in self.__scores:
+            self.statistics['scores-saved'] += 1
+        else:
+            self.__scores[key] = scorer(a, b, level, other_level)
+            self.statistics['scores'] += 1
+        return self.__scores[key]
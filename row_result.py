@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+from typing import Any, Dict, List
+
+
+class RowResult:
+    '''
+    The result of checking one row (see `GQC.process_row`): the verdict, the
+    location found and a note, in fixed slots rather than a dict.
+
+    `columns()` is the list of the result columns (`KEYS`, the attributes of
+    the same names with '_' for '-') appended to the input row in the output.
+    '''
+    KEYS = ('action', 'reason',
+            'location-country',
+            'location-pd1', 'location-pd2', 'location-pd3', 'location-pd4', 'location-pd5',
+            'location-latitude', 'location-longitude',
+            'location-error-distance', 'location-bounding-box', 'location-bounding-box-error-distances',
+            'note'
+            )
+    __slots__ = ('action', 'reason', 'accession_number',
+                 'location_country', 'location_pd1', 'location_pd2', 'location_pd3', 'location_pd4', 'location_pd5',
+                 'location_latitude', 'location_longitude',
+                 'location_error_distance', 'location_bounding_box', 'location_bounding_box_error_distances',
+                 'display_name', 'reverse_geolocate_response', 'note')
+
+    def __init__(self) -> None:
+        self.action = ''
+        self.reason = ''
+        self.accession_number = ''
+        self.location_country = ''
+        self.location_pd1 = ''
+        self.location_pd2 = ''
+        self.location_pd3 = ''
+        self.location_pd4 = ''
+        self.location_pd5 = ''
+        self.location_latitude = ''
+        self.location_longitude = ''
+        self.location_error_distance = ''
+        self.location_bounding_box = ''
+        self.location_bounding_box_error_distances = ''
+        self.display_name = ''
+        self.reverse_geolocate_response = ''
+        self.note = ''
+
+    def __repr__(self) -> str:
+        return f'RowResult({self.accession_number!r}, {self.columns()!r})'
+
+    def columns(self) -> List[Any]:
+        ''' The result columns of the output row, in the order of `KEYS` '''
+        return [self.action, self.reason,
+                self.location_country,
+                self.location_pd1, self.location_pd2, self.location_pd3, self.location_pd4, self.location_pd5,
+                self.location_latitude, self.location_longitude,
+                self.location_error_distance, self.location_bounding_box, self.location_bounding_box_error_distances,
+                self.note]
+
+    def update(self, fields: Dict[str, Any]) -> None:
+        ''' Set the results of a dict keyed by result names (such as a `BatchValidator` response) '''
+        for (k, v) in fields.items():
+            setattr(self, k.replace('-', '_'), v)
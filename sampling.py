@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+from response_status import ResponseStatus
+
+from collections import Counter, defaultdict, namedtuple
+import heapq
+import math
+import random
+from typing import Callable, Hashable, Iterable, List, Tuple
+
+
+class Sample:
+    '''
+    A stratified random sample of the rows of an input (`--sample`), and the
+    error rates of the whole input estimated from the results of the sample.
+
+    The rows are streamed once. Each row is given a random key and counted in
+    its stratum (its country and pd1); either every row with a key below the
+    `fraction` is sampled, or each stratum keeps the `size` rows with the
+    lowest keys (a reservoir) and the `size` rows of the sample are allotted
+    to the strata in proportion to their rows, at least one to each stratum
+    while there are enough (Adams' method).
+
+    The rate of each `action.reason` is estimated as the mean of the rates of
+    the strata weighted by their rows, with a Wilson score interval of the
+    `confidence` for the effective sample size of its stratified variance.
+    '''
+    Estimate = namedtuple('Estimate', ['status', 'sampled', 'rate', 'low', 'high', 'rows'])
+    # the two-sided z of the confidence
+    Z = { 0.90: 1.6449, 0.95: 1.9600, 0.99: 2.5758 }
+
+    def __init__(self, size: int = None, fraction: float = None, seed: int = None, confidence: float = 0.95) -> None:
+        assert (size is None) != (fraction is None), f'a sample has a size or a fraction: size {size}, fraction {fraction}'
+        assert (size is None) or (size >= 1), f'bad sample size {size}'
+        assert (fraction is None) or (0.0 < fraction < 1.0), f'bad sample fraction {fraction}'
+        assert confidence in Sample.Z, f'confidence must be one of {sorted(Sample.Z)}: {confidence}'
+        self.size = size
+        self.fraction = fraction
+        self.confidence = confidence
+        self.random = random.Random(seed)
+        # the rows of each stratum in the input, and in the sample
+        self.population = Counter()
+        self.allocation = Counter()
+        self.results = defaultdict(Counter)
+        self.__strata = {}
+
+    @staticmethod
+    def parse(text: str, seed: int = None) -> 'Sample':
+        ''' The sample of a `--sample`: a number of rows, or a fraction of the rows (between 0 and 1) '''
+        try:
+            if text.isdigit() and int(text) >= 1:
+                return Sample(size=int(text), seed=seed)
+            if 0.0 < float(text) < 1.0:
+                return Sample(fraction=float(text), seed=seed)
+        except ValueError:
+            pass
+        raise ValueError(f'Bad sample value (a number of rows, or a fraction between 0 and 1): {text}')
+
+    def select(self, items: Iterable[Tuple[int, list]], stratum: Callable[[list], Hashable]) -> List[Tuple[int, list]]:
+        ''' The sample of the (row-number, raw-row) items, in input order; `stratum` is the stratum of a raw row '''
+        reservoirs = defaultdict(list)
+        for (row_number, rawrow) in items:
+            key = stratum(rawrow)
+            self.population[key] += 1
+            u = self.random.random()
+            if self.fraction is not None:
+                if u < self.fraction:
+                    reservoirs[key].append((u, row_number, rawrow))
+                continue
+            # a max-heap (of -u) of the `size` lowest keys of the stratum
+            reservoir = reservoirs[key]
+            if len(reservoir) < self.size:
+                heapq.heappush(reservoir, (-u, row_number, rawrow))
+            elif -reservoir[0][0] > u:
+                heapq.heapreplace(reservoir, (-u, row_number, rawrow))
+        if self.fraction is not None:
+            self.allocation = Counter({k: len(v) for (k, v) in reservoirs.items()})
+            chosen = [(row_number, rawrow, k) for (k, v) in reservoirs.items() for (_, row_number, rawrow) in v]
+        else:
+            self.allocation = self.allot(self.population, self.size)
+            chosen = [(row_number, rawrow, k) for (k, v) in reservoirs.items()
+                                              for (_, row_number, rawrow) in heapq.nlargest(self.allocation[k], v)]
+        chosen.sort(key=lambda c: c[0])
+        self.__strata = {row_number: k for (row_number, _, k) in chosen}
+        return [(row_number, rawrow) for (row_number, rawrow, _) in chosen]
+
+    @staticmethod
+    def allot(population: Counter, size: int) -> Counter:
+        ''' The rows of the sample of each stratum: Adams' method, the next row to the stratum of the most rows per sampled row '''
+        result = Counter()
+        priority = [(-math.inf, n, k) for (n, k) in enumerate(population)]
+        heapq.heapify(priority)
+        for _ in range(min(size, sum(population.values()))):
+            (_, n, key) = heapq.heappop(priority)
+            result[key] += 1
+            if result[key] < population[key]:
+                heapq.heappush(priority, (-population[key] / result[key], n, key))
+        return result
+
+    def record(self, row_number: int, status: ResponseStatus) -> None:
+        ''' Note the result of a sampled row '''
+        self.results[self.__strata[row_number]][status] += 1
+
+    def estimates(self) -> List['Sample.Estimate']:
+        ''' The estimated rate (and rows) of each `action.reason` in the input, most common first '''
+        strata = [k for k in self.results if sum(self.results[k].values())]
+        rows = sum(self.population[k] for k in strata)
+        sampled = sum(sum(self.results[k].values()) for k in strata)
+        statuses = set(s for k in strata for s in self.results[k])
+        z = Sample.Z[self.confidence]
+        result = []
+        for status in statuses:
+            (rate, variance) = (0.0, 0.0)
+            for k in strata:
+                n = sum(self.results[k].values())
+                weight = self.population[k] / rows
+                p = self.results[k][status] / n
+                rate += weight * p
+                if n > 1:
+                    variance += weight * weight * (1.0 - n / self.population[k]) * p * (1.0 - p) / (n - 1)
+            effective = (rate * (1.0 - rate) / variance) if variance > 0.0 else sampled
+            (low, high) = Sample.wilson(rate, effective, z)
+            result.append(Sample.Estimate(status, sum(self.results[k][status] for k in strata), rate, low, high, round(rate * rows)))
+        return sorted(result, key=lambda e: (-e.rate, e.status))
+
+    @staticmethod
+    def wilson(p: float, n: float, z: float) -> Tuple[float, float]:
+        ''' The Wilson score interval of a proportion `p` of `n` observations '''
+        if n <= 0:
+            return (0.0, 1.0)
+        denominator = 1.0 + z * z / n
+        centre = (p + z * z / (2.0 * n)) / denominator
+        half = z * math.sqrt(p * (1.0 - p) / n + z * z / (4.0 * n * n)) / denominator
+        return (max(0.0, centre - half), min(1.0, centre + half))
+
+    def coverage(self) -> float:
+        ''' The fraction of the input rows in the strata of the sample '''
+        total = sum(self.population.values())
+        return (sum(self.population[k] for k in self.results) / total) if total else 0.0
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+import csv
+import http.server
+import io
+import json
+import logging
+import os
+import socketserver
+import stat
+import threading
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+
+class Service:
+    '''
+    Checks rows for other programs (`--serve`) over HTTP, on a TCP port or a
+    Unix socket, so that the start up (configuration, cache, gazetteer,
+    provider probe) is paid once and the cache and the provider's
+    connections and pacing stay warm between requests.
+
+        POST /check      a JSON object of the input columns of a row
+                         (`accession-number`, `country`, `pd1`, ...,
+                         `latitude`, `longitude`), or a list of them; answered
+                         with the result columns (`GQC.RESULT_KEYS`) of each
+        POST /check-csv  CSV rows as gqc reads them (`column-assignment`,
+                         `first-line-is-header`, `--fields`,
+                         `--exclude-verdict`); answered, as they are checked,
+                         with the rows and their result columns as gqc writes
+                         them
+        GET  /status     the requests and rows checked and the cache size
+
+    The cache entries looked up are saved once per request.
+    '''
+    # rows written to a /check-csv response at a time
+    CHUNK_ROWS = 100
+
+    def __init__(self, gqc, address: str) -> None:
+        self.gqc = gqc
+        self.address = Service.parse_address(address)
+        self.statistics = { 'requests': 0, 'rows': 0, 'errors': 0 }
+        self._lock = threading.Lock()
+        self.server = None
+
+    @staticmethod
+    def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+        ''' The path of a Unix socket (anything with a '/'), or the (host, port) of `[host:]port` '''
+        if '/' in address:
+            return address
+        (host, _, port) = address.rpartition(':')
+        if not port.isdigit():
+            raise ValueError(f'Bad service address (a [host:]port or the path of a Unix socket): {address}')
+        return (host or '127.0.0.1', int(port))
+
+    def count(self, **counts) -> None:
+        with self._lock:
+            for (k, n) in counts.items():
+                self.statistics[k] += n
+
+    def check(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        ''' The results of the rows of input columns, checked as the rows of the input are (`GQC.check_rows`) '''
+        columns = self.gqc.config.active_columns()
+        items = []
+        for fields in requests:
+            if not isinstance(fields, dict):
+                raise ValueError(f'a row to check must be a JSON object: {json.dumps(fields)}')
+            rawrow = [''] * (max(columns.values()) + 1)
+            for (k, c) in columns.items():
+                value = fields.get(k)
+                rawrow[c] = '' if value is None else str(value)
+            # not row 0, which may be the header
+            items.append((len(items) + 1, rawrow))
+        results = [dict(zip(self.gqc.RESULT_KEYS, append)) for (_, _, append) in self.gqc.check_rows(items)]
+        self.count(rows=len(results))
+        return results
+
+    def check_csv(self, lines: Iterator[str]) -> Iterator[List[Any]]:
+        ''' The output rows of the CSV lines '''
+        for (_, rawrow, append) in self.gqc.check_rows(enumerate(self.gqc.select_rows(csv.reader(lines)))):
+            self.count(rows=1)
+            yield rawrow + append
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.statistics, **{ 'cache-entries': len(self.gqc.cache) })
+
+    def start(self) -> None:
+        ''' Listen on the address (without serving yet) '''
+        if isinstance(self.address, str):
+            Service.remove_socket(self.address)
+            self.server = _UnixHTTPServer(self.address, _Handler)
+        else:
+            self.server = http.server.ThreadingHTTPServer(self.address, _Handler)
+            self.address = self.server.server_address[:2]
+        self.server.service = self
+        # saved once per request instead of once per lookup
+        self.gqc.cache.persist = False
+        logging.info(f'serving on {self.address}')
+
+    @staticmethod
+    def remove_socket(path: str) -> None:
+        ''' Remove the Unix socket left at the path by a service that did not stop; anything else there is an error '''
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise ValueError(f'Bad service address (not a Unix socket): {path}')
+        os.remove(path)
+
+    def execute(self) -> None:
+        ''' Serve until interrupted '''
+        self.start()
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        self.server.server_close()
+        if isinstance(self.address, str):
+            Service.remove_socket(self.address)
+        self.gqc.cache.flush()
+        self.gqc.cache.persist = True
+        logging.info(f'service stopped: {self.status()}')
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self) -> str:
+        # a Unix socket client has no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args) -> None:
+        logging.info(f'service {self.address_string()} {format % args}')
+
+    def do_GET(self) -> None:
+        service = self.server.service
+        if self.path == '/status':
+            self.send_json(200, service.status())
+        else:
+            self.send_json(404, { 'error': f'no such resource: {self.path}' })
+
+    def do_POST(self) -> None:
+        service = self.server.service
+        if self.path not in ('/check', '/check-csv'):
+            self.send_json(404, { 'error': f'no such resource: {self.path}' })
+            return
+        length = self.headers.get('Content-Length')
+        if not (length and length.isdigit()):
+            self.send_json(411, { 'error': 'a Content-Length is required' })
+            return
+        service.count(requests=1)
+        rows = None
+        try:
+            if self.path == '/check':
+                self.post_check(service, int(length))
+            else:
+                # the rows are answered as they are checked: a failure can only cut the answer short
+                self.close_connection = True
+                rows = service.check_csv(self.lines(int(length)))
+                self.send_csv(rows)
+                self.close_connection = False
+        except Exception as e:
+            service.count(errors=1)
+            logging.error(f'service {self.path}: {e}', exc_info=True)
+        finally:
+            if rows is not None:
+                # ends the pipeline of an answer cut short
+                rows.close()
+            service.gqc.cache.flush()
+
+    def post_check(self, service: Service, length: int) -> None:
+        try:
+            request = json.loads(self.rfile.read(length))
+            result = service.check(request) if isinstance(request, list) else service.check([request])[0]
+        except ValueError as e:
+            service.count(errors=1)
+            self.send_json(400, { 'error': str(e) })
+            return
+        except Exception as e:
+            service.count(errors=1)
+            logging.error(f'service {self.path}: {e}', exc_info=True)
+            self.send_json(500, { 'error': str(e) })
+            return
+        self.send_json(200, result)
+
+    def lines(self, length: int) -> Iterator[str]:
+        ''' The lines of the request body '''
+        while length > 0:
+            line = self.rfile.readline(min(length, 1 << 16))
+            if not line:
+                return
+            length -= len(line)
+            yield line.decode('utf-8')
+
+    def send_json(self, status: int, body: Any) -> None:
+        data = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_csv(self, rows: Iterator[List[Any]]) -> None:
+        ''' The rows as chunks of CSV, written as they come '''
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for (n, row) in enumerate(rows, 1):
+            writer.writerow(row)
+            if n % Service.CHUNK_ROWS == 0:
+                self.send_chunk(buffer)
+        self.send_chunk(buffer)
+        self.wfile.write(b'0\r\n\r\n')
+
+    def send_chunk(self, buffer: io.StringIO) -> None:
+        data = buffer.getvalue().encode('utf-8')
+        if data:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            buffer.seek(0)
+            buffer.truncate()
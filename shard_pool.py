@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+from collections import Counter, deque
+import concurrent.futures
+import itertools
+import logging
+import multiprocessing
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+class ShardPool:
+    '''
+    Checks the rows in a pool of `workers` processes.
+
+    The rows are read here, on record boundaries, and sent to the workers in
+    shards of `shard_size` consecutive rows; each worker checks its shards
+    with its own `GQC` (see `GQC.check_rows`) and returns the results with the
+    cache entries it looked up. The results are yielded in the order of the
+    rows, and the cache entries merged into this process' cache, which is the
+    only one saved. Each worker starts from the cache as it was saved when
+    the pool started. The workers pace their requests by the pacing and
+    concurrency limits of this process' provider, shared with them (see
+    `ReverseGeocoder.shared_limits`), so that N workers make no more requests
+    than one process would; the statistics of their shards (name comparisons,
+    row evaluation, previous results) are added to this process'.
+
+    At most two shards per worker are in flight at any time.
+    '''
+    def __init__(self, gqc, workers: int, shard_size: int = 1000) -> None:
+        assert workers > 0, f'workers must be greater than zero: current value is {workers}'
+        assert shard_size > 0, f'shard-size must be greater than zero: current value is {shard_size}'
+        self.gqc = gqc
+        self.workers = workers
+        self.shard_size = shard_size
+
+    def run(self, items: Iterable[Tuple[int, List[str]]]) -> Iterator[Tuple[int, List[str], List[Any]]]:
+        ''' The (row-number, raw-row, result-columns) of the (row-number, raw-row) items, in order '''
+        config = self.gqc.config
+        # the settings the workers can not learn from the command line
+        overrides = { 'cache-enabled': config.value('cache-enabled'), 'deadline': config.value('deadline') }
+        context = multiprocessing.get_context('spawn')
+        limits = self.gqc.geocoder.shared_limits(context)
+        # this process makes requests too (the sign permutations of --prefetch-permutations)
+        self.gqc.geocoder.use_limits(limits)
+        items = iter(items)
+        pending = deque()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_initialize,
+                                                    initargs=(self.gqc.argv, config.value('log-file'), config.value('log-level'), overrides, limits)) as executor:
+            while True:
+                while len(pending) < 2 * self.workers:
+                    shard = list(itertools.islice(items, self.shard_size))
+                    if not shard:
+                        break
+                    pending.append(executor.submit(_check_shard, shard))
+                if not pending:
+                    break
+                (results, changes, statistics) = pending.popleft().result()
+                self.gqc.cache.merge(changes)
+                self.add_statistics(statistics)
+                yield from results
+
+    def add_statistics(self, statistics: Dict[str, Dict[str, int]]) -> None:
+        ''' Add the statistics of a worker's shard to this process' '''
+        from gazetteer import Gazetteer
+        Gazetteer.instance().add_statistics(statistics['gazetteer'])
+        self.gqc.row_statistics.update(statistics['rows'])
+        if self.gqc.previous:
+            for (k, n) in statistics['previous'].items():
+                self.gqc.previous.statistics[k] += n
+
+
+# The worker side of the pool: module functions, so that they pickle
+
+# the statistics of the worker already returned with its shards
+_reported = {}
+
+
+def _initialize(argv: List[str], log_file: str, log_level: str, overrides: Dict[str, Any], limits: Tuple[Any, Any, Any]) -> None:
+    from config import Config
+    from deadline import Deadline
+    from gqc import GQC
+    # log to the log file of the parent, not one named for this process' start time
+    c = Config.default_configuration()[Config.SECTION_SYSTEM]['logging']
+    logging.basicConfig(filename=log_file, encoding=c['encoding'], style=c['style'], format=c['format'], datefmt=c['datefmt'],
+                        level=getattr(logging, log_level.upper(), logging.INFO), force=True)
+    gqc = GQC.instance(argv)
+    for (key, value) in overrides.items():
+        gqc.config.put(key, value)
+    # the parent merges and saves what the workers look up
+    gqc.cache.persist = False
+    gqc.geocoder.use_limits(limits)
+    if gqc.config.value('deadline'):
+        # the workers do not see the progress of the run: they keep to the deadline itself
+        gqc.deadline = Deadline(float(gqc.config.value('deadline')), None, float(gqc.config.value('deadline-reserve-seconds')))
+    logging.info(f'shard worker ready: {len(gqc.cache)} cache entries')
+
+
+def _check_shard(shard: List[Tuple[int, List[str]]]) -> Tuple[List[Tuple[int, List[str], List[Any]]], Dict[str, str], Dict[str, Dict[str, int]]]:
+    from gqc import GQC
+    gqc = GQC.instance(None)
+    results = list(gqc.check_rows(shard))
+    return (results, gqc.cache.changes(), _statistics(gqc))
+
+
+def _statistics(gqc) -> Dict[str, Dict[str, int]]:
+    ''' The statistics of the worker since the last shard '''
+    from gazetteer import Gazetteer
+    current = { 'gazetteer': Counter(Gazetteer.instance().statistics()),
+                'rows': Counter(gqc.row_statistics),
+                'previous': Counter(gqc.previous.statistics if gqc.previous else {}) }
+    result = { k: dict(v - _reported.get(k, Counter())) for (k, v) in current.items() }
+    _reported.update(current)
+    return result
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+from coordinate import Coordinate
+
+
+class Spatial:
+    '''
+    Orders coordinates along a Hilbert curve over the globe, so that
+    coordinates close to each other in the ordering are close on the ground.
+    '''
+    # cells per side of the curve's grid are 2**ORDER: about 600m of latitude at 15
+    ORDER = 15
+
+    @staticmethod
+    def hilbert(x: int, y: int, order: int = ORDER) -> int:
+        ''' The distance along the Hilbert curve of order `order` of the grid cell (x, y) '''
+        n = 1 << order
+        d = 0
+        s = n >> 1
+        while s > 0:
+            rx = 1 if (x & s) else 0
+            ry = 1 if (y & s) else 0
+            d += s * s * ((3 * rx) ^ ry)
+            # rotate the quadrant
+            if ry == 0:
+                if rx == 1:
+                    x = n - 1 - x
+                    y = n - 1 - y
+                (x, y) = (y, x)
+            s >>= 1
+        return d
+
+    @staticmethod
+    def key(coordinate: Coordinate, order: int = ORDER) -> int:
+        ''' The Hilbert curve position of the coordinate '''
+        n = 1 << order
+        longitude = ((coordinate.longitude + 180.0) % 360.0) - 180.0
+        x = min(int((longitude + 180.0) / 360.0 * n), n - 1)
+        y = min(int((coordinate.latitude + 90.0) / 180.0 * n), n - 1)
+        return Spatial.hilbert(x, y, order)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+
+from validate import Validate
+
+import errno
+import getopt
+import http
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os.path
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, Tuple
+import urllib.parse
+
+
+class StandInServer:
+    '''
+    A local stand-in for the LocationIQ reverse geolocation service.
+
+    Answers the `/v1/reverse.php` requests built from `reverse-url-format`
+    (and the Nominatim style `/reverse`) from a fixture file or an existing
+    gqc cache file, with configurable latency and fault injection, so the
+    network path of gqc can be load tested offline and reproducibly.
+    '''
+
+    DEFAULT_BIND = '127.0.0.1'
+    DEFAULT_PORT = 8086
+    DEFAULT_PRECISION = 3
+    PATHS = ['/v1/reverse.php', '/reverse', '/reverse.php']
+    SERVER_ERRORS = [http.HTTPStatus.INTERNAL_SERVER_ERROR, http.HTTPStatus.BAD_GATEWAY, http.HTTPStatus.SERVICE_UNAVAILABLE]
+
+    __instance = None
+
+    def __init__(self, argv):
+        ''' Virtually private constructor. '''
+        if __class__.__instance != None:
+            raise Exception('This class is a singleton!')
+        self.bind = __class__.DEFAULT_BIND
+        self.port = __class__.DEFAULT_PORT
+        self.precision = __class__.DEFAULT_PRECISION
+        self.responses = {}
+        self.latency = ('none',)
+        self.burst_429 = 1
+        self.rate_429 = 0.0
+        self.rate_404 = 0.0
+        self.rate_5xx = 0.0
+        self.rate_slow_loris = 0.0
+        self.slow_loris_interval = 1.0
+        self.token = None
+        self.random = random.Random()
+        self.lock = threading.Lock()
+        self.pending_429 = 0
+        self.statistics = { 'requests': 0, 'ok': 0, 'not-found': 0, 'too-many-requests': 0, 'server-error': 0, 'slow-loris': 0, 'unauthorized': 0, 'bad-request': 0 }
+        try:
+            opts, _args = getopt.getopt(argv, 'b:C:F:hp:', [
+                                             'bind=',
+                                             'burst-429=',
+                                             'cache-file=',
+                                             'copyright',
+                                             'fixture=', 'fixture-file=',
+                                             'help',
+                                             'latency=',
+                                             'port=',
+                                             'precision=',
+                                             'rate-404=',
+                                             'rate-429=',
+                                             'rate-5xx=',
+                                             'seed=',
+                                             'slow-loris=',
+                                             'slow-loris-interval=',
+                                             'token='])
+            for opt, arg in opts:
+                if opt in ['-b', '--bind']:
+                    self.bind = arg
+                elif opt in ['--burst-429']:
+                    self.burst_429 = int(arg)
+                    if self.burst_429 < 1: raise ValueError(f'Bad {opt} value: {arg}')
+                elif opt in ['-C', '--cache-file']:
+                    path = os.path.realpath(arg)
+                    if not Validate.file_readable(path): raise ValueError(f'Can not read cache file: {path}')
+                    self.responses |= self.load_cache(path)
+                elif opt in ['--copyright']:
+                    print(self.copyright())
+                    sys.exit()
+                elif opt in ['-F', '--fixture', '--fixture-file']:
+                    path = os.path.realpath(arg)
+                    if not Validate.file_readable(path): raise ValueError(f'Can not read fixture file: {path}')
+                    self.responses |= self.load_fixture(path)
+                elif opt in ['-h', '--help']:
+                    print(self.usage())
+                    sys.exit()
+                elif opt in ['--latency']:
+                    self.latency = self.parse_latency(arg)
+                elif opt in ['-p', '--port']:
+                    self.port = int(arg)
+                elif opt in ['--precision']:
+                    if not (arg.isdigit() and int(arg) >= 0): raise ValueError(f'precision must be an integer >= 0: {arg}')
+                    self.precision = int(arg)
+                elif opt in ['--rate-404']:
+                    self.rate_404 = self.parse_rate(opt, arg)
+                elif opt in ['--rate-429']:
+                    self.rate_429 = self.parse_rate(opt, arg)
+                elif opt in ['--rate-5xx']:
+                    self.rate_5xx = self.parse_rate(opt, arg)
+                elif opt in ['--seed']:
+                    self.random.seed(int(arg))
+                elif opt in ['--slow-loris']:
+                    self.rate_slow_loris = self.parse_rate(opt, arg)
+                elif opt in ['--slow-loris-interval']:
+                    self.slow_loris_interval = float(arg)
+                elif opt in ['--token']:
+                    self.token = arg
+                else:
+                    assert False, f'unhandled option: {opt}'
+        except getopt.GetoptError as exception:
+            logging.error(exception)
+            print(self.usage())
+            sys.exit(2)
+        # The responses are keyed by the query coordinate canonicalized to `precision`
+        self.responses = { self.key(*k): v for (k, v) in self.responses.items() }
+
+
+    def copyright(self):
+        return '''
+LocationIQ stand-in server (standin_server)
+
+Copyright (C) 2021 Marie Selby Botanical Gardens
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+    def execute(self):
+        server = self.server()
+        logging.info(f'serving {len(self.responses)} responses on http://{server.server_address[0]}:{server.server_address[1]}')
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            logging.info(f'statistics {json.dumps(self.statistics)}')
+
+
+    @classmethod
+    def instance(cls, argv):
+        if not cls.__instance:
+            cls.__instance = cls(argv)
+        return cls.__instance
+
+
+    def key(self, latitude, longitude) -> Tuple[float, float]:
+        return (round(float(latitude), self.precision), round(float(longitude), self.precision))
+
+
+    @staticmethod
+    def load_cache(path: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        '''
+        The responses recorded in a gqc cache file: the original response if
+        the cached location kept it, otherwise one made up from the location
+        '''
+        result = {}
+        with open(path, 'r') as filehandle:
+            cache = json.loads(filehandle.read())
+        for (key, value) in cache.items():
+            query = dict(p.split(':', 1) for p in key.split(','))
+            location = json.loads(value)
+            metadata = location.get('metadata', {})
+            response = metadata.get('__response')
+            if not response:
+                pd = location.get('political_division', {})
+                address = { k: pd[l] for (k, l) in zip(['country', 'state', 'county', 'city', 'suburb', 'neighbourhood'], ['country', 'pd1', 'pd2', 'pd3', 'pd4', 'pd5']) if pd.get(l) }
+                response = { 'lat': str(location['coordinate']['latitude']), 'lon': str(location['coordinate']['longitude']), 'address': address }
+                if 'boundingbox' in metadata:
+                    response['boundingbox'] = metadata['boundingbox']
+                if 'distance' in metadata:
+                    response['distance'] = metadata['distance']
+            result[(query['latitude'], query['longitude'])] = response
+        return result
+
+
+    @staticmethod
+    def load_fixture(path: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        '''
+        The responses in a fixture file: a JSON object mapping a query
+        coordinate, written as «latitude,longitude», to the response body
+        '''
+        with open(path, 'r') as filehandle:
+            fixture = json.loads(filehandle.read())
+        return { tuple(k.split(',', 1)): v for (k, v) in fixture.items() }
+
+
+    @staticmethod
+    def parse_latency(spec: str) -> Tuple:
+        '''
+        A latency distribution «name[:p1[:p2]]» in seconds; one of «none»,
+        «fixed:S», «uniform:A:B», «normal:MU:SIGMA», «lognormal:MU:SIGMA»,
+        «exponential:MEAN» or «pareto:SCALE:ALPHA»
+        '''
+        parts = spec.split(':')
+        arity = { 'none': 0, 'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exponential': 1, 'pareto': 2 }
+        if (parts[0] not in arity) or (len(parts) != arity[parts[0]] + 1):
+            raise ValueError(f'Bad latency value: {spec}')
+        return (parts[0],) + tuple(float(p) for p in parts[1:])
+
+
+    @staticmethod
+    def parse_rate(opt: str, arg: str) -> float:
+        rate = float(arg)
+        if not (rate >= 0.0 and rate <= 1.0): raise ValueError(f'{opt} must be a probability between 0 and 1: {arg}')
+        return rate
+
+
+    def respond(self, query: Dict[str, str]) -> Tuple[int, Dict[str, Any], bool]:
+        '''
+        The (status, body, slow-loris) answer to a request with the given query
+        parameters, applying the fault injection and counting the outcome
+        '''
+        with self.lock:
+            self.statistics['requests'] += 1
+            draw = self.random.random
+            if self.token is not None and query.get('key') != self.token:
+                self.statistics['unauthorized'] += 1
+                return (http.HTTPStatus.UNAUTHORIZED, {'error': 'Invalid key'}, False)
+            if self.pending_429 == 0 and self.rate_429 > 0 and draw() < self.rate_429:
+                self.pending_429 = self.burst_429
+            if self.pending_429 > 0:
+                self.pending_429 -= 1
+                self.statistics['too-many-requests'] += 1
+                return (http.HTTPStatus.TOO_MANY_REQUESTS, {'error': 'Rate Limited Second'}, False)
+            if self.rate_5xx > 0 and draw() < self.rate_5xx:
+                self.statistics['server-error'] += 1
+                status = self.random.choice(__class__.SERVER_ERRORS)
+                return (status, {'error': status.phrase}, False)
+            if self.rate_404 > 0 and draw() < self.rate_404:
+                self.statistics['not-found'] += 1
+                return (http.HTTPStatus.NOT_FOUND, {'error': 'Unable to geocode'}, False)
+            try:
+                key = self.key(query['lat'], query['lon'])
+            except (KeyError, ValueError):
+                self.statistics['bad-request'] += 1
+                return (http.HTTPStatus.BAD_REQUEST, {'error': 'Invalid Request'}, False)
+            if key not in self.responses:
+                self.statistics['not-found'] += 1
+                return (http.HTTPStatus.NOT_FOUND, {'error': 'Unable to geocode'}, False)
+            slow = self.rate_slow_loris > 0 and draw() < self.rate_slow_loris
+            if slow:
+                self.statistics['slow-loris'] += 1
+            self.statistics['ok'] += 1
+            return (http.HTTPStatus.OK, self.responses[key], slow)
+
+
+    def sample_latency(self) -> float:
+        name, *p = self.latency
+        with self.lock:
+            if name == 'none':
+                seconds = 0.0
+            elif name == 'fixed':
+                seconds = p[0]
+            elif name == 'uniform':
+                seconds = self.random.uniform(p[0], p[1])
+            elif name == 'normal':
+                seconds = self.random.normalvariate(p[0], p[1])
+            elif name == 'lognormal':
+                seconds = self.random.lognormvariate(p[0], p[1])
+            elif name == 'exponential':
+                seconds = self.random.expovariate(1.0 / p[0])
+            else:
+                seconds = p[0] * self.random.paretovariate(p[1])
+        return max(seconds, 0.0)
+
+
+    def server(self) -> ThreadingHTTPServer:
+        ''' A (not yet serving) HTTP server bound to the configured address '''
+        standin = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                if url.path == '/stats':
+                    with standin.lock:
+                        self.send(http.HTTPStatus.OK, dict(standin.statistics))
+                    return
+                if url.path not in StandInServer.PATHS:
+                    self.send(http.HTTPStatus.NOT_FOUND, {'error': 'Unknown endpoint'})
+                    return
+                query = dict(urllib.parse.parse_qsl(url.query))
+                status, body, slow = standin.respond(query)
+                time.sleep(standin.sample_latency())
+                self.send(status, body, slow)
+
+            def log_message(self, format, *args):
+                logging.debug(format % args)
+
+            def send(self, status, body, slow=False):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if slow:
+                    for i in range(len(data)):
+                        self.wfile.write(data[i:i+1])
+                        self.wfile.flush()
+                        time.sleep(standin.slow_loris_interval)
+                else:
+                    self.wfile.write(data)
+
+        return ThreadingHTTPServer((self.bind, self.port), Handler)
+
+
+    def usage(self):
+        return f'''
+Usage: standin_server [OPTION]...
+
+A local stand-in for the LocationIQ reverse geolocation service. It answers
+the `/v1/reverse.php` requests gqc makes (see `reverse-url-format`) from a
+fixture file or a gqc cache file. Point gqc at it with, for example,
+`--api-host 127.0.0.1:{__class__.DEFAULT_PORT}` and an `http://` reverse-url-format.
+
+  -b, --bind address           Address to listen on; defaults to {__class__.DEFAULT_BIND}
+      --burst-429 n            Number of consecutive TOO_MANY_REQUESTS responses in a
+                               burst; defaults to 1
+  -C, --cache-file file        Answer from the locations in a gqc cache file
+      --copyright              Display the copyright and exit
+  -F, --fixture file           Answer from a JSON object mapping «latitude,longitude»
+                               to a response body
+  -h, --help                   Display this help and exit
+      --latency d              Response latency distribution in seconds; one of
+                               'none', 'fixed:S', 'uniform:A:B', 'normal:MU:SIGMA',
+                               'lognormal:MU:SIGMA', 'exponential:MEAN' or
+                               'pareto:SCALE:ALPHA'; defaults to 'none'
+  -p, --port n                 Port to listen on; defaults to {__class__.DEFAULT_PORT}
+      --precision p            Fractional digits used to match query coordinates;
+                               defaults to {__class__.DEFAULT_PRECISION}
+      --rate-404 p             Probability of a spurious NOT_FOUND response
+      --rate-429 p             Probability of starting a burst of TOO_MANY_REQUESTS
+      --rate-5xx p             Probability of a 500, 502 or 503 response
+      --seed n                 Random seed for reproducible runs
+      --slow-loris p           Probability of sending a response body one byte at a time
+      --slow-loris-interval s  Seconds between the bytes of a slow-loris response;
+                               defaults to 1
+      --token t                Require the `key` query parameter to equal t
+      --                       Terminates the list of options
+
+Coordinates without a response are answered with NOT_FOUND, as LocationIQ
+does. GET /stats returns the response counters.
+'''
+
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s standin_server [%(levelname)s] %(message)s')
+    try:
+        sys.exit(StandInServer.instance(sys.argv[1:]).execute())
+    except IOError as e:
+        if e.errno == errno.EPIPE:
+            pass
+    except KeyboardInterrupt as _:
+        pass
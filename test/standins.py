@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+'''
+Stand-ins for the parts of a `Config`, a `Cache` and a `GQC` the modules
+use, so that the unit tests need no gqc.cfg, cache file or provider; a test
+adds to the stand-in `Checker` whatever it checks rows with
+'''
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from distributed import Coordinator
+from results_store import ResultsStore
+
+
+class Settings:
+    ''' The [gqc] settings (the verdict settings blank unless given), a [location-iq] section, the active columns and the system settings '''
+    GQC = { 'provider': 'locationiq', 'log-file': '/tmp/a.log', 'cache-enabled': 'true', 'first-line-is-header': 'true',
+            'lookup-threads': 8, 'deadline-reserve-seconds': 60, 'prefetch-spill-size': 100, 'spatial-order': '' }
+    COLUMNS = { 'country': 0, 'pd1': 1, 'accession-number': 2, 'latitude': 3, 'longitude': 4 }
+
+    def __init__(self, columns=None, system=None, **gqc):
+        blank = { k: '' for k in ResultsStore.HASHED_KEYS['gqc'] + Coordinator.DEADLINE_SETTINGS }
+        self.config = { 'gqc': dict(blank, **dict(Settings.GQC, **gqc)),
+                        'location-iq': { 'api-host': 'localhost', 'api-token': 'secret', 'reverse-url-format': '' } }
+        self.columns = columns or Settings.COLUMNS
+        self.system = system or {}
+
+    def value(self, prop):
+        return self.config['gqc'][prop]
+
+    def put(self, prop, value, section='gqc'):
+        if prop in self.config[section]:
+            self.config[section][prop] = value
+
+    def sys_get(self, prop):
+        return self.system.get(prop)
+
+    def active_columns(self):
+        return self.columns
+
+
+class Cache(dict):
+    ''' The entries, with the flushes counted; every entry is a change '''
+    def __init__(self, entries=()):
+        super().__init__(entries)
+        self.persist = True
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+    def changes(self, save=False):
+        return dict(self)
+
+    def merge(self, entries):
+        self.update(entries)
+
+
+class Checker:
+    ''' A stand in `GQC` of the `Settings` (or the `gqc` settings), an empty `Cache`, no --previous and no deadline '''
+    RESULT_KEYS = ('action', 'reason')
+
+    def __init__(self, settings=None, **gqc):
+        self.config = settings or Settings(**gqc)
+        self.cache = Cache()
+        self.previous = None
+        self.deadline = None
+
+    def select_rows(self, reader):
+        return reader
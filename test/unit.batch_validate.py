@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import batch_validate
+from batch_validate import BatchValidator
+from coordinate import Coordinate
+import random
+import unittest
+
+def row(latitude, longitude, accession_number='1', country='Bolivia'):
+    return { 'country': country, 'pd1': '', 'accession-number': accession_number, 'latitude': latitude, 'longitude': longitude }
+
+class BatchValidatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.validator = BatchValidator(3, 3)
+
+    def reasons(self, rows):
+        return [(v[1].get('reason') if v else None) for v in self.validator.validate(rows)]
+
+    def test_errors(self):
+        rows = [ { 'country': '', 'pd1': '', 'accession-number': '', 'latitude': '', 'longitude': '' },
+                 row('', '', country='  # a comment'),
+                 row('1', '2', accession_number='A12'),
+                 row('', ''),
+                 row('', '2'),
+                 row('x', '2'),
+                 row('91', '2'),
+                 row('1', ''),
+                 row('1', 'y'),
+                 row('1', '-361'),
+                 row('-inf', '2'),
+                 row('nan', '2'),
+                 row('1', 'nan'),
+                 row('nan', ''),
+                 row('-16.5', '-68.15') ]
+        self.assertEqual(self.reasons(rows), ['blank-line', 'comment-line', 'accession-number-not-integer', 'no-latitude-or-longitude',
+                                              'no-latitude', 'latitude-number-not-decimal-float', 'latitude-range-error', 'no-longitude',
+                                              'longitude-number-not-decimal-float', 'longitude-range-error', 'latitude-range-error',
+                                              None, None, 'no-longitude', None])
+        validations = self.validator.validate(rows)
+        self.assertEqual(validations[0][1]['action'], 'ignore')
+        self.assertEqual(validations[6][1]['action'], 'error')
+        self.assertIsNone(validations[11])
+        self.assertEqual(validations[14], (Coordinate(-16.5, -68.15), {}))
+
+    def test_round_matches_format(self):
+        random.seed(11)
+        values = [random.uniform(-360, 360) for _ in range(20000)]
+        # exact ties and near ties in binary
+        values += [0.0005, -0.0005, 1.0005, 2.675, -2.675, 0.125, 1.2345, -0.00049, 359.9995, -0.0]
+        values += [round(v, 4) + 0.0005 for v in values[:2000]]
+        for precision in (0, 1, 3, 5):
+            expected = [float('{0:.{1}f}'.format(v, precision)) for v in values]
+            self.assertEqual(BatchValidator.round(values, precision), expected)
+
+    @unittest.skipIf(batch_validate.numpy is None, 'NumPy is not installed')
+    def test_without_numpy(self):
+        rows = [row(str(random.uniform(-90, 90)), str(random.uniform(-180, 180))) for _ in range(1000)] + [row('95', '1'), row('nan', '1')]
+        expected = self.validator.validate(rows)
+        numpy = batch_validate.numpy
+        try:
+            batch_validate.numpy = None
+            self.assertEqual(self.validator.validate(rows), expected)
+        finally:
+            batch_validate.numpy = numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from boundary import BoundaryIndex
+import json
+import pickle
+import tempfile
+import unittest
+
+def square(west, south, east, north):
+    return [(west, south), (east, south), (east, north), (west, north), (west, south)]
+
+class Unpickled:
+    ''' Creates the marker file when it is unpickled '''
+    def __init__(self, marker):
+        self.marker = marker
+
+    def __reduce__(self):
+        return (open, (self.marker, 'w'))
+
+class BoundaryIndexTestCase(unittest.TestCase):
+    PROPERTIES = { 'country': ['ADM0_NAME'], 'pd1': ['ADM1_NAME'], 'pd2': ['ADM2_NAME'] }
+
+    def setUp(self):
+        self.geojson = {
+            'type': 'FeatureCollection',
+            'features': [
+                { 'type': 'Feature', 'properties': { 'ADM0_NAME': 'Westland' },
+                  'geometry': { 'type': 'Polygon', 'coordinates': [square(-10, -10, 0, 10)] } },
+                { 'type': 'Feature', 'properties': { 'ADM0_NAME': 'Eastland' },
+                  'geometry': { 'type': 'MultiPolygon', 'coordinates': [[square(0, -10, 10, 10)], [square(20, 20, 21, 21)]] } },
+                { 'type': 'Feature', 'properties': { 'ADM0_NAME': 'Eastland', 'ADM1_NAME': 'Ring' },
+                  'geometry': { 'type': 'Polygon', 'coordinates': [square(2, 2, 8, 8), square(4, 4, 6, 6)] } },
+                { 'type': 'Feature', 'properties': { 'name': 'unnamed' },
+                  'geometry': { 'type': 'Polygon', 'coordinates': [square(-90, -10, -80, 10)] } },
+            ]
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.geojson', delete=False) as f:
+            json.dump(self.geojson, f)
+            self.path = f.name
+        self.index = BoundaryIndex.from_geojson(self.path, self.PROPERTIES, cell_degrees=5.0)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def names(self, latitude, longitude):
+        return [f.names for f in self.index.query(latitude, longitude)]
+
+    def test_load(self):
+        self.assertEqual(len(self.index), 3)
+
+    def test_query_country(self):
+        self.assertEqual(self.names(5, -5), [('Westland', '', '')])
+        self.assertEqual(self.names(-5, 5), [('Eastland', '', '')])
+        self.assertEqual(self.names(20.5, 20.5), [('Eastland', '', '')])
+
+    def test_query_pd1_and_hole(self):
+        self.assertEqual(self.names(3, 3), [('Eastland', '', ''), ('Eastland', 'Ring', '')])
+        self.assertEqual(self.names(5, 5), [('Eastland', '', '')])
+
+    def test_query_outside(self):
+        self.assertEqual(self.names(50, 50), [])
+        self.assertEqual(self.names(0, -85), [])
+
+    def test_query_normalizes_longitude(self):
+        self.assertEqual(self.names(5, 355), [('Westland', '', '')])
+
+    def test_border_distance(self):
+        feature = self.index.query(5, -5)[0]
+        self.assertAlmostEqual(self.index.border_distance(feature, 0, -1), 111320.0, delta=1.0)
+
+    def test_compiled_round_trip(self):
+        path = self.path + BoundaryIndex.COMPILED_SUFFIX
+        try:
+            self.index.save(path)
+            index = BoundaryIndex.load(path, self.PROPERTIES)
+            self.assertEqual(len(index), len(self.index))
+            self.assertEqual([f.names for f in index.query(3, 3)], self.names(3, 3))
+        finally:
+            os.remove(path)
+
+    def test_compiled_is_data(self):
+        path = self.path + BoundaryIndex.COMPILED_SUFFIX
+        try:
+            self.index.save(path)
+            with open(path) as f:
+                data = json.load(f)
+            self.assertEqual(data['format'], BoundaryIndex.COMPILED_FORMAT)
+            self.assertEqual([n for (n, _) in data['features']], [list(f.names) for f in self.index.features])
+            index = BoundaryIndex.load(path, self.PROPERTIES)
+            self.assertEqual(index.grid, self.index.grid)
+            self.assertEqual(index.features, self.index.features)
+        finally:
+            os.remove(path)
+
+    def test_compiled_pickle_refused(self):
+        # a pickled (version 1) index, or a crafted file, is refused without being unpickled
+        marker = self.path + '.unpickled'
+        path = self.path + BoundaryIndex.COMPILED_SUFFIX
+        try:
+            with open(path, 'wb') as f:
+                pickle.dump(Unpickled(marker), f)
+            with self.assertRaises(ValueError):
+                BoundaryIndex.load(path, self.PROPERTIES)
+            self.assertFalse(os.path.exists(marker))
+            with open(path, 'w') as f:
+                json.dump({ 'format': BoundaryIndex.COMPILED_FORMAT, 'version': 1 }, f)
+            with self.assertRaises(ValueError):
+                BoundaryIndex.load(path, self.PROPERTIES)
+        finally:
+            os.remove(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -55,6 +55,28 @@ class CacheTestCase(unittest.TestCase):
         for key in notkeys:
             self.assertFalse(key in cache2)
 
+    def test_not_persisted(self):
+        cache = Cache(self.path, persist=False)
+        data = { self.randomNameString() : self.randomNameString(20) for _ in range(10) }
+        for key, value in data.items():
+            cache[key] = value
+        self.assertFalse(os.path.exists(self.path))
+        self.assertDictEqual(cache.changes(), data)
+        self.assertDictEqual(cache.changes(), {})
+
+    def test_changes_saved(self):
+        cache = Cache(self.path, persist=False)
+        data = { self.randomNameString() : self.randomNameString(20) for _ in range(10) }
+        cache.merge(data)
+        self.assertDictEqual(cache.changes(save=True), data)
+        self.assertDictEqual(dict(Cache(self.path).items()), data)
+
+    def test_merge(self):
+        cache = Cache(self.path)
+        data = { self.randomNameString() : self.randomNameString(20) for _ in range(10) }
+        cache.merge(data)
+        cache2 = Cache(self.path)
+        self.assertDictEqual(dict(cache2.items()), data)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from checkpoint import Checkpoint, LineReader
+import csv
+import tempfile
+import unittest
+
+class CheckpointTestCase(unittest.TestCase):
+    ROWS = [['a', 'b'], ['1', 'two\nlines'], ['ü', '3'], ['4', '5']]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.directory.name, 'input.csv')
+        self.output_file = os.path.join(self.directory.name, 'output.csv')
+        self.path = os.path.join(self.directory.name, 'checkpoint.json')
+        with open(self.input_file, 'w', newline='', encoding='utf-8') as filehandle:
+            csv.writer(filehandle).writerows(CheckpointTestCase.ROWS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self, checkpoint, offset=0, start=0):
+        with open(self.input_file, 'rb') as filehandle:
+            filehandle.seek(offset)
+            lines = LineReader(filehandle, 'utf-8', offset)
+            return list(checkpoint.rows(csv.reader(lines), lines, start))
+
+    def test_offsets(self):
+        checkpoint = Checkpoint(self.path, self.input_file, self.output_file, every=2)
+        self.assertEqual(self.read(checkpoint), list(enumerate(CheckpointTestCase.ROWS)))
+        with open(self.output_file, 'w', newline='') as output:
+            for n in range(3):
+                output.write(f'row {n}\n')
+                checkpoint.written(n, output)
+            checkpoint.save(output)
+        data = checkpoint.load()
+        self.assertEqual(data['row-number'], 2)
+        self.assertEqual(data['output-offset'], len('row 0\nrow 1\nrow 2\n'))
+        resumed = Checkpoint(self.path, self.input_file, self.output_file)
+        self.assertEqual(self.read(resumed, data['input-offset'], data['row-number'] + 1), [(3, ['4', '5'])])
+
+    def test_other_run(self):
+        checkpoint = Checkpoint(self.path, self.input_file, self.output_file)
+        self.assertRaises(ValueError, checkpoint.load)
+        self.read(checkpoint)
+        with open(self.output_file, 'w', newline='') as output:
+            checkpoint.written(0, output)
+            checkpoint.save(output)
+        other = Checkpoint(self.path, self.input_file, os.path.join(self.directory.name, 'other.csv'))
+        self.assertRaises(ValueError, other.load)
+        # nor does it remove this run's checkpoint
+        other.remove()
+        self.assertTrue(os.path.exists(self.path))
+        checkpoint.remove()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_two_runs(self):
+        ''' Two runs on different files, at the same time, each with its default checkpoint '''
+        runs = []
+        for name in ('peru', 'chile'):
+            input_file = os.path.join(self.directory.name, f'{name}.csv')
+            with open(input_file, 'w', newline='', encoding='utf-8') as filehandle:
+                csv.writer(filehandle).writerows(CheckpointTestCase.ROWS)
+            output_file = os.path.join(self.directory.name, f'{name}.out.csv')
+            runs.append(Checkpoint(Checkpoint.path_for(output_file), input_file, output_file, every=1))
+        self.assertNotEqual(runs[0].path, runs[1].path)
+        self.assertEqual(os.path.join(self.directory.name, 'peru.out.csv.gqc-checkpoint.json'), runs[0].path)
+        outputs = [open(run.output_file, 'w', newline='') for run in runs]
+        try:
+            for (run, output) in zip(runs, outputs):
+                with open(run.input_file, 'rb') as filehandle:
+                    lines = LineReader(filehandle, 'utf-8')
+                    list(run.rows(csv.reader(lines), lines))
+            # the runs interleave: the first writes two rows, the second one
+            for (run, output, row_number) in [(runs[0], outputs[0], 0), (runs[1], outputs[1], 0), (runs[0], outputs[0], 1)]:
+                output.write('row\n')
+                run.written(row_number, output)
+        finally:
+            for output in outputs:
+                output.close()
+        self.assertEqual(1, runs[0].load()['row-number'])
+        self.assertEqual(0, runs[1].load()['row-number'])
+        # the first run completes: the second can still resume
+        runs[0].remove()
+        self.assertFalse(os.path.exists(runs[0].path))
+        self.assertEqual(0, runs[1].load()['row-number'])
+
+
+if __name__ == '__main__':
+    unittest.main()
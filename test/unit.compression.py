@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from compression import Compression
+import csv
+import gzip
+import tempfile
+import unittest
+
+class CompressionTestCase(unittest.TestCase):
+    ROWS = [['country', 'pd1', 'accession-number'], ['Perú', 'two\nlines', '1'], ['Bolivia', 'La Paz', '2']]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def write(self, path, codec=None):
+        with Compression.open(path, 'w', codec) as filehandle:
+            csv.writer(filehandle).writerows(CompressionTestCase.ROWS)
+
+    def read(self, path):
+        with Compression.open(path) as filehandle:
+            return list(csv.reader(filehandle))
+
+    def test_round_trip(self):
+        codecs = [c for c in Compression.CODECS if Compression.available(c)]
+        for codec in codecs:
+            path = self.path(f'by-codec-{codec}.csv')
+            self.write(path, codec)
+            self.assertEqual(Compression.of_file(path), codec)
+            self.assertEqual(self.read(path), CompressionTestCase.ROWS)
+
+    def test_extension(self):
+        for (extension, codec) in (('.csv.gz', 'gzip'), ('.csv.bz2', 'bz2'), ('.csv.xz', 'xz'), ('.csv', 'none')):
+            path = self.path(f'output{extension}')
+            # the extension wins over the codec given
+            self.write(path, 'bz2' if codec == 'gzip' else None)
+            self.assertEqual(Compression.of_file(path), codec)
+            self.assertEqual(self.read(path), CompressionTestCase.ROWS)
+
+    def test_concatenated(self):
+        path = self.path('input')
+        with open(path, 'wb') as filehandle:
+            filehandle.write(gzip.compress(b'a,b\r\n'))
+            filehandle.write(gzip.compress(b'c,d\r\n'))
+        self.assertEqual(self.read(path), [['a', 'b'], ['c', 'd']])
+
+    def test_closes(self):
+        path = self.path('input.gz')
+        self.write(path)
+        filehandle = Compression.open(path)
+        filehandle.close()
+        self.assertTrue(filehandle.buffer.source.closed)
+
+    def test_available(self):
+        self.assertTrue(Compression.available('gzip'))
+        self.assertFalse(Compression.available('zip'))
+
+
+if __name__ == '__main__':
+    unittest.main()
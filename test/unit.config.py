@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+import configparser
+import tempfile
+import unittest
+
+class ConfigFileTestCase(unittest.TestCase):
+    def read(self, text):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'gqc.cfg')
+            with open(path, 'w') as f:
+                f.write(text)
+            parser = configparser.ConfigParser(default_section=Config.SECTION_GQC)
+            parser.read([path])
+        return Config._Config__configparser_to_dict(parser)
+
+    def test_gqc_section(self):
+        # [gqc] is configparser's default section: it is not one of its sections()
+        result = self.read('[gqc]\nshard-size = 20\nqueue-size = 50\n[location-iq]\napi-host = localhost\n')
+        self.assertEqual('20', result[Config.SECTION_GQC]['shard-size'])
+        self.assertEqual('50', result[Config.SECTION_GQC]['queue-size'])
+        self.assertEqual('localhost', result[Config.SECTION_LOCATIONIQ]['api-host'])
+
+    def test_no_gqc_section(self):
+        result = self.read('[location-iq]\napi-host = localhost\n')
+        self.assertNotIn(Config.SECTION_GQC, result)
+        self.assertEqual({ 'api-host': 'localhost' }, result[Config.SECTION_LOCATIONIQ])
+
+
+if __name__ == '__main__':
+    unittest.main()
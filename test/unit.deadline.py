@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from deadline import Deadline
+import datetime
+import unittest
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class DeadlineTestCase(unittest.TestCase):
+    def run_rows(self, deadline, clock, rows, seconds_per_row):
+        for _ in range(rows):
+            clock.now += seconds_per_row
+            deadline.done()
+
+    def test_parse_time(self):
+        now = datetime.datetime(2021, 3, 4, 12, 0)
+        self.assertEqual(Deadline.parse_time('13:30', now), datetime.datetime(2021, 3, 4, 13, 30).timestamp())
+        self.assertEqual(Deadline.parse_time('6:00', now), datetime.datetime(2021, 3, 5, 6, 0).timestamp())
+        self.assertEqual(Deadline.parse_time('2021-03-06T01:02:03', now), datetime.datetime(2021, 3, 6, 1, 2, 3).timestamp())
+        with self.assertRaises(ValueError):
+            Deadline.parse_time('noon', now)
+
+    def test_parse_duration(self):
+        self.assertEqual(Deadline.parse_duration('90'), 90.0)
+        self.assertEqual(Deadline.parse_duration('90m'), 5400.0)
+        self.assertEqual(Deadline.parse_duration('1h30m'), 5400.0)
+        self.assertEqual(Deadline.parse_duration('2h5s'), 7205.0)
+        for text in ('', 'soon', '1d'):
+            with self.assertRaises(ValueError):
+                Deadline.parse_duration(text)
+
+    def test_within(self):
+        clock = Clock(0.0)
+        deadline = Deadline(1000.0, 1000, 10.0, clock)
+        self.run_rows(deadline, clock, 1000, 0.5)
+        self.assertEqual(deadline.current(), Deadline.FULL)
+        self.assertEqual(deadline.statistics[Deadline.FULL], 1000)
+
+    def test_degrade_and_recover(self):
+        clock = Clock(0.0)
+        deadline = Deadline(1000.0, 2000, 10.0, clock)
+        # 1s a row projects 1900s for the rows left: one step down at a time
+        self.run_rows(deadline, clock, Deadline.INTERVAL, 1.0)
+        self.assertEqual(deadline.current(), Deadline.NO_CORRECTIONS)
+        self.run_rows(deadline, clock, Deadline.INTERVAL, 1.0)
+        self.assertEqual(deadline.current(), Deadline.CACHE_ONLY)
+        # cached rows are fast: once the recent rate is well within the deadline it steps back up
+        self.run_rows(deadline, clock, Deadline.WINDOW, 0.01)
+        self.assertEqual(deadline.current(), Deadline.FULL)
+        self.assertGreaterEqual(deadline.statistics['mode-changes'], 4)
+
+    def test_reserve(self):
+        clock = Clock(0.0)
+        deadline = Deadline(100.0, None, 10.0, clock)
+        self.assertEqual(deadline.current(), Deadline.FULL)
+        clock.now = 89.0
+        self.assertEqual(deadline.current(), Deadline.FULL)
+        clock.now = 90.0
+        self.assertEqual(deadline.current(), Deadline.CACHE_ONLY)
+
+    def test_count_rows(self):
+        path = os.path.abspath(__file__)
+        with open(path, 'rb') as filehandle:
+            lines = filehandle.read().count(b'\n')
+        self.assertEqual(Deadline.count_rows([path, path]), 2 * lines)
+        self.assertIsNone(Deadline.count_rows([path, os.path.dirname(path)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from distributed import Coordinator, WorkQueue, Worker
+import standins
+import tempfile
+import threading
+import time
+import unittest
+
+class Checker(standins.Checker):
+    ''' A stand in `GQC` checking rows by upper casing them, with its `minimum-fuzzy-score` '''
+    def __init__(self, **gqc):
+        super().__init__(**gqc)
+        self.configured = []
+
+    def configure(self, changed=None):
+        self.configured.append(changed)
+
+    def check_rows(self, items):
+        self.cache.update((rawrow[0], 'v') for (_, rawrow) in items)
+        return [(row_number, rawrow, [self.config.value('minimum-fuzzy-score')] + [c.upper() for c in rawrow]) for (row_number, rawrow) in items]
+
+class WorkQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.queue = WorkQueue(os.path.join(self.directory.name, 'queue.db'))
+
+    def tearDown(self):
+        self.queue.close()
+        self.directory.cleanup()
+
+    def test_lease(self):
+        job_id = self.queue.create_job('c', { 'minimum-fuzzy-score': '70' })
+        self.queue.submit(job_id, 0, [(0, ['a'])])
+        self.queue.submit(job_id, 1, [(1, ['b'])])
+        self.assertEqual((job_id, 0, { 'minimum-fuzzy-score': '70' }, [(0, ['a'])]), self.queue.lease('w1', 60))
+        self.assertEqual(1, self.queue.lease('w2', 60)[1])
+        self.assertIsNone(self.queue.lease('w3', 60))
+        self.assertTrue(self.queue.renew(job_id, 0, 'w1', 60))
+        self.assertFalse(self.queue.renew(job_id, 0, 'w2', 60))
+
+    def test_expired_lease(self):
+        job_id = self.queue.create_job('c', {})
+        self.queue.submit(job_id, 0, [(0, ['a'])])
+        self.assertEqual(0, self.queue.lease('w1', -1)[1])
+        # the lease of w1 has expired: its chunk goes to the next worker
+        self.assertEqual(0, self.queue.lease('w2', 60)[1])
+        self.assertFalse(self.queue.renew(job_id, 0, 'w1', 60))
+        self.assertIsNone(self.queue.lease('w3', 60))
+
+    def test_first_completion_wins(self):
+        job_id = self.queue.create_job('c', {})
+        self.queue.submit(job_id, 0, [(0, ['a'])])
+        self.queue.lease('w1', -1)
+        self.queue.lease('w2', 60)
+        self.assertIsNone(self.queue.collect(job_id, 0))
+        self.assertTrue(self.queue.complete(job_id, 0, 'w2', [(0, ['a'], ['A'])], { 'k': 'v2' }))
+        self.assertFalse(self.queue.complete(job_id, 0, 'w1', [(0, ['a'], ['late'])], { 'k': 'v1' }))
+        self.assertEqual(([(0, ['a'], ['A'])], { 'k': 'v2' }), self.queue.collect(job_id, 0))
+        self.assertIsNone(self.queue.collect(job_id, 0))
+
+    def test_finished_job(self):
+        job_id = self.queue.create_job('c', {})
+        self.queue.submit(job_id, 0, [(0, ['a'])])
+        self.queue.finish_job(job_id)
+        self.assertIsNone(self.queue.lease('w1', 60))
+
+    def test_abandoned_job(self):
+        dead = self.queue.create_job('c1', {}, heartbeat=-1)
+        self.queue.submit(dead, 0, [(0, ['a'])])
+        alive = self.queue.create_job('c2', {}, heartbeat=60)
+        self.queue.submit(alive, 0, [(0, ['b'])])
+        # the heartbeat of the first coordinator has expired: its chunks are skipped, and dropped
+        self.assertEqual((alive, 0), self.queue.lease('w1', 60)[:2])
+        self.assertIsNone(self.queue.lease('w2', 60))
+        self.assertFalse(self.queue.beat(dead, 60))
+        self.assertTrue(self.queue.beat(alive, 60))
+
+    def test_heartbeat(self):
+        job_id = self.queue.create_job('c', {}, heartbeat=0.2)
+        self.queue.submit(job_id, 0, [(0, ['a'])])
+        time.sleep(0.3)
+        self.assertTrue(self.queue.beat(job_id, 60))
+        self.assertEqual(0, self.queue.lease('w1', 60)[1])
+
+class CoordinatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'queue.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_run(self):
+        items = [(n, [f'r{n}']) for n in range(25)]
+        coordinator = Checker(**{ 'minimum-fuzzy-score': '80' })
+        worker = Worker(Checker(**{ 'minimum-fuzzy-score': '70' }), WorkQueue(self.path), lease=60, idle=0.5, poll=0.01)
+        thread = threading.Thread(target=worker.execute)
+        thread.start()
+        results = list(Coordinator(coordinator, WorkQueue(self.path), shard_size=4, ahead=2, poll=0.01).run(items))
+        thread.join()
+        # in order, with the settings of the coordinator
+        self.assertEqual([(n, [f'r{n}'], ['80', f'R{n}']) for n in range(25)], results)
+        self.assertEqual({ 'chunks': 7, 'rows': 25, 'lost': 0 }, worker.statistics)
+        # and the cache entries of the worker
+        self.assertEqual({ f'r{n}': 'v' for n in range(25) }, coordinator.cache)
+        self.assertTrue(worker.gqc.cache.persist)
+
+    def test_heartbeat(self):
+        items = [(n, [f'r{n}']) for n in range(8)]
+        coordinator = Coordinator(Checker(), WorkQueue(self.path), shard_size=4, ahead=2, poll=0.05, heartbeat=0.3)
+        results = coordinator.run(items)
+        worker = Worker(Checker(), WorkQueue(self.path), lease=60, idle=0.1, poll=0.01)
+        thread = threading.Thread(target=lambda: (time.sleep(1), worker.execute()))
+        thread.start()
+        # the coordinator keeps its job alive while it waits, past the heartbeat
+        self.assertEqual([n for (n, _, _) in results], list(range(8)))
+        thread.join()
+        self.assertEqual({ 'chunks': 2, 'rows': 8, 'lost': 0 }, worker.statistics)
+
+    def test_abandoned(self):
+        queue = WorkQueue(self.path)
+        results = Coordinator(Checker(), WorkQueue(self.path), shard_size=4, poll=0.05, heartbeat=0.3).run([(0, ['a'])])
+        def abandon():
+            # as the next worker would, finding the heartbeat expired
+            time.sleep(0.15)
+            queue._transaction(lambda c: c.execute("UPDATE jobs SET state = 'abandoned'"))
+        thread = threading.Thread(target=abandon)
+        thread.start()
+        with self.assertRaises(RuntimeError):
+            list(results)
+        thread.join()
+        queue.close()
+
+    def test_settings(self):
+        checker = Checker(**{ 'minimum-fuzzy-score': '80', 'gazetteer-file': 'g.csv', 'lookup-threads': 2 })
+        settings = Coordinator.settings(checker.config)
+        self.assertEqual('g.csv', settings['gqc']['gazetteer-file'])
+        self.assertEqual('locationiq', settings['gqc']['provider'])
+        self.assertIn('deadline', settings['gqc'])
+        self.assertNotIn('lookup-threads', settings['gqc'])
+        self.assertEqual({ 'api-host': 'localhost', 'reverse-url-format': '' }, settings['location-iq'])
+
+    def test_job_settings_restored(self):
+        worker = Worker(Checker(**{ 'minimum-fuzzy-score': '70', 'lookup-threads': 2 }), WorkQueue(self.path), lease=60, idle=0.1, poll=0.01)
+        config = worker.gqc.config
+        worker.use({ 'gqc': { 'minimum-fuzzy-score': '80', 'previous': 'p.csv', 'deadline': '1e10' }, 'location-iq': { 'api-host': 'remote' } })
+        self.assertEqual(('80', 'p.csv', 2), (config.value('minimum-fuzzy-score'), config.value('previous'), config.value('lookup-threads')))
+        self.assertEqual('remote', config.config['location-iq']['api-host'])
+        self.assertEqual({ ('gqc', 'minimum-fuzzy-score'), ('gqc', 'previous'), ('gqc', 'deadline'), ('location-iq', 'api-host') },
+                         worker.gqc.configured[-1])
+        self.assertEqual(1e10, worker.gqc.deadline.end)
+        # the next job does not inherit the settings of the last
+        worker.use({ 'gqc': { 'minimum-fuzzy-score': '90' } })
+        self.assertEqual(('90', ''), (config.value('minimum-fuzzy-score'), config.value('previous')))
+        self.assertEqual('localhost', config.config['location-iq']['api-host'])
+        self.assertIsNone(worker.gqc.deadline)
+        worker.use({})
+        self.assertEqual('70', config.value('minimum-fuzzy-score'))
+
+    def test_bad_arguments(self):
+        with self.assertRaises(AssertionError):
+            Coordinator(Checker(), WorkQueue(self.path), shard_size=0)
+        with self.assertRaises(AssertionError):
+            Coordinator(Checker(), WorkQueue(self.path), heartbeat=0)
+        with self.assertRaises(AssertionError):
+            Worker(Checker(), WorkQueue(self.path), lease=0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from coordinate import Coordinate
+from extent_index import ExtentIndex
+from location import Location
+from political_division import PoliticalDivision
+import json
+import tempfile
+import unittest
+
+def entry(latitude, longitude, country, pd1):
+    return (f'latitude:{latitude},longitude:{longitude}',
+            json.dumps({ 'coordinate': { 'latitude': latitude, 'longitude': longitude },
+                         'political_division': { 'country': country, 'pd1': pd1 }, 'metadata': {} }))
+
+class ExtentIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.entries = dict([
+            # A block of La Paz around (-16.5, -68.1)
+            *[entry(-16.5 + i * 0.05, -68.1 + j * 0.05, 'Bolivia', 'La Paz') for i in range(-3, 4) for j in range(-3, 4)],
+            # A block of Antioquia around (6.3, -75.6)
+            *[entry(6.3 + i * 0.05, -75.6 + j * 0.05, 'Colombia', 'Antioquia') for i in range(-3, 4) for j in range(-3, 4)],
+            # A border between Oruro and La Paz around (-18.0, -67.0)
+            entry(-18.0, -67.0, 'Bolivia', 'Oruro'), entry(-18.0, -67.01, 'Bolivia', 'Oruro'), entry(-18.0, -67.05, 'Bolivia', 'La Paz'),
+        ])
+        self.index = ExtentIndex(cell_degrees=0.1, min_support=2)
+        self.index.refresh(self.entries)
+
+    def test_inside(self):
+        self.assertEqual(self.index.classify(Coordinate(-16.5, -68.1), PoliticalDivision(country='Bolivia', pd1='La Paz'))[0], ExtentIndex.INSIDE)
+        self.assertEqual(self.index.classify(Coordinate(-16.5, -68.1), PoliticalDivision(country='bolivia', pd1=''))[0], ExtentIndex.INSIDE)
+
+    def test_outside_country(self):
+        (prediction, level, division) = self.index.classify(Coordinate(6.3, -75.6), PoliticalDivision(country='Bolivia', pd1='La Paz'))
+        self.assertEqual((prediction, level, division), (ExtentIndex.OUTSIDE, 'country', ('colombia', 'antioquia')))
+
+    def test_outside_pd1(self):
+        (prediction, level, _) = self.index.classify(Coordinate(-16.5, -68.1), PoliticalDivision(country='Bolivia', pd1='Potosi'))
+        self.assertEqual((prediction, level), (ExtentIndex.OUTSIDE, 'pd1'))
+
+    def test_unknown(self):
+        # No cached locations nearby
+        self.assertEqual(self.index.classify(Coordinate(40.0, 40.0), PoliticalDivision(country='Bolivia', pd1='La Paz'))[0], ExtentIndex.UNKNOWN)
+        # Near a pd1 border
+        self.assertEqual(self.index.classify(Coordinate(-18.0, -67.0), PoliticalDivision(country='Bolivia', pd1='Oruro'))[0], ExtentIndex.UNKNOWN)
+
+    def test_non_latin_names(self):
+        # names without Latin letters normalize to nothing: they are looked up, not taken as inside
+        self.assertEqual(self.index.classify(Coordinate(-16.5, -68.1), PoliticalDivision(country='Bolivia', pd1='Ла-Пас'))[0], ExtentIndex.UNKNOWN)
+        self.assertEqual(self.index.classify(Coordinate(-16.5, -68.1), PoliticalDivision(country='Боливия', pd1='Ла-Пас'))[0], ExtentIndex.UNKNOWN)
+        # and the locations with such names are not indexed as having no pd1
+        self.index.refresh(dict(self.entries, **dict([entry(55.75, 37.61, 'Russia', 'Москва'), entry(55.76, 37.62, 'Russia', 'Москва')])))
+        self.assertNotIn(('russia', ''), [d for counts in self.index.cells.values() for d in counts])
+        self.assertEqual(self.index.classify(Coordinate(55.75, 37.61), PoliticalDivision(country='Russia', pd1='Moscow'))[0], ExtentIndex.UNKNOWN)
+
+    def test_incremental_refresh_and_save(self):
+        self.assertEqual(self.index.indexed, len(self.entries))
+        self.entries.update([entry(40.0, 40.0, 'Turkey', 'Erzurum'), entry(40.01, 40.01, 'Turkey', 'Erzurum')])
+        self.assertEqual(self.index.refresh(self.entries), 2)
+        self.assertEqual(self.index.classify(Coordinate(40.0, 40.0), PoliticalDivision(country='Turkey', pd1='Erzurum'))[0], ExtentIndex.INSIDE)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'extent-index.json')
+            self.index.save(path)
+            index = ExtentIndex.load(path, 0.1, 2)
+            self.assertEqual(index.indexed, self.index.indexed)
+            self.assertEqual(index.cells, self.index.cells)
+            self.assertEqual(ExtentIndex.load(path, 0.5, 2).indexed, 0)
+
+    def test_refresh_out_of_order(self):
+        # a location observed as it was looked up, then entries merged from other processes ahead of it
+        (key, value) = entry(40.0, 40.0, 'Turkey', 'Erzurum')
+        index = ExtentIndex(cell_degrees=0.1, min_support=2)
+        index.observe(key, Coordinate(40.0, 40.0), Location.from_json(value))
+        merged = dict([entry(40.01, 40.01, 'Turkey', 'Erzurum'), entry(40.02, 40.02, 'Turkey', 'Erzurum'), (key, value)])
+        self.assertEqual(index.refresh(merged), 2)
+        self.assertEqual(index.refresh(merged), 0)
+        self.assertEqual(sum(index.cells[index.cell(40.0, 40.0)].values()), 3)
+        self.assertEqual(index.indexed, 3)
+        # entries removed: start over
+        del merged[key]
+        self.assertEqual(index.refresh(merged), 2)
+        self.assertEqual(sum(index.cells[index.cell(40.0, 40.0)].values()), 2)
+
+    def test_report(self):
+        self.index.score(ExtentIndex.INSIDE, True)
+        self.index.score(ExtentIndex.INSIDE, False)
+        self.index.score(ExtentIndex.UNKNOWN, True)
+        self.index.score(ExtentIndex.OUTSIDE, False)
+        report = self.index.report()
+        self.assertEqual(report['inside-precision'], 0.5)
+        self.assertEqual(report['inside-recall'], 0.5)
+        self.assertEqual(report['outside-precision'], 1.0)
+        self.assertEqual(report['unknown-predicted'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
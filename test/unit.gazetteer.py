@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gazetteer import Gazetteer
+from political_division import PoliticalDivision
+import tempfile
+import unittest
+
+class GazetteerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.gazetteer = Gazetteer()
+
+    def test_aliases(self):
+        self.assertEqual(self.gazetteer.score('The Bahamas', 'Bahamas', 'country'), Gazetteer.MATCH)
+        self.assertEqual(self.gazetteer.score('Brasil', 'Brazil', 'country'), Gazetteer.MATCH)
+        self.assertEqual(self.gazetteer.score('BOL', 'Estado Plurinacional de Bolivia', 'country'), Gazetteer.MATCH)
+        self.assertEqual(self.gazetteer.score('México', 'mexico', 'country'), Gazetteer.MATCH)
+
+    def test_mismatch(self):
+        self.assertEqual(self.gazetteer.score('Niger', 'Nigeria', 'country'), Gazetteer.MISMATCH)
+        self.assertEqual(self.gazetteer.score('Dominica', 'Dominican Republic', 'country'), Gazetteer.MISMATCH)
+
+    def test_ambiguous(self):
+        self.assertEqual(self.gazetteer.score('Congo', 'Republic of the Congo', 'country'), Gazetteer.MATCH)
+        self.assertEqual(self.gazetteer.score('Congo', 'DR Congo', 'country'), Gazetteer.MATCH)
+        self.assertEqual(self.gazetteer.score('Congo-Brazzaville', 'DR Congo', 'country'), Gazetteer.MISMATCH)
+
+    def test_unknown(self):
+        self.assertIsNone(self.gazetteer.score('Atlantis', 'Bolivia', 'country'))
+        self.assertIsNone(self.gazetteer.score('', 'Bolivia', 'country'))
+        self.assertIsNone(self.gazetteer.score('CO', 'Colombia', 'pd1', 'country'))
+        self.assertEqual(self.gazetteer.statistics(), { 'gazetteer-hits': 0, 'fuzzy-comparisons': 2 })
+
+    def test_non_latin_names(self):
+        # names without Latin letters are left to the fuzzy comparison
+        self.assertIsNone(self.gazetteer.score('Москва', 'Санкт-Петербург', 'pd1'))
+        self.assertIsNone(self.gazetteer.score('東京都', '大阪府', 'pd1'))
+        self.assertIsNone(self.gazetteer.score('القاهرة', 'الإسكندرية', 'pd1'))
+        self.assertIsNone(self.gazetteer.score('Αθήνα', 'Αθήνα', 'pd1'))
+        self.assertIsNone(self.gazetteer.score('Москва', 'Moscow', 'pd1'))
+        self.assertEqual(self.gazetteer.statistics(), { 'gazetteer-hits': 0, 'fuzzy-comparisons': 5 })
+
+    def test_non_latin_fuzzy_compare(self):
+        comparison = PoliticalDivision(country='Russia', pd1='Москва').fuzzy_compare(PoliticalDivision(country='Russia', pd1='Санкт-Петербург'))
+        self.assertLess(comparison.scores['pd1'], Gazetteer.MATCH)
+        self.assertEqual(comparison.nmatches, 1)
+
+    def test_territories(self):
+        self.assertEqual(self.gazetteer.score('Puerto Rico', 'PRI', 'pd1', 'country'), Gazetteer.MATCH)
+        self.assertEqual(self.gazetteer.sovereign('PR'), 'US')
+        self.assertEqual(self.gazetteer.sovereign('BO'), 'BO')
+
+    def test_load(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as filehandle:
+            filehandle.write('# level,id,name[,name]*\npd1,BO-L,La Paz,Chuquiago Marka\nbogus,row\n')
+            filehandle.flush()
+            self.assertEqual(self.gazetteer.load(filehandle.name), 1)
+        self.assertEqual(self.gazetteer.score('La Paz', 'Chuquiago Marka', 'pd1'), Gazetteer.MATCH)
+        self.assertIsNone(self.gazetteer.score('La Paz', 'Chuquiago Marka', 'country'))
+
+    def test_political_division_fuzzy_compare(self):
+        comparison = PoliticalDivision(country='Brasil', pd1='Pará').fuzzy_compare(PoliticalDivision(country='Brazil', pd1='Para'))
+        self.assertEqual(comparison.scores['country'], Gazetteer.MATCH)
+        self.assertEqual(comparison.nmatches, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
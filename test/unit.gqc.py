@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from coordinate import Coordinate
+from extent_index import ExtentIndex
+from gqc import GQC
+from location import Location
+from political_division import PoliticalDivision
+from row_context import RowContext
+from row_result import RowResult
+import concurrent.futures
+import threading
+import unittest
+
+class Checker:
+    ''' The part of GQC the sign permutation corrections use '''
+    cache_key = staticmethod(GQC.cache_key)
+    correct_sign_swap_typos = GQC.correct_sign_swap_typos
+    _lookup_permutations = GQC._lookup_permutations
+
+    def __init__(self, locations, cached=(), extent_index=None):
+        self.locations = locations
+        self.cache = { GQC.cache_key(c): True for c in cached }
+        self.extent_index = extent_index
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        self.lookups = []
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _corrections(self):
+        return self.executor
+
+    def reverse_geolocate(self, coordinate, fuzzy=True, wait=False):
+        with self._lock:
+            self.lookups.append(coordinate)
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            division = self.locations.get(coordinate)
+            return Location(coordinate, division) if division else None
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def copy_location_to_response(self, coordinate, location, response):
+        response.location_latitude = location.coordinate.latitude
+        response.location_longitude = location.coordinate.longitude
+
+
+class Extents:
+    def __init__(self, inside):
+        self.inside = inside
+
+    def classify(self, coordinate, political_division):
+        return (ExtentIndex.INSIDE if coordinate in self.inside else ExtentIndex.OUTSIDE, None)
+
+
+class SignPermutationsTestCase(unittest.TestCase):
+    BOLIVIA = PoliticalDivision(country='Bolivia', pd1='La Paz')
+    PERU = PoliticalDivision(country='Peru', pd1='Puno')
+
+    def context(self, latitude, longitude):
+        row = { 'accession-number': '1', 'country': 'Bolivia', 'pd1': 'La Paz', 'latitude': str(latitude), 'longitude': str(longitude) }
+        return RowContext(row, Coordinate(latitude, longitude), ['country', 'pd1'])
+
+    def test_rank_order(self):
+        (a, b, c, d) = Coordinate(15.5, 67.5).permutations_by_sign()
+        checker = Checker({}, cached=[d], extent_index=Extents([c]))
+        context = self.context(15.5, 67.5)
+        context.record(b, None)
+        self.assertEqual([k for (k, _) in checker._lookup_permutations([a, b, c, d, a], context)], [b, d, c, a])
+        self.assertEqual(checker.lookups, [d, c, a])
+
+    def test_lookahead(self):
+        coordinates = Coordinate(15.5, 67.5).permutations_by_sign()
+        checker = Checker({})
+        lookups = checker._lookup_permutations(coordinates, self.context(15.5, 67.5))
+        next(lookups)
+        self.assertLessEqual(len(checker.lookups), GQC.PERMUTATION_LOOKAHEAD + 1)
+        lookups.close()
+        checker.executor.shutdown(wait=True)
+        self.assertLess(len(checker.lookups), len(coordinates))
+        self.assertLessEqual(checker.most_in_flight, GQC.PERMUTATION_LOOKAHEAD)
+
+    def test_cache_only(self):
+        coordinates = Coordinate(15.5, 67.5).permutations_by_sign()
+        checker = Checker({}, cached=[coordinates[1]])
+        context = self.context(15.5, 67.5)
+        context.corrections_cache_only = True
+        self.assertEqual(len(list(checker._lookup_permutations(coordinates, context))), 4)
+        self.assertEqual(checker.lookups, [coordinates[1]])
+        self.assertEqual(context.statistics['correction-lookups-skipped'], 3)
+
+    def test_stops_at_full_match(self):
+        (a, b, c, d) = Coordinate(15.5, 67.5).permutations_by_sign()
+        checker = Checker({ d: self.BOLIVIA, c: self.BOLIVIA }, extent_index=Extents([d]))
+        context = self.context(15.5, 67.5)
+        response = checker.correct_sign_swap_typos(context, RowResult())
+        self.assertEqual((response.action, response.reason), ('error', 'coordinate-sign-error'))
+        self.assertEqual((response.location_latitude, response.location_longitude), (-15.5, -67.5))
+        checker.executor.shutdown(wait=True)
+        self.assertEqual(checker.lookups[0], d)
+        self.assertNotIn(a, checker.lookups[GQC.PERMUTATION_LOOKAHEAD:])
+        self.assertEqual(context.statistics['permutations-stopped-early'], 1)
+
+    def test_first_of_the_best(self):
+        (a, b, c, d) = Coordinate(15.5, 67.5).permutations_by_sign()
+        partial = PoliticalDivision(country='Bolivia', pd1='Oruro')
+        checker = Checker({ a: self.PERU, b: partial, c: partial, d: partial })
+        context = self.context(15.5, 67.5)
+        response = checker.correct_sign_swap_typos(context, RowResult())
+        self.assertEqual((response.location_latitude, response.location_longitude), (15.5, -67.5))
+        self.assertEqual(context.statistics['permutations-stopped-early'], 0)
+
+    def test_matching_location(self):
+        coordinates = Coordinate(15.5, 67.5).permutations_by_sign()
+        checker = Checker({ c: self.BOLIVIA for c in coordinates })
+        response = checker.correct_sign_swap_typos(self.context(15.5, 67.5), RowResult())
+        self.assertEqual((response.action, response.reason), ('pass', 'matching-location'))
+
+    def test_no_match(self):
+        checker = Checker({})
+        response = checker.correct_sign_swap_typos(self.context(15.5, 67.5), RowResult())
+        self.assertEqual((response.action, response.reason), ('', ''))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from hedge import Cancellation, Hedger, LatencyTracker
+import concurrent.futures
+import itertools
+import socket
+import threading
+import time
+import unittest
+
+class LatencyTrackerTestCase(unittest.TestCase):
+    def test_quantile_empty(self):
+        self.assertIsNone(LatencyTracker().quantile(0.95))
+
+    def test_quantile(self):
+        tracker = LatencyTracker()
+        for i in range(1, 101):
+            tracker.observe(i / 100)
+        self.assertEqual(len(tracker), 100)
+        self.assertEqual(tracker.quantile(0.95), 0.95)
+        self.assertEqual(tracker.quantile(0.5), 0.5)
+        self.assertEqual(tracker.quantile(1.0), 1.0)
+
+    def test_window(self):
+        tracker = LatencyTracker(size=10)
+        for i in range(100):
+            tracker.observe(i)
+        self.assertEqual(len(tracker), 10)
+        self.assertEqual(tracker.quantile(0.0), 90)
+
+
+class CancellationTestCase(unittest.TestCase):
+    def test_cancel(self):
+        cancellation = Cancellation()
+        calls = []
+        cancellation.add(lambda: calls.append('first'))
+        self.assertEqual([], calls)
+        cancellation.cancel()
+        self.assertTrue(cancellation.cancelled)
+        self.assertEqual(['first'], calls)
+        # registered after the cancellation: run at once
+        cancellation.add(lambda: calls.append('second'))
+        self.assertEqual(['first', 'second'], calls)
+
+    def test_callback_error(self):
+        cancellation = Cancellation()
+        cancellation.add(lambda: socket.socket().shutdown(socket.SHUT_RDWR))
+        cancellation.cancel()
+        self.assertTrue(cancellation.cancelled)
+
+
+class HedgerTestCase(unittest.TestCase):
+    def test_no_hedge_before_min_samples(self):
+        hedger = Hedger(min_samples=5, max_rate=1.0)
+        for _ in range(4):
+            self.assertEqual(hedger.call(lambda _: 'ok'), 'ok')
+        self.assertEqual(hedger.hedges, 0)
+
+    def test_hedge_wins(self):
+        hedger = Hedger(quantile=0.9, min_samples=5, max_rate=1.0)
+        for _ in range(10):
+            hedger.call(lambda _: 'fast')
+        calls = itertools.count()
+        def slow_then_fast(_):
+            if next(calls) == 0:
+                time.sleep(1.0)
+                return 'slow'
+            return 'fast'
+        start = time.monotonic()
+        self.assertEqual(hedger.call(slow_then_fast), 'fast')
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(hedger.hedges, 1)
+        self.assertEqual(hedger.hedge_wins, 1)
+
+    def test_hedge_rate_cap(self):
+        hedger = Hedger(quantile=0.5, min_samples=1, max_rate=0.0)
+        hedger.call(lambda _: 'fast')
+        self.assertEqual(hedger.call(lambda _: time.sleep(0.05) or 'slow'), 'slow')
+        self.assertEqual(hedger.hedges, 0)
+
+    def test_error_falls_back_to_other_request(self):
+        hedger = Hedger(quantile=0.5, min_samples=1, max_rate=1.0)
+        hedger.call(lambda _: 'fast')
+        calls = itertools.count()
+        def slow_error_then_ok(_):
+            if next(calls) == 0:
+                time.sleep(0.2)
+                raise TimeoutError('slow')
+            time.sleep(0.4)
+            return 'ok'
+        self.assertEqual(hedger.call(slow_error_then_ok), 'ok')
+
+    def test_hedges_in_flight(self):
+        hedger = Hedger(quantile=0.5, min_samples=1, max_rate=1.0, max_workers=2, max_in_flight=1)
+        hedger.call(lambda _: 'fast')
+        slow = lambda _: time.sleep(0.3) or 'slow'
+        # the second call finds the one hedge slot taken by the first call's hedge
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            futures = [executor.submit(hedger.call, slow) for _ in range(2)]
+            self.assertEqual(['slow', 'slow'], [f.result() for f in futures])
+        self.assertEqual(hedger.hedges, 1)
+        # and the slot is free again (for a call slower than the 0.3 seconds now observed)
+        self.assertEqual(hedger.call(lambda _: time.sleep(0.6) or 'slower'), 'slower')
+        self.assertEqual(hedger.hedges, 2)
+
+    def test_loser_cancelled(self):
+        hedger = Hedger(quantile=0.5, min_samples=1, max_rate=1.0)
+        hedger.call(lambda _: 'fast')
+        calls = itertools.count()
+        released = threading.Event()
+        cancellations = []
+        def slow_then_fast(cancellation):
+            cancellations.append(cancellation)
+            if next(calls) == 0:
+                cancellation.add(released.set)
+                released.wait(5.0)
+                return 'slow'
+            time.sleep(0.05)
+            return 'fast'
+        self.assertEqual(hedger.call(slow_then_fast), 'fast')
+        self.assertTrue(released.is_set())
+        self.assertEqual([True, False], [c.cancelled for c in cancellations])
+
+    def test_loser_counts_in_flight(self):
+        hedger = Hedger(quantile=0.5, min_samples=1, max_rate=1.0, max_in_flight=1)
+        hedger.call(lambda _: 'fast')
+        released = threading.Event()
+        calls = itertools.count()
+        def stuck_then_fast(_):
+            # the first request ignores its cancellation
+            if next(calls) == 0:
+                released.wait(5.0)
+                return 'stuck'
+            return 'fast'
+        self.assertEqual(hedger.call(stuck_then_fast), 'fast')
+        self.assertEqual(hedger.hedges, 1)
+        # the loser still runs: it keeps the one hedge slot
+        self.assertEqual(hedger.call(lambda _: time.sleep(0.2) or 'slow'), 'slow')
+        self.assertEqual(hedger.hedges, 1)
+        released.set()
+        time.sleep(0.1)
+        # it has ended: the slot is free again (for a call slower than the 0.2 seconds now observed)
+        self.assertEqual(hedger.call(lambda _: time.sleep(0.5) or 'slower'), 'slower')
+        self.assertEqual(hedger.hedges, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
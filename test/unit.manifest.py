@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from manifest import Manifest
+from collections import deque
+import tempfile
+import unittest
+
+class ManifestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'manifest.csv')
+        for name in ('a.csv', 'b.csv'):
+            with open(os.path.join(self.directory.name, name), 'w') as filehandle:
+                filehandle.write('\n')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, text):
+        with open(self.path, 'w') as filehandle:
+            filehandle.write(text)
+
+    def test_load(self):
+        self.write('# input,output[,fields]\na.csv, a.results.csv\n\nb.csv,b.results.csv,"1-3,7"\n')
+        manifest = Manifest.load(self.path)
+        self.assertEqual(manifest.entries, [(os.path.join(self.directory.name, 'a.csv'), os.path.join(self.directory.name, 'a.results.csv'), ''),
+                                            (os.path.join(self.directory.name, 'b.csv'), os.path.join(self.directory.name, 'b.results.csv'), '1-3,7')])
+
+    def test_bad_line(self):
+        self.write('a.csv\n')
+        self.assertRaises(ValueError, Manifest.load, self.path)
+        self.write('a.csv,a.results.csv,x\n')
+        self.assertRaises(ValueError, Manifest.load, self.path)
+        self.write('missing.csv,missing.results.csv\n')
+        self.assertRaises(ValueError, Manifest.load, self.path)
+
+    def test_schedule(self):
+        owners = deque()
+        readers = [enumerate('abcde'), enumerate('xy'), enumerate('pqr')]
+        items = list(Manifest._schedule(readers, 2, owners))
+        self.assertEqual([v for (_, v) in items], list('abxypqcdre'))
+        self.assertEqual(list(owners), [0, 0, 1, 1, 2, 2, 0, 0, 2, 0])
+        self.assertEqual([n for (n, _) in items], [0, 1, 0, 1, 0, 1, 2, 3, 2, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import Pipeline
+import itertools
+import random
+import threading
+import time
+import unittest
+
+class PipelineTestCase(unittest.TestCase):
+    def test_ordered(self):
+        random.seed(7)
+        def prepare(n): return (n, n % 3 != 0)
+        def process(n):
+            time.sleep(random.random() / 200)
+            return -n
+        pipeline = Pipeline(prepare, process, workers=4, queue_size=8)
+        self.assertEqual(list(pipeline.run(range(200))), [(n if n % 3 == 0 else -n) for n in range(200)])
+
+    def test_empty(self):
+        self.assertEqual(list(Pipeline(lambda n: (n, True), lambda n: n).run([])), [])
+
+    def test_bounded(self):
+        in_flight = [0, 0]
+        lock = threading.Lock()
+        def prepare(n):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight[1], in_flight[0])
+            return (n, True)
+        def process(n):
+            # the first item is slow: the others pile up behind it
+            time.sleep(0.05 if n == 0 else 0)
+            return n
+        pipeline = Pipeline(prepare, process, workers=2, queue_size=5)
+        for n in pipeline.run(range(50)):
+            with lock:
+                in_flight[0] -= 1
+        self.assertLessEqual(in_flight[1], 5)
+
+    def test_failure(self):
+        def process(n):
+            if n == 5:
+                raise ValueError('five')
+            return n
+        results = []
+        with self.assertRaises(ValueError):
+            for n in Pipeline(lambda n: (n, True), process, workers=2, queue_size=4).run(range(10)):
+                results.append(n)
+        self.assertEqual(results, [0, 1, 2, 3, 4])
+
+
+    def threads(self):
+        return [t for t in threading.enumerate() if t.name.startswith('gqc-')]
+
+    def wait_for_threads(self):
+        deadline = time.monotonic() + 5
+        while self.threads() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.threads()
+
+    def test_closed(self):
+        processed = []
+        def process(n):
+            time.sleep(0.001)
+            processed.append(n)
+            return n
+        results = Pipeline(lambda n: (n, True), process, workers=3, queue_size=4).run(range(1000))
+        self.assertEqual(next(results), 0)
+        results.close()
+        self.assertEqual(self.wait_for_threads(), [])
+        self.assertLess(len(processed), 1000)
+
+    def test_failure_ends_threads(self):
+        def prepare(n):
+            if n == 2:
+                raise ValueError('two')
+            return (n, True)
+        with self.assertRaises(ValueError):
+            list(Pipeline(prepare, lambda n: n, workers=2, queue_size=4).run(itertools.count()))
+        self.assertEqual(self.wait_for_threads(), [])
+
+if __name__ == '__main__':
+    unittest.main()
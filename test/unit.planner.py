@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from coordinate import Coordinate
+from planner import Planner
+import standins
+import tempfile
+import unittest
+
+class Geocoder:
+    def estimated_seconds_per_request(self):
+        return 0.5
+
+class Checker(standins.Checker):
+    ''' A stand in `GQC`: rows are blank, comments, have a bad accession number or are valid '''
+    def __init__(self, cached, **gqc):
+        super().__init__(**gqc)
+        self.geocoder = Geocoder()
+        self.cache.update((self.cache_key(c), '{}') for c in cached)
+
+    @staticmethod
+    def row_from_raw(rawrow, columns):
+        return { k: rawrow[c] if c < len(rawrow) else '' for (k, c) in columns.items() }
+
+    @staticmethod
+    def cache_key(coordinate):
+        return f'latitude:{coordinate.latitude},longitude:{coordinate.longitude}'
+
+    def validate_row(self, row, response):
+        text = ''.join(row.values())
+        if (text == '') or text.startswith('#'):
+            response.action = 'ignore'
+            return None
+        if not row['accession-number'].isdecimal():
+            response.action = 'error'
+            return None
+        return Coordinate(float(row['latitude']), float(row['longitude']))
+
+class PlannerTestCase(unittest.TestCase):
+    ROWS = ['country,pd1,accession-number,latitude,longitude',
+            'Peru,Cusco,1,10.0,20.0',
+            'Peru,Cusco,2,10.0,20.0',
+            'Peru,Lima,3,11.0,21.0',
+            '',
+            '# a comment',
+            'Peru,Lima,x,11.0,21.0']
+    # (10, 20) and one of its sign permutations are cached
+    CACHED = (Coordinate(10.0, 20.0), Coordinate(-10.0, 20.0))
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.directory.name, 'input.csv')
+        with open(self.input, 'w') as f:
+            f.write('\n'.join(PlannerTestCase.ROWS) + '\n')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def plan(self, **gqc):
+        return Planner(Checker(PlannerTestCase.CACHED, **dict({ 'input-file': self.input }, **gqc))).plan()
+
+    def test_plan(self):
+        plan = self.plan()
+        self.assertEqual(6, plan['rows'])
+        self.assertEqual(2, plan['ignored-rows'])
+        self.assertEqual(1, plan['invalid-rows'])
+        self.assertEqual(3, plan['valid-rows'])
+        self.assertEqual(2, plan['unique-coordinates'])
+        self.assertEqual(2, plan['cache-hits'])
+        self.assertEqual(1, plan['unique-cache-hits'])
+        self.assertEqual(1, plan['api-calls'])
+        # the 6 sign permutations less the cached one
+        self.assertEqual(1 + 5, plan['api-calls-worst-case'])
+        self.assertEqual(0.5, plan['wall-time-seconds'])
+        self.assertEqual(3.0, plan['wall-time-seconds-worst-case'])
+
+    def test_cache_disabled(self):
+        plan = self.plan(**{ 'cache-enabled': '' })
+        self.assertEqual(0, plan['cache-hits'])
+        self.assertEqual(3, plan['api-calls'])
+        self.assertEqual(3 + 5, plan['api-calls-worst-case'])
+
+    def test_cache_only(self):
+        plan = self.plan(**{ 'cache-only': 'true' })
+        self.assertEqual(0, plan['api-calls'])
+        self.assertEqual(0, plan['api-calls-worst-case'])
+
+    def test_execute(self):
+        output = os.path.join(self.directory.name, 'plan.txt')
+        Planner(Checker(PlannerTestCase.CACHED, **{ 'input-file': self.input, 'output-file': output })).execute()
+        with open(output) as f:
+            report = f.read()
+        self.assertIn('api-calls: 1\n', report)
+        self.assertIn('wall-time-worst-case: 00:00:03\n', report)
+
+    def test_duration(self):
+        self.assertEqual('00:00:00', Planner.duration(0.4))
+        self.assertEqual('01:01:01', Planner.duration(3661))
+        self.assertEqual('2d 00:00:05', Planner.duration(2 * 86400 + 5))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from coordinate import Coordinate
+from prefetch import CoordinateSet, Prefetcher
+import standins
+import tempfile
+import unittest
+
+class CoordinateSetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'coordinates.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def coordinates(self):
+        return [Coordinate(n / 10.0, -n / 10.0) for n in range(20)]
+
+    def test_in_memory(self):
+        coordinates = CoordinateSet(self.path, spill_size=100)
+        for c in self.coordinates() + self.coordinates():
+            coordinates.add(c)
+        self.assertEqual(len(coordinates), 20)
+        self.assertEqual(list(coordinates), self.coordinates())
+        self.assertFalse(os.path.exists(self.path))
+        coordinates.close()
+
+    def test_spill(self):
+        coordinates = CoordinateSet(self.path, spill_size=5)
+        self.assertTrue(all(coordinates.add(c) for c in self.coordinates()))
+        self.assertFalse(any(coordinates.add(c) for c in self.coordinates()))
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(len(coordinates), 20)
+        self.assertIn(Coordinate(1.5, -1.5), coordinates)
+        self.assertNotIn(Coordinate(1.5, 1.5), coordinates)
+        self.assertEqual(list(coordinates), self.coordinates())
+        coordinates.close()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_key(self):
+        key = lambda c: -c.latitude
+        for spill_size in (100, 5):
+            coordinates = CoordinateSet(self.path, spill_size=spill_size, key=key)
+            for c in self.coordinates():
+                coordinates.add(c)
+            self.assertEqual(list(coordinates), list(reversed(self.coordinates())))
+            coordinates.close()
+
+
+class Checker(standins.Checker):
+    ''' A stand in `GQC` that records the lookups '''
+    def __init__(self, tmpdir):
+        super().__init__(standins.Settings(system={ 'tmpdir': tmpdir }, **{ 'lookup-threads': 4 }))
+        self.lookups = []
+
+    def reverse_geolocate(self, coordinate, usecache=None, wait=True):
+        self.lookups.append((coordinate, usecache, wait))
+        return coordinate
+
+class PrefetcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.gqc = Checker(self.directory.name)
+        self.coordinates = CoordinateSet(os.path.join(self.directory.name, 'coordinates.sqlite'), spill_size=100)
+        for n in range(10):
+            self.coordinates.add(Coordinate(n, n))
+
+    def tearDown(self):
+        self.coordinates.close()
+        self.directory.cleanup()
+
+    def test_resolve_paced(self):
+        self.assertEqual(10, Prefetcher(self.gqc).resolve(self.coordinates))
+        # the row coordinates are paced as the rows' lookups are
+        self.assertEqual({ (True, True) }, { (usecache, wait) for (_, usecache, wait) in self.gqc.lookups })
+
+    def test_resolve_permutations_unpaced(self):
+        self.assertEqual(10, Prefetcher(self.gqc).resolve(self.coordinates, wait=False))
+        self.assertEqual({ (True, False) }, { (usecache, wait) for (_, usecache, wait) in self.gqc.lookups })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from previous import PreviousResults
+import csv
+import tempfile
+import unittest
+
+class PreviousResultsTestCase(unittest.TestCase):
+    COLUMNS = { 'country': 0, 'pd1': 1, 'accession-number': 2, 'latitude': 3, 'longitude': 4 }
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'results.csv')
+        with open(self.path, 'w', newline='') as filehandle:
+            csv.writer(filehandle).writerows([
+                ['country', 'pd1', 'acc', 'lat', 'lon', 'action', 'reason'],
+                ['Bolivia', 'La Paz', '1', '-15.7', '-67.4', 'pass', 'matching-location'],
+                ['Bolivia', 'La Paz', '2', '15.7', '-67.4', 'error', 'country-mismatch'],
+                ['Bolivia', 'La Paz', '3', '-15.7', '-67.4', 'internal-error', 'reverse-geolocate-error'],
+            ])
+        self.previous = PreviousResults.load(self.path, PreviousResultsTestCase.COLUMNS, 2, True)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_unchanged(self):
+        self.assertEqual(self.previous.verdict(['Bolivia', 'La Paz', '1', '-15.7', '-67.4']), ['pass', 'matching-location'])
+        self.assertEqual(self.previous.verdict([' Bolivia', 'La Paz ', '2', '15.7', '-67.4', 'unassigned']), ['error', 'country-mismatch'])
+
+    def test_changed(self):
+        self.assertIsNone(self.previous.verdict(['Bolivia', 'La Paz', '2', '-15.7', '-67.4']))
+        self.assertIsNone(self.previous.verdict(['Bolivia', 'La Paz', '4', '-15.7', '-67.4']))
+        self.assertIsNone(self.previous.verdict(['Bolivia', 'La Paz', '3', '-15.7', '-67.4']))
+        self.assertEqual(self.previous.statistics, { 'copied': 0, 'checked': 3 })
+
+
+if __name__ == '__main__':
+    unittest.main()
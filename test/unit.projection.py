@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from projection import Projection, VerdictFilter
+import unittest
+
+class ProjectionTestCase(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(Projection.parse('3').fields, [3])
+        self.assertEqual(Projection.parse('5,1-3,2').fields, [1, 2, 3, 5])
+        self.assertRaises(ValueError, Projection.parse, '1,a')
+        self.assertRaises(ValueError, Projection.parse, '3-1')
+
+    def test_project(self):
+        row = ['a', 'b', 'c', 'd', 'e']
+        self.assertEqual(Projection.parse('2').__call__(row), ['b'])
+        self.assertEqual(Projection.parse('1-2,5').__call__(row), ['a', 'b', 'e'])
+        self.assertEqual(Projection.parse('4-7').__call__(row), ['d', 'e', '', ''])
+        self.assertEqual(Projection.parse('0-1').__call__(row), ['', 'a'])
+
+class VerdictFilterTestCase(unittest.TestCase):
+    def test_result_columns(self):
+        exclusions = VerdictFilter('pass:matching-location, ignore', 3)
+        self.assertTrue(exclusions.excludes(['1', 'pass', 'matching-location', '']))
+        self.assertTrue(exclusions.excludes(['1', 'ignore', 'comment-line', '']))
+        self.assertFalse(exclusions.excludes(['1', 'pass', 'matching-extent', '']))
+        self.assertFalse(exclusions.excludes(['pass', 'matching-location', '']))
+
+    def test_header(self):
+        exclusions = VerdictFilter('pass:matching-location', 14)
+        exclusions.use_header(['acc', 'Action', 'reason', 'note'])
+        self.assertTrue(exclusions.excludes(['1', 'pass', 'matching-location', '']))
+        self.assertFalse(exclusions.excludes(['1', 'error', 'matching-location', '']))
+
+
+if __name__ == '__main__':
+    unittest.main()
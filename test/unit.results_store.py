@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from results_store import ResultsStore
+import json
+import sqlite3
+import standins
+import tempfile
+import unittest
+
+def config(**gqc):
+    ''' The settings of a run of request-1 '''
+    return standins.Settings(system={ 'request_id': 'request-1' }, **gqc)
+
+class ResultsStoreTestCase(unittest.TestCase):
+    KEYS = ('action', 'reason', 'location-country', 'location-latitude', 'location-bounding-box', 'note')
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'results.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def query(self, sql):
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(sql).fetchall()
+        finally:
+            connection.close()
+
+    def test_run(self):
+        store = ResultsStore(self.path, ResultsStoreTestCase.KEYS)
+        run_id = store.start(config())
+        file_id = store.file('in.csv', 'out.csv')
+        row = { 'accession-number': '1000', 'country': 'Bolivia', 'pd1': 'La Paz', 'latitude': '-15.762', 'longitude': '-67.456' }
+        box = { 'latitude-south': -15.862, 'latitude-north': -15.662 }
+        store.add(file_id, 1, row, ['pass', 'matching-location', 'Bolivia', -15.762, box, ''])
+        # a verdict copied from a previous results file is text
+        store.add(file_id, 2, dict(row, **{'accession-number': '1001'}), ['error', 'country-mismatch', 'Peru', '', str(box), 'note'])
+        store.finish()
+        self.assertEqual(self.query('SELECT run_id, request_id, rows FROM runs WHERE finished IS NOT NULL'), [(run_id, 'request-1', 2)])
+        self.assertEqual(self.query('SELECT input_file, output_file FROM files'), [('in.csv', 'out.csv')])
+        results = self.query('SELECT accession_number, reason, location_latitude, location_bounding_box FROM results ORDER BY row_number')
+        self.assertEqual([r[:3] for r in results], [('1000', 'matching-location', -15.762), ('1001', 'country-mismatch', None)])
+        self.assertEqual([json.loads(r[3]) for r in results], [box, box])
+
+    def test_config_hash(self):
+        settings = ResultsStore.settings(config())
+        self.assertNotIn('api-token', settings['location-iq'])
+        self.assertNotIn('log-file', settings['gqc'])
+        self.assertEqual(ResultsStore.config_hash(settings), ResultsStore.config_hash(ResultsStore.settings(config(**{'log-file': 'b.log'}))))
+        self.assertNotEqual(ResultsStore.config_hash(settings), ResultsStore.config_hash(ResultsStore.settings(config(**{'minimum-fuzzy-score': 80}))))
+
+    def test_operational_settings_not_hashed(self):
+        settings = ResultsStore.config_hash(ResultsStore.settings(config()))
+        for (k, v) in (('lookup-threads', '16'), ('queue-size', '64'), ('workers', '4'), ('shard-size', '20'), ('compression', 'gzip'),
+                       ('cache-file', '/tmp/a.cache'), ('prefetch', 'true'), ('checkpoint-rows', '10'), ('distributed-lease-seconds', '5'),
+                       ('serve', '/tmp/gqc.sock'), ('coordinator', '/tmp/queue.db'), ('worker', '/tmp/queue.db')):
+            self.assertEqual(ResultsStore.config_hash(ResultsStore.settings(config(**{k: v}))), settings, k)
+
+    def test_runs(self):
+        for _ in range(2):
+            store = ResultsStore(self.path, ResultsStoreTestCase.KEYS)
+            store.start(config())
+            store.add(store.file('in.csv', 'out.csv'), 1, {}, ['pass', 'matching-location', '', '', '', ''])
+            store.finish()
+        self.assertEqual(self.query('SELECT run_id, count(*) FROM results GROUP BY run_id'), [(1, 1), (2, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
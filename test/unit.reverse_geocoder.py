@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+from coordinate import Coordinate
+from hedge import Cancellation
+from locationiq import LocationIQ
+from nominatim import Nominatim
+from political_division import PoliticalDivision
+from reverse_geocoder import ReverseGeocoder
+import concurrent.futures
+import http.server
+import importlib
+import io
+import json
+import multiprocessing
+import threading
+import time
+import unittest
+
+DEFAULTS = Config.default_configuration()
+os.rmdir(DEFAULTS[Config.SECTION_SYSTEM]['tmpdir'])
+
+def configuration(**sections):
+    ''' A `Config` of the defaults and the `sections` settings, without reading gqc.cfg or options '''
+    config = Config.__new__(Config)
+    config.config = json.loads(json.dumps(DEFAULTS))
+    for (section, values) in sections.items():
+        config.config[section.replace('_', '-')].update(values)
+    return config
+
+class ReverseGeocoderTestCase(unittest.TestCase):
+    def test_create(self):
+        self.assertIsInstance(ReverseGeocoder.create(configuration()), LocationIQ)
+        self.assertIsInstance(ReverseGeocoder.create(configuration(gqc={ 'provider': 'nominatim' })), Nominatim)
+        self.assertIsInstance(ReverseGeocoder.create(configuration(), 'nominatim'), Nominatim)
+        with self.assertRaises(ValueError):
+            ReverseGeocoder.create(configuration(), 'nowhere')
+
+    def test_registered_providers(self):
+        for (module, cls) in ReverseGeocoder.PROVIDERS.values():
+            self.assertTrue(issubclass(getattr(importlib.import_module(module), cls), ReverseGeocoder))
+
+    def test_settings(self):
+        geocoder = ReverseGeocoder.create(configuration(location_iq={ 'max-concurrency': '4', 'requests-per-second': '2' }))
+        self.assertEqual(4, geocoder.max_concurrency)
+        self.assertEqual(2.0, geocoder.requests_per_second)
+        # paced by backoff (1 second) as well
+        self.assertEqual(1.5, geocoder.estimated_seconds_per_request())
+
+class LocationIQTestCase(unittest.TestCase):
+    RESPONSE = {
+        'lat': '-13.5226', 'lon': '-71.9673', 'distance': 12.5,
+        'boundingbox': ['-13.53', '-13.51', '-71.98', '-71.96'],
+        'address': { 'country': 'Peru', 'state': 'Cusco', 'county': 'Cusco Province', 'city': 'Cusco', 'suburb': 'San Blas' },
+    }
+
+    def setUp(self):
+        self.geocoder = ReverseGeocoder.create(configuration(location_iq={ 'api-token': 'secret' }))
+
+    def test_url(self):
+        url = self.geocoder.reverse_geolocate_url(Coordinate(-13.523, -71.967))
+        self.assertTrue(url.startswith('https://us1.locationiq.com/v1/reverse.php?key=secret&lat=-13.523&lon=-71.967&'))
+
+    def test_no_token(self):
+        with self.assertRaises(ValueError):
+            ReverseGeocoder.create(configuration(location_iq={ 'api-token': '' }))
+
+    def test_location(self):
+        location = self.geocoder.location_from_response(Coordinate(-13.523, -71.967), 'url', LocationIQTestCase.RESPONSE)
+        self.assertEqual(Coordinate(-13.5226, -71.9673), location.coordinate)
+        self.assertEqual(PoliticalDivision(country='Peru', pd1='Cusco', pd2='Cusco Province', pd3='Cusco', pd4='San Blas', pd5=''), location.political_division)
+        self.assertEqual(12.5, location.metadata['distance'])
+        self.assertEqual(['-13.53', '-13.51', '-71.98', '-71.96'], location.metadata['boundingbox'])
+
+    def test_no_location(self):
+        self.assertIsNone(self.geocoder.location_from_response(Coordinate(0, 0), 'url', { 'error': 'Unable to geocode' }))
+
+    def test_reverse_geolocate(self):
+        self.geocoder.reverse_geolocate_fetch = lambda url, rate_limit: json.dumps(LocationIQTestCase.RESPONSE)
+        self.assertEqual('Cusco', self.geocoder.reverse_geolocate(Coordinate(-13.523, -71.967)).political_division.pd1)
+        # a 404 is no response
+        self.geocoder.reverse_geolocate_fetch = lambda url, rate_limit: None
+        self.assertIsNone(self.geocoder.reverse_geolocate(Coordinate(0, 0)))
+
+class Opener:
+    ''' Answers every request after `delays.pop(0)` seconds (or at once) '''
+    class Response(io.BytesIO):
+        def read1(self, n):
+            return self.read(n)
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.requests = 0
+
+    def open(self, url, timeout=None):
+        self.requests += 1
+        delay = self.delays.pop(0) if self.delays else 0
+        time.sleep(delay)
+        return Opener.Response(json.dumps({ 'delay': delay }).encode('utf-8'))
+
+shared = None
+
+def share(limits, barrier):
+    ''' A LocationIQ (10 requests per second) paced by the shared limits, in a pool process '''
+    global shared
+    shared = (ReverseGeocoder.create(configuration(location_iq={ 'api-token': 'secret', 'requests-per-second': '10' })), barrier)
+    shared[0].use_limits(limits)
+
+def throttled(n):
+    # both processes throttle at once
+    (geocoder, barrier) = shared
+    barrier.wait()
+    start = time.monotonic()
+    for _ in range(n):
+        geocoder.throttle()
+    return time.monotonic() - start
+
+class PacingTestCase(unittest.TestCase):
+    def test_rate_limit_without_backoff_pacing(self):
+        # rate_limit only decides the pace-by-backoff pauses: requests-per-second applies to every request
+        geocoder = ReverseGeocoder.create(configuration(location_iq={ 'api-token': 'secret', 'requests-per-second': '10' }))
+        geocoder._opener = Opener([0] * 5)
+        start = time.monotonic()
+        for _ in range(5):
+            geocoder.reverse_geolocate_fetch('url', rate_limit=False)
+        self.assertGreaterEqual(time.monotonic() - start, 0.35)
+
+class SharedLimitsTestCase(unittest.TestCase):
+    def test_processes_share_the_rate(self):
+        context = multiprocessing.get_context('spawn')
+        geocoder = ReverseGeocoder.create(configuration(location_iq={ 'api-token': 'secret', 'requests-per-second': '10' }))
+        limits = geocoder.shared_limits(context)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2, mp_context=context, initializer=share, initargs=(limits, context.Barrier(2))) as executor:
+            seconds = list(executor.map(throttled, [5, 5]))
+        # 10 requests at 10 per second between them, not 5 each at 10 per second each
+        self.assertGreaterEqual(max(seconds), 0.85)
+
+class HedgeTestCase(unittest.TestCase):
+    def test_hedge_with_one_slot(self):
+        geocoder = ReverseGeocoder.create(configuration(location_iq={ 'api-token': 'secret', 'max-concurrency': '1',
+                                                                      'hedge-requests': 'true', 'hedge-min-samples': '5', 'hedge-max-rate': '1' }))
+        self.assertEqual(1, geocoder.max_concurrency)
+        geocoder._opener = Opener([0.01] * 10)
+        for _ in range(10):
+            geocoder.reverse_geolocate_fetch('url', rate_limit=False)
+        # the request is slow, its hedge is not: the hedge overtakes it, though max-concurrency is 1
+        geocoder._opener.delays = [2.0]
+        start = time.monotonic()
+        self.assertEqual(json.dumps({ 'delay': 0 }).encode('utf-8'), geocoder.reverse_geolocate_fetch('url', rate_limit=False))
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(1, geocoder.hedger.hedge_wins)
+        self.assertEqual(12, geocoder._opener.requests)
+
+    def test_cancelled_request_closes_its_connection(self):
+        answer = threading.Event()
+        class Stalled(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                answer.wait(10.0)
+                self.send_response(200)
+                self.end_headers()
+            def log_message(self, *args):
+                pass
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Stalled)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            geocoder = ReverseGeocoder.create(configuration(location_iq={ 'api-token': 'secret' }))
+            cancellation = Cancellation()
+            with concurrent.futures.ThreadPoolExecutor(1) as executor:
+                request = executor.submit(geocoder._request, f'http://127.0.0.1:{server.server_address[1]}/', cancellation)
+                time.sleep(0.2)
+                start = time.monotonic()
+                cancellation.cancel()
+                # the read waiting for the stalled server ends now, not after read-timeout-seconds
+                with self.assertRaises(OSError):
+                    request.result(timeout=5.0)
+                self.assertLess(time.monotonic() - start, 1.0)
+        finally:
+            answer.set()
+            server.shutdown()
+            server.server_close()
+
+class NominatimTestCase(unittest.TestCase):
+    def setUp(self):
+        self.geocoder = ReverseGeocoder.create(configuration(), 'nominatim')
+
+    def test_url(self):
+        self.assertEqual('http://localhost:8080/reverse?lat=1.5&lon=-2.5&addressdetails=1&zoom=18&format=jsonv2',
+                         self.geocoder.reverse_geolocate_url(Coordinate(1.5, -2.5)))
+
+    def test_address_keys(self):
+        response = { 'lat': '45.1', 'lon': '-75.2',
+                     'address': { 'country': 'Canada', 'province': 'Ontario', 'state_district': 'Eastern', 'town': 'Perth', 'quarter': 'Old Town' } }
+        location = self.geocoder.location_from_response(Coordinate(45.1, -75.2), 'url', response)
+        self.assertEqual(PoliticalDivision(country='Canada', pd1='Ontario', pd2='Eastern', pd3='Perth', pd4='', pd5='Old Town'), location.political_division)
+
+    def test_preferred_key(self):
+        response = { 'lat': '1', 'lon': '1', 'address': { 'country': 'X', 'region': 'second', 'state': 'first' } }
+        self.assertEqual('first', self.geocoder.location_from_response(Coordinate(1, 1), 'url', response).political_division.pd1)
+
+    def test_not_found(self):
+        self.geocoder.reverse_geolocate_fetch = lambda url, rate_limit: json.dumps({ 'error': 'Unable to geocode' })
+        self.assertIsNone(self.geocoder.reverse_geolocate(Coordinate(0, 0)))
+        self.geocoder.reverse_geolocate_fetch = lambda url, rate_limit: json.dumps({ 'error': 'Internal failure' })
+        with self.assertRaises(RuntimeError):
+            self.geocoder.reverse_geolocate(Coordinate(0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
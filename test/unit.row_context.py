@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from coordinate import Coordinate
+from location import Location
+from political_division import PoliticalDivision
+from row_context import RowContext
+import unittest
+
+class RowContextTestCase(unittest.TestCase):
+    def setUp(self):
+        row = { 'accession-number': '1', 'country': 'Bolivia', 'pd1': 'La Paz', 'latitude': '-15.7621', 'longitude': '-67.456' }
+        self.context = RowContext(row, Coordinate(-15.762, -67.456), ['country', 'pd1'])
+        self.lookups = []
+
+    def lookup(self, coordinate):
+        self.lookups.append(coordinate)
+        return Location(coordinate, PoliticalDivision(country='Bolivia', pd1='La Paz'))
+
+    def test_inputs(self):
+        self.assertEqual(self.context.input_coordinate, Coordinate(-15.7621, -67.456))
+        self.assertEqual(self.context.political_division, PoliticalDivision(country='Bolivia', pd1='La Paz'))
+
+    def test_lookups(self):
+        location = self.context.location(self.context.coordinate, self.lookup)
+        self.assertIs(self.context.location(self.context.coordinate, self.lookup), location)
+        self.context.record(Coordinate(15.762, -67.456), None)
+        self.assertIsNone(self.context.location(Coordinate(15.762, -67.456), self.lookup))
+        self.assertEqual(self.lookups, [self.context.coordinate])
+        self.assertEqual(self.context.statistics['lookups'], 2)
+        self.assertEqual(self.context.statistics['lookups-saved'], 2)
+
+    def test_comparisons(self):
+        location = self.context.location(self.context.coordinate, self.lookup)
+        comparison = self.context.compare(location)
+        self.assertEqual(comparison.nmatches, 2)
+        self.assertIs(self.context.compare(Location(Coordinate(0, 0), PoliticalDivision(country='Bolivia', pd1='La Paz'))), comparison)
+        self.assertEqual(self.context.statistics['comparisons'], 1)
+        self.assertEqual(self.context.statistics['comparisons-saved'], 1)
+        scores = []
+        def scorer(a, b, level, other_level):
+            scores.append((a, b))
+            return 100
+        self.assertEqual(self.context.score('Bolivia', 'Peru', 'country', None, scorer), 100)
+        self.assertEqual(self.context.score('Bolivia', 'Peru', 'country', None, scorer), 100)
+        self.assertEqual(self.context.score('Peru', 'Bolivia', 'country', None, scorer), 100)
+        self.assertEqual(scores, [('Bolivia', 'Peru'), ('Peru', 'Bolivia')])
+
+
+if __name__ == '__main__':
+    unittest.main()
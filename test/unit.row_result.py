@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from row_result import RowResult
+import unittest
+
+class RowResultTestCase(unittest.TestCase):
+    def test_columns(self):
+        result = RowResult()
+        self.assertEqual(result.columns(), [''] * len(RowResult.KEYS))
+        # each result column is the attribute of its key
+        for (n, k) in enumerate(RowResult.KEYS):
+            setattr(result, k.replace('-', '_'), n)
+        self.assertEqual(result.columns(), list(range(len(RowResult.KEYS))))
+
+    def test_update(self):
+        result = RowResult()
+        result.update({ 'action': 'error', 'reason': 'no-latitude', 'accession-number': '1000' })
+        self.assertEqual((result.action, result.reason, result.accession_number), ('error', 'no-latitude', '1000'))
+        with self.assertRaises(AttributeError):
+            result.update({ 'no-such-result': '' })
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            RowResult().actoin = 'pass'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from response_status import ResponseStatus
+from sampling import Sample
+from collections import Counter
+import unittest
+
+class SampleTestCase(unittest.TestCase):
+    def setUp(self):
+        # 900 rows of Peru, 90 of Chile and 10 of Bolivia
+        self.rows = [(n, [country, 'x', str(n)]) for (n, country) in enumerate(['Peru'] * 900 + ['Chile'] * 90 + ['Bolivia'] * 10)]
+        self.stratum = lambda rawrow: rawrow[0]
+        self.error = ResponseStatus('error', 'country-mismatch')
+        self.ok = ResponseStatus('pass', 'matching-location')
+
+    def test_parse(self):
+        self.assertEqual(Sample.parse('300').size, 300)
+        self.assertEqual(Sample.parse('0.05').fraction, 0.05)
+        for text in ('0', '1.0', '-3', 'lots', ''):
+            with self.assertRaises(ValueError):
+                Sample.parse(text)
+
+    def test_allot(self):
+        allocation = Sample.allot(Counter({'a': 900, 'b': 90, 'c': 10}), 100)
+        self.assertEqual(sum(allocation.values()), 100)
+        self.assertEqual(allocation['c'], 1)
+        self.assertTrue(88 <= allocation['a'] <= 90)
+        # never more than the rows of a stratum
+        self.assertEqual(Sample.allot(Counter({'a': 2, 'b': 1}), 10), Counter({'a': 2, 'b': 1}))
+
+    def test_select(self):
+        sample = Sample(size=50, seed=1)
+        rows = sample.select(iter(self.rows), self.stratum)
+        self.assertEqual(len(rows), 50)
+        self.assertEqual([r[0] for r in rows], sorted(r[0] for r in rows))
+        self.assertEqual(Counter(self.stratum(r[1]) for r in rows), sample.allocation)
+        self.assertEqual(sample.population, Counter({'Peru': 900, 'Chile': 90, 'Bolivia': 10}))
+        # the same seed is the same sample
+        self.assertEqual(Sample(size=50, seed=1).select(iter(self.rows), self.stratum), rows)
+
+    def test_fraction(self):
+        sample = Sample(fraction=0.2, seed=2)
+        rows = sample.select(iter(self.rows), self.stratum)
+        self.assertTrue(120 < len(rows) < 280)
+        self.assertEqual(sum(sample.allocation.values()), len(rows))
+
+    def test_estimates(self):
+        sample = Sample(size=200, seed=3)
+        # every Chile row is in error and no other
+        for (row_number, rawrow) in sample.select(iter(self.rows), self.stratum):
+            sample.record(row_number, self.error if rawrow[0] == 'Chile' else self.ok)
+        estimates = { e.status: e for e in sample.estimates() }
+        self.assertAlmostEqual(estimates[self.error].rate, 0.09)
+        self.assertEqual(estimates[self.error].rows, 90)
+        self.assertAlmostEqual(estimates[self.ok].rate, 0.91)
+        self.assertAlmostEqual(sample.coverage(), 1.0)
+        for e in estimates.values():
+            self.assertTrue(e.low <= e.rate <= e.high)
+
+    def test_wilson(self):
+        (low, high) = Sample.wilson(0.5, 100, 1.96)
+        self.assertAlmostEqual(low, 0.4038, places=3)
+        self.assertAlmostEqual(high, 0.5962, places=3)
+        (low, high) = Sample.wilson(0.0, 20, 1.96)
+        self.assertEqual(low, 0.0)
+        self.assertGreater(high, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
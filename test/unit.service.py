@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from service import Service
+import http.client
+import json
+import socket
+import standins
+import tempfile
+import threading
+import unittest
+
+class Cache(standins.Cache):
+    def __init__(self, checker):
+        super().__init__()
+        self.checker = checker
+        self.running_at_flush = []
+
+    def flush(self):
+        super().flush()
+        self.running_at_flush.append(self.checker.running)
+
+class Unwritable:
+    def __str__(self):
+        raise RuntimeError('not a CSV value')
+
+class Checker(standins.Checker):
+    ''' A stand in `GQC` checking rows by upper casing their country; the `previous` accession numbers keep their verdict '''
+    def __init__(self):
+        super().__init__(standins.Settings(columns={ 'country': 0, 'pd1': 1, 'accession-number': 2 }))
+        self.cache = Cache(self)
+        self.previous = {}
+        # the check_rows pipelines running
+        self.running = 0
+
+    def check_rows(self, items):
+        self.running += 1
+        try:
+            for (row_number, rawrow) in items:
+                if rawrow[2] in self.previous:
+                    yield (row_number, rawrow, self.previous[rawrow[2]])
+                    continue
+                self.cache[rawrow[2]] = 'x'
+                yield (row_number, rawrow, ['pass', Unwritable() if rawrow[0] == 'boom' else rawrow[0].upper()])
+        finally:
+            self.running -= 1
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+class ServiceTestCase(unittest.TestCase):
+    def serve(self, address):
+        self.service = Service(Checker(), address)
+        self.service.start()
+        self.thread = threading.Thread(target=self.service.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.service.server.shutdown()
+        self.thread.join()
+        self.service.stop()
+
+    def request(self, connection, method, path, body=None):
+        connection.request(method, path, body)
+        response = connection.getresponse()
+        return (response.status, response.read())
+
+    def test_parse_address(self):
+        self.serve('127.0.0.1:0')
+        self.assertEqual(('127.0.0.1', 8080), Service.parse_address('8080'))
+        self.assertEqual(('0.0.0.0', 8080), Service.parse_address('0.0.0.0:8080'))
+        self.assertEqual('/run/gqc.sock', Service.parse_address('/run/gqc.sock'))
+        with self.assertRaises(ValueError):
+            Service.parse_address('localhost')
+
+    def test_check(self):
+        self.serve('127.0.0.1:0')
+        connection = http.client.HTTPConnection(*self.service.address)
+        (status, body) = self.request(connection, 'POST', '/check', json.dumps({ 'country': 'peru', 'accession-number': '1' }))
+        self.assertEqual(200, status)
+        self.assertEqual({ 'action': 'pass', 'reason': 'PERU' }, json.loads(body))
+        # the same connection, kept alive
+        (status, body) = self.request(connection, 'POST', '/check', json.dumps([{ 'country': 'chile', 'accession-number': '2' }, { 'country': 'cuba', 'accession-number': '3' }]))
+        self.assertEqual([{ 'action': 'pass', 'reason': 'CHILE' }, { 'action': 'pass', 'reason': 'CUBA' }], json.loads(body))
+        (status, body) = self.request(connection, 'POST', '/check', '"peru"')
+        self.assertEqual(400, status)
+        (status, body) = self.request(connection, 'GET', '/status')
+        self.assertEqual({ 'requests': 3, 'rows': 3, 'errors': 1, 'cache-entries': 3 }, json.loads(body))
+        (status, body) = self.request(connection, 'GET', '/nothing')
+        self.assertEqual(404, status)
+        connection.close()
+        self.assertFalse(self.service.gqc.cache.persist)
+        self.assertEqual(3, self.service.gqc.cache.flushes)
+
+    def test_check_csv(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, 'gqc.sock')
+        self.serve(path)
+        connection = UnixHTTPConnection(path)
+        rows = ''.join(f'c{n},p,{n}\r\n' for n in range(250))
+        (status, body) = self.request(connection, 'POST', '/check-csv', rows)
+        self.assertEqual(200, status)
+        self.assertEqual(''.join(f'c{n},p,{n},pass,C{n}\r\n' for n in range(250)), body.decode('utf-8'))
+        connection.close()
+        self.directory.cleanup()
+
+    def test_check_previous(self):
+        # both endpoints check through check_rows, so --previous applies to each
+        self.serve('127.0.0.1:0')
+        self.service.gqc.previous = { '1': ['pass', 'previous'] }
+        connection = http.client.HTTPConnection(*self.service.address)
+        (status, body) = self.request(connection, 'POST', '/check', json.dumps([{ 'country': 'peru', 'accession-number': '1' }, { 'country': 'cuba', 'accession-number': '2' }]))
+        self.assertEqual([{ 'action': 'pass', 'reason': 'previous' }, { 'action': 'pass', 'reason': 'CUBA' }], json.loads(body))
+        (status, body) = self.request(connection, 'POST', '/check-csv', 'peru,p,1\r\ncuba,p,2\r\n')
+        self.assertEqual('peru,p,1,pass,previous\r\ncuba,p,2,pass,CUBA\r\n', body.decode('utf-8'))
+        connection.close()
+
+    def test_check_csv_cut_short(self):
+        self.serve('127.0.0.1:0')
+        connection = http.client.HTTPConnection(*self.service.address)
+        connection.request('POST', '/check-csv', 'peru,p,1\r\nboom,p,2\r\ncuba,p,3\r\n')
+        with self.assertRaises(http.client.HTTPException):
+            connection.getresponse().read()
+        connection.close()
+        self.assertEqual(1, self.service.statistics['errors'])
+        # the pipeline has ended by the time the cache is saved
+        self.assertEqual([0], self.service.gqc.cache.running_at_flush)
+
+class RemoveSocketTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'gqc.sock')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_stale_socket(self):
+        # the socket of a service that did not stop
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.path)
+        stale.close()
+        Service.remove_socket(self.path)
+        self.assertFalse(os.path.exists(self.path))
+        Service.remove_socket(self.path)
+
+    def test_not_a_socket(self):
+        with open(self.path, 'w') as f:
+            f.write('data')
+        with self.assertRaises(ValueError):
+            Service(Checker(), self.path).start()
+        with open(self.path) as f:
+            self.assertEqual('data', f.read())
+
+if __name__ == '__main__':
+    unittest.main()
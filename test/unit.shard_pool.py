@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gazetteer import Gazetteer
+import shard_pool
+from shard_pool import ShardPool
+import standins
+from collections import Counter
+import unittest
+
+class Previous:
+    def __init__(self):
+        self.statistics = { 'copied': 0, 'checked': 0 }
+
+class Checker(standins.Checker):
+    ''' A stand in `GQC` keeping statistics '''
+    def __init__(self):
+        super().__init__()
+        self.row_statistics = Counter()
+        self.previous = Previous()
+
+class ShardStatisticsTestCase(unittest.TestCase):
+    def setUp(self):
+        shard_pool._reported.clear()
+
+    def test_worker_statistics(self):
+        gqc = Checker()
+        gqc.row_statistics.update({ 'full-depth': 3 })
+        gqc.previous.statistics['copied'] += 2
+        first = shard_pool._statistics(gqc)
+        self.assertEqual({ 'full-depth': 3 }, first['rows'])
+        self.assertEqual({ 'copied': 2 }, first['previous'])
+        self.assertEqual({ k: n for (k, n) in Gazetteer.instance().statistics().items() if n }, first['gazetteer'])
+        # the next shard returns only what it added
+        gqc.row_statistics.update({ 'full-depth': 1, 'country-only': 1 })
+        gqc.previous.statistics['checked'] += 4
+        Gazetteer.instance().score('Peru', 'Peru', 'country')
+        second = shard_pool._statistics(gqc)
+        self.assertEqual({ 'full-depth': 1, 'country-only': 1 }, second['rows'])
+        self.assertEqual({ 'checked': 4 }, second['previous'])
+        self.assertEqual({ 'gazetteer-hits': 1 }, second['gazetteer'])
+
+    def test_add_statistics(self):
+        gqc = Checker()
+        pool = ShardPool(gqc, 2)
+        before = Gazetteer.instance().statistics()
+        for _ in range(2):
+            pool.add_statistics({ 'gazetteer': { 'gazetteer-hits': 5, 'fuzzy-comparisons': 1 },
+                                  'rows': { 'full-depth': 2 }, 'previous': { 'copied': 3 } })
+        after = Gazetteer.instance().statistics()
+        self.assertEqual(10, after['gazetteer-hits'] - before['gazetteer-hits'])
+        self.assertEqual(2, after['fuzzy-comparisons'] - before['fuzzy-comparisons'])
+        self.assertEqual(Counter({ 'full-depth': 4 }), gqc.row_statistics)
+        self.assertEqual({ 'copied': 6, 'checked': 0 }, gqc.previous.statistics)
+
+if __name__ == '__main__':
+    unittest.main()
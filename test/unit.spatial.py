@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from coordinate import Coordinate
+from spatial import Spatial
+import unittest
+
+class SpatialTestCase(unittest.TestCase):
+    def test_curve(self):
+        order = 4
+        n = 1 << order
+        cells = sorted(((x, y) for x in range(n) for y in range(n)), key=lambda c: Spatial.hilbert(c[0], c[1], order))
+        self.assertEqual([Spatial.hilbert(x, y, order) for (x, y) in cells], list(range(n * n)))
+        # consecutive positions are adjacent cells
+        for ((x0, y0), (x1, y1)) in zip(cells, cells[1:]):
+            self.assertEqual(abs(x0 - x1) + abs(y0 - y1), 1)
+
+    def test_key(self):
+        la_paz = Spatial.key(Coordinate(-16.5, -68.15))
+        el_alto = Spatial.key(Coordinate(-16.51, -68.16))
+        tokyo = Spatial.key(Coordinate(35.68, 139.69))
+        self.assertLess(abs(la_paz - el_alto), abs(la_paz - tokyo))
+        self.assertEqual(Spatial.key(Coordinate(10, 190)), Spatial.key(Coordinate(10, -170)))
+        self.assertEqual(Spatial.key(Coordinate(90, 180)), Spatial.key(Coordinate(90, -180)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from standin_server import StandInServer
+import http
+import json
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+class StandInServerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        fixture = { '-16.633,-67.25': { 'lat': '-16.5', 'lon': '-68.15', 'address': { 'country': 'Bolivia', 'state': 'La Paz' } } }
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(fixture, f)
+            cls.fixture_file = f.name
+        cls.standin = StandInServer(['--port', '0', '--fixture', cls.fixture_file, '--seed', '1'])
+        cls.server = cls.standin.server()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        os.remove(cls.fixture_file)
+
+    def setUp(self):
+        self.standin.rate_429 = 0.0
+        self.standin.pending_429 = 0
+
+    def fetch(self, latitude, longitude):
+        return urllib.request.urlopen(f'{self.base}/v1/reverse.php?key=k&lat={latitude}&lon={longitude}&format=json').read()
+
+    def test_fixture_response(self):
+        response = json.loads(self.fetch('-16.633333', '-67.25'))
+        self.assertEqual(response['address']['country'], 'Bolivia')
+
+    def test_unknown_coordinate_is_not_found(self):
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.fetch('10.0', '10.0')
+        self.assertEqual(context.exception.code, http.HTTPStatus.NOT_FOUND)
+
+    def test_429_burst(self):
+        self.standin.rate_429 = 1.0
+        self.standin.burst_429 = 2
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.fetch('-16.633', '-67.25')
+        self.assertEqual(context.exception.code, http.HTTPStatus.TOO_MANY_REQUESTS)
+        self.standin.rate_429 = 0.0
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.fetch('-16.633', '-67.25')
+        self.assertEqual(context.exception.code, http.HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(json.loads(self.fetch('-16.633', '-67.25'))['address']['state'], 'La Paz')
+
+    def test_parse_latency(self):
+        self.assertEqual(StandInServer.parse_latency('none'), ('none',))
+        self.assertEqual(StandInServer.parse_latency('uniform:0.1:0.5'), ('uniform', 0.1, 0.5))
+        with self.assertRaisesRegex(ValueError, 'Bad latency value: normal:1'):
+            StandInServer.parse_latency('normal:1')
+        with self.assertRaisesRegex(ValueError, 'Bad latency value: gamma:1:2'):
+            StandInServer.parse_latency('gamma:1:2')
+
+
+if __name__ == '__main__':
+    unittest.main()